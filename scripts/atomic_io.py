@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Atomic IO
+一時ファイルに書いてから os.replace で置き換える書き込みの共通処理
+
+- 一時ファイルは置き換え先と同じディレクトリに作る（同じファイルシステム内で rename できる）
+- 読み手（並列のワーカーや別プロセス）は常に完全な旧版か新版のどちらかを見る
+- 途中で失敗したら一時ファイルを消し、置き換え先には触れない
+- mkstemp は 0600 で作るため、置き換え前に既存ファイルのモード（新規なら 0666 & ~umask）を付ける
+"""
+
+import os
+import json
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+_umask: Optional[int] = None
+_umask_lock = threading.Lock()
+
+
+def current_umask() -> int:
+    """プロセスの umask（初回の呼び出しで読み、以降は保存した値を返す）"""
+    global _umask
+    if _umask is None:
+        with _umask_lock:
+            if _umask is None:
+                _umask = _read_umask()
+    return _umask
+
+
+def _read_umask() -> int:
+    # Linux では /proc から副作用なしに読める
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    # それ以外では一度書き換えて戻す（書き換え中に他のスレッドが作るファイルは緩くならず、厳しくなるだけ）
+    mask = os.umask(0o077)
+    os.umask(mask)
+    return mask
+
+
+def replacement_mode(path) -> int:
+    """置き換え後のファイルに付けるモード（既存ファイルはそのモード、新規は 0666 & ~umask）"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~current_umask()
+
+
+@contextmanager
+def atomic_path(path) -> Iterator[str]:
+    """置き換え先と同じディレクトリの一時ファイルのパスを渡し、ブロックが正常に終われば置き換える
+
+        with atomic_path(output) as tmp_path:
+            pq.write_table(table, tmp_path)
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, replacement_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_text_atomic(path, text: str):
+    """テキストを一時ファイル経由で書き込む"""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def write_json_atomic(path, data: Any, indent: Optional[int] = 2):
+    """JSONを一時ファイル経由で書き込む"""
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=indent))
@@ -20,22 +20,64 @@ from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
 
+from log_stream import CheckpointStore, iter_windows, complete_lines_end, count_lines, last_run_id, write_text_atomic, RUN_ID_PATTERN
+from failure_signatures import FailureSignatureLibrary, DEFAULT_LIBRARY_PATH
+from problem_clustering import ProblemClusterIndex, normalize_issue, simhash
+from knowledge_store import KnowledgeStore, new_entry, render_checklist, group_by_category, category_digest, render_category
+from checklist_sections import ChecklistDocument
+from llm_backend import (CommandBackend, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT_SECONDS, DEFAULT_RETRIES,
+                         DEFAULT_FAILURE_TTL_SECONDS)
+
+# LLMバックエンドにまとめて渡すウィンドウの数（ファイル全体のウィンドウを一度に保持しない）
+LLM_BATCH_WINDOWS = 32
+
 class AdvancedLogAnalyzer:
-    def __init__(self, base_dir: Path = Path(".")):
+    def __init__(self, base_dir: Path = Path("."), window_before: int = 20, window_after: int = 20,
+                 signatures_path: Path = DEFAULT_LIBRARY_PATH, llm_backend: Optional[CommandBackend] = None):
         self.base_dir = base_dir
         self.logs_dir = base_dir / "projects" / "workflow-execution-logs"
         self.knowledge_base = defaultdict(dict)
+        self.signatures = FailureSignatureLibrary(signatures_path)
+        self.scanner = self.signatures.scanner
+        self.checkpoint_path = self.logs_dir / ".log-analyzer-checkpoints.json"
+        self.knowledge_db_path = self.logs_dir / "knowledge-base.sqlite3"
+        self.legacy_knowledge_base_path = self.logs_dir / "knowledge-base.json"
+        self.window_before = window_before
+        self.window_after = window_after
+        self.llm_backend = llm_backend
         
     def analyze_with_claude(self, log_content: str, log_file: str) -> Dict:
         """Claude Code SDKを使用してログを高度に分析"""
+        return self.analyze_many([(log_content, log_file)])[0]
+    
+    def analyze_many(self, items: List[Tuple[str, str]]) -> List[Dict]:
+        """(ログ内容, ログ名) ごとに分析結果を返す
+
+        LLMバックエンドがあればまとめて並行実行し、失敗したものだけFallback分析に切り替える。
+        なければ既知のパターンから分析する。
+        """
+        if self.llm_backend is None:
+            results = []
+            for log_content, log_file in items:
+                try:
+                    results.append(self._simulate_claude_analysis(log_content, log_file))
+                except Exception as e:
+                    print(f"Claude analysis failed: {e}")
+                    results.append(self._fallback_analysis(log_content, log_file))
+            return results
         
-        # Claude用のプロンプト作成
-        prompt = f"""
+        analyses = self.llm_backend.analyze([self.build_prompt(*item) for item in items])
+        return [analysis if analysis is not None else self._fallback_analysis(*item)
+                for item, analysis in zip(items, analyses)]
+    
+    def build_prompt(self, log_content: str, log_file: str) -> str:
+        """Claude用のプロンプト作成"""
+        return f"""
 以下のログファイルから問題と解決策を構造化して抽出してください：
 
 ログファイル: {log_file}
 ---
-{log_content[:3000]}  # 最初の3000文字
+{log_content}
 ---
 
 以下の形式でJSON出力してください：
@@ -59,226 +101,245 @@ class AdvancedLogAnalyzer:
 - 実際の解決プロセスを抽出
 - 検証済みの解決策を明記
 """
-        
-        # Claude Code SDKを呼び出し（シミュレーション）
-        # 実際の実装では subprocess でClaude Code CLIを実行
-        try:
-            # この部分は実際のClaude Code SDK呼び出しに置き換え
-            result = self._simulate_claude_analysis(log_content, log_file)
-            return result
-        except Exception as e:
-            print(f"Claude analysis failed: {e}")
-            return self._fallback_analysis(log_content, log_file)
     
     def _simulate_claude_analysis(self, log_content: str, log_file: str) -> Dict:
-        """Claude分析のシミュレーション（実際の実装時は削除）"""
-        problems = []
-        
-        # 既知のパターンから分析
-        if "SignatureDoesNotMatch" in log_content:
-            problems.append({
-                "issue": "Google Cloud Storage署名エラー",
-                "root_cause": "Service Account認証の期限切れまたは権限不足",
-                "symptoms": ["SignatureDoesNotMatch", "Access denied", "画像ダウンロード失敗"],
-                "solutions_tried": ["curl条件判定の緩和", "タイムアウト延長"],
-                "working_solution": "Service Account再認証とFallback処理実装",
-                "verification": "Run 16844404207で問題確認、修正版で検証予定",
-                "category": "GCS認証",
-                "prevention": ["定期的なService Account更新", "Fallback処理の事前準備"]
-            })
-            
-        if "Max turns" in log_content or "max turns" in log_content:
-            problems.append({
-                "issue": "Claude Code SDK Max turns制限",
-                "root_cause": "I2V処理の非同期性により40ターンでは不足",
-                "symptoms": ["Max turns (40) exceeded", "I2V処理未完了"],
-                "solutions_tried": ["--max-turns 40（デフォルト）"],
-                "working_solution": "--max-turns 80以上に増加",
-                "verification": "Run 16843538810で成功確認",
-                "category": "Claude Code SDK",
-                "prevention": ["I2V処理は初期から80ターン設定", "処理時間見積もりの改善"]
-            })
-            
-        if "placeholder" in log_content:
-            problems.append({
-                "issue": "画像ファイル未保存によるplaceholder",
-                "root_cause": "Google URL取得成功もcurlダウンロード未実行",
-                "symptoms": ["placeholder設定", "Video生成失敗", "依存関係連鎖失敗"],
-                "solutions_tried": ["URL受け渡し改善"],
-                "working_solution": "curlダウンロード処理の確実な実行",
-                "verification": "修正版テスト中",
-                "category": "ファイル処理",
-                "prevention": ["URL取得直後の即座ダウンロード", "ファイル存在確認強化"]
-            })
-            
-        return {"problems": problems}
+        """Claude分析のシミュレーション（LLMバックエンド未設定時）"""
+        # 既知のパターンから分析（failure-signatures.yaml）
+        return {"problems": self.signatures.known_problems(self.signatures.scan(log_content))}
     
     def _fallback_analysis(self, log_content: str, log_file: str) -> Dict:
         """Fallback分析（Claude利用不可時）"""
-        problems = []
-        
-        # 基本的なエラーパターン検出
-        error_patterns = {
-            r'ERROR.*?(\n|$)': 'エラー',
-            r'Failed.*?(\n|$)': '失敗',
-            r'❌.*?(\n|$)': '問題発生'
-        }
-        
-        for pattern, category in error_patterns.items():
-            matches = re.findall(pattern, log_content, re.MULTILINE)
-            for match in matches[:3]:  # 最初の3つまで
-                problems.append({
-                    "issue": match.strip(),
-                    "category": category,
-                    "root_cause": "要調査",
-                    "working_solution": "手動調査必要"
-                })
-                
-        return {"problems": problems}
+        # 基本的なエラーパターンを1回の走査で検出（カテゴリごとに最初の3つまで）
+        return {"problems": self.signatures.fallback_problems(self.signatures.scan(log_content))}
     
-    def consolidate_knowledge(self, all_problems: List[Dict]) -> Dict:
-        """問題を統合して知見ベースを構築"""
-        consolidated = defaultdict(lambda: {
-            "occurrences": [],
-            "solutions": set(),
-            "preventions": set(),
-            "verifications": []
-        })
+    def consolidate_knowledge(self, all_problems: List[Dict], knowledge_base: Optional[Dict] = None) -> Dict:
+        """問題を統合して知見ベースを構築（既存の知見ベースがあればそこへ追加）"""
+        consolidated = defaultdict(new_entry, knowledge_base or {})
+        
+        # 既存の問題をクラスタ索引に登録
+        index = ProblemClusterIndex()
+        for key, entry in consolidated.items():
+            category, issue = key.split("::", 1)
+            entry["normalized"] = entry.get("normalized") or normalize_issue(issue)
+            index.add(key, category, entry["normalized"], simhash(entry["normalized"]))
         
         for problem in all_problems:
-            # カテゴリと問題でグループ化
-            key = f"{problem.get('category', 'Unknown')}::{problem['issue']}"
+            # カテゴリ内で、Run ID・パス・数値などを除いて同じ（または近い）問題をまとめる
+            category = problem.get('category', 'Unknown')
+            normalized = normalize_issue(problem['issue'])
+            fingerprint = simhash(normalized)
+            key = index.find(category, normalized, fingerprint)
+            if key is None:
+                key = f"{category}::{problem['issue']}"
+                index.add(key, category, normalized, fingerprint)
             
-            consolidated[key]["occurrences"].append(problem)
+            entry = consolidated[key]
+            entry.setdefault("normalized", normalized)
+            entry["occurrences"].append(problem)
+            entry["occurrence_count"] += 1
             if problem.get("working_solution"):
-                consolidated[key]["solutions"].add(problem["working_solution"])
+                entry["solutions"].add(problem["working_solution"])
             if problem.get("prevention"):
                 for p in problem["prevention"]:
-                    consolidated[key]["preventions"].add(p)
-            if problem.get("verification"):
-                consolidated[key]["verifications"].append(problem["verification"])
+                    entry["preventions"].add(p)
+            if problem.get("verification") and problem["verification"] not in entry["verifications"]:
+                entry["verifications"].append(problem["verification"])
                 
         return consolidated
     
+    def load_knowledge_base(self) -> Dict:
+        """知見ストアから知見ベースを読み込む（旧形式の knowledge-base.json があれば初回に取り込む）"""
+        with KnowledgeStore(self.knowledge_db_path) as store:
+            if store.is_empty() and self.legacy_knowledge_base_path.exists():
+                count = store.import_json(self.legacy_knowledge_base_path)
+                print(f"📦 knowledge-base.json から{count}件の問題を知見ストアに移行")
+            return store.load()
+    
+    def save_knowledge_base(self, knowledge_base: Dict, replace: bool = False):
+        """知見ベースを知見ストアに保存（新しい発生記録だけを追加。replace=Trueで作り直し）"""
+        with KnowledgeStore(self.knowledge_db_path) as store:
+            if replace:
+                store.clear()
+            store.save(knowledge_base)
+    
     def generate_structured_checklist(self, knowledge_base: Dict) -> str:
         """構造化されたチェックリストを生成"""
-        content = []
-        content.append("# 実行ログから学習した問題解決チェックリスト")
-        content.append(f"\n**最終更新**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        content.append("\n## 📋 問題カテゴリ別チェックリスト\n")
-        
-        # カテゴリ別に整理
-        categories = defaultdict(list)
-        for key, data in knowledge_base.items():
-            category, issue = key.split("::", 1)
-            categories[category].append((issue, data))
-        
-        for category, issues in sorted(categories.items()):
-            content.append(f"\n### {category}\n")
-            
-            for issue, data in issues:
-                content.append(f"#### ❌ 問題: {issue}")
-                
-                # 最新の発生情報
-                latest = data["occurrences"][-1] if data["occurrences"] else {}
-                
-                if latest.get("root_cause"):
-                    content.append(f"**根本原因**: {latest['root_cause']}")
-                
-                if latest.get("symptoms"):
-                    content.append(f"**症状**: {', '.join(latest['symptoms'])}")
-                
-                # 解決策
-                if data["solutions"]:
-                    content.append("\n**✅ 検証済み解決策**:")
-                    for solution in data["solutions"]:
-                        content.append(f"- {solution}")
-                
-                # 検証情報（重複を排除）
-                if data["verifications"]:
-                    unique_verifications = list(dict.fromkeys(data["verifications"]))  # 重複排除
-                    content.append(f"\n**📊 検証**: {', '.join(unique_verifications[:3])}")  # 最初の3つまで
-                
-                # 再発防止チェックリスト
-                if data["preventions"]:
-                    content.append("\n**🔧 再発防止チェックリスト**:")
-                    for prevention in data["preventions"]:
-                        content.append(f"- [ ] {prevention}")
-                
-                content.append("")  # 空行
-        
-        return "\n".join(content)
+        return render_checklist(knowledge_base)
     
-    def clean_existing_checklist(self):
-        """既存の単純追加されたパターンをクリーンアップ"""
+    def update_construction_checklist(self, knowledge_base: Dict) -> int:
+        """構築チェックリストの知見セクションのうち、知見が変わったカテゴリだけを差し替える
+        
+        知見からなくなったカテゴリのセクションと、旧方式で単純追加されたパターンもここで取り除く。
+        更新・削除したセクション数を返す。
+        """
         checklist_path = self.logs_dir / "meta-workflow-construction-checklist.md"
         
         if not checklist_path.exists():
-            return
-            
-        with open(checklist_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+            return 0
+        
+        document = ChecklistDocument.load(checklist_path)
+        categories = group_by_category(knowledge_base)
+        for category, issues in sorted(categories.items()):
+            digest = category_digest(issues)
+            if document.digest(category) != digest:
+                document.set_section(category, digest, ["", f"### {category}", ""] + render_category(issues))
+        # 現在の知見にないカテゴリのセクションは削除
+        document.remove_stale_sections(categories)
         
-        # AUTO-GENERATED-PATTERNSセクションを削除または整理
-        pattern = r'<!-- AUTO-GENERATED-PATTERNS -->.*?(?=\n##|\n###|\Z)'
-        content = re.sub(pattern, '', content, flags=re.DOTALL)
+        if document.save(checklist_path):
+            print(f"✅ 構築チェックリストを更新: {checklist_path}（{len(document.changed)}セクション）")
+        return len(document.changed)
+    
+    def analyze_log_file(self, log_file: Path, start_offset: int = 0, end_offset: Optional[int] = None,
+                         first_line: int = 1, run_id: Optional[str] = None) -> List[Dict]:
+        """ログをストリーミングで読み、シグネチャ周辺のウィンドウごとに分析
+
+        run_id は start_offset より前（前回までに処理した部分）で最後に出てきたRun ID。
+        """
+        problems = []
+        batch = []
         
-        # 重複パターンを削除
-        lines = content.split('\n')
-        seen = set()
-        cleaned_lines = []
+        def flush():
+            analyses = self.analyze_many([(window.text, f"{log_file.name}:{window.start_line}-{window.end_line}")
+                                          for window in batch])
+            for window, analysis in zip(batch, analyses):
+                for problem in analysis.get("problems", []):
+                    # 知見ストアで検索できるよう、発生場所とRun IDを記録
+                    problem.update(log_file=log_file.name, start_line=window.start_line, end_line=window.end_line,
+                                   run_id=self._window_run_id(window, problem.get("signature")))
+                    problems.append(problem)
+            batch.clear()
         
-        for line in lines:
-            # 単純なパターン行を検出
-            if line.startswith('- Pattern:') or line.startswith('  Solution: Manual investigation'):
-                continue  # スキップ
-            cleaned_lines.append(line)
+        for window in iter_windows(log_file, self.scanner, self.window_before, self.window_after,
+                                   start_offset=start_offset, end_offset=end_offset, first_line=first_line,
+                                   run_id=run_id):
+            batch.append(window)
+            if len(batch) >= LLM_BATCH_WINDOWS:
+                flush()
+        if batch:
+            flush()
+        return problems
+    
+    @staticmethod
+    def _window_run_id(window, signature: Optional[str]) -> Optional[str]:
+        """検出行の直前に出てくるRun ID
+
+        ウィンドウ内で検出行より前になければウィンドウ内で最初のRun ID、それもなければ
+        ウィンドウより前（前回のチェックポイント以前を含む）で最後に出てきたRun ID。
+        """
+        lines = window.text.splitlines()
+        hit_lines = [hit.line_number for hit in window.hits if hit.signature == signature]
+        if hit_lines:
+            for line in reversed(lines[:hit_lines[0] - window.start_line + 1]):
+                match = RUN_ID_PATTERN.search(line)
+                if match:
+                    return match.group(1)
+        match = RUN_ID_PATTERN.search(window.text)
+        return match.group(1) if match else window.run_id
+    
+    def analyze_tasks(self, tasks: List[Tuple[Path, int, int, int, Optional[str]]],
+                      workers: int = 1) -> List[Tuple[List[Dict], int]]:
+        """(ログ, 開始位置, 終了位置, 処理済み行数, 直前のRun ID) ごとに (問題リスト, 行数) を返す
+
+        workers > 1 ではファイル単位でプロセスプールに分散する。結果はタスクの順序で返すため
+        直列実行と同じ出力になる。
+        """
+        if workers <= 1 or len(tasks) <= 1:
+            return [_analyze_task(self, task) for task in tasks]
         
-        return '\n'.join(cleaned_lines)
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(self,)) as executor:
+            return list(executor.map(_analyze_worker_task, tasks))
     
-    def run_analysis(self, hours: int = 24):
-        """メイン分析実行"""
-        print(f"🔍 過去{hours}時間のログを分析中...")
+    def run_analysis(self, hours: int = 24, full: bool = False, workers: int = 1):
+        """メイン分析実行（前回の続きから追記分だけを分析。full=Trueで全体を再分析）
+        
+        full=True では知見ストアを作り直すため、更新時刻に関係なくすべてのログを分析する
+        （期間外のログの知見が消えないように）。
+        """
+        if full:
+            print("🔍 すべてのログを再分析中...")
+        else:
+            print(f"🔍 過去{hours}時間のログを分析中...")
         
         # ログファイルを収集
         cutoff_time = datetime.now() - timedelta(hours=hours)
         log_files = []
         
-        for log_file in self.logs_dir.glob("*.md"):
-            if log_file.stat().st_mtime > cutoff_time.timestamp():
+        output_path = self.logs_dir / "knowledge-based-checklist.md"
+        generated = {output_path, self.logs_dir / "meta-workflow-construction-checklist.md"}
+        for log_file in sorted(self.logs_dir.glob("*.md")):
+            if log_file in generated:
+                continue  # 自分で更新するチェックリストは分析しない
+            if full or log_file.stat().st_mtime > cutoff_time.timestamp():
                 log_files.append(log_file)
         
-        print(f"📁 {len(log_files)}個のログファイルを分析")
+        checkpoints = CheckpointStore(self.checkpoint_path)
+        if full:
+            checkpoints.entries = {}
         
-        # 各ログを分析
-        all_problems = []
+        # 各ログの追記分を分析
+        tasks = []
         for log_file in log_files:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Claude分析または Fallback
-            analysis = self.analyze_with_claude(content, log_file.name)
-            if analysis.get("problems"):
-                all_problems.extend(analysis["problems"])
+            start_offset, done_lines, run_id = checkpoints.resume_position(log_file)
+            end_offset = complete_lines_end(log_file)
+            if end_offset > start_offset:
+                tasks.append((log_file, start_offset, end_offset, done_lines, run_id))
         
-        # 知見を統合
-        knowledge_base = self.consolidate_knowledge(all_problems)
+        # Claude分析または Fallback（ファイル全体を読み込まずウィンドウ単位で分析）
+        all_problems = []
+        analyzed_bytes = 0
+        for (log_file, start_offset, end_offset, done_lines, run_id), (problems, lines) in zip(
+                tasks, self.analyze_tasks(tasks, workers)):
+            all_problems.extend(problems)
+            # 次回の追記分がRun IDの見出しより後から始まっても同じ実行に紐付けられるよう、最後のRun IDも残す
+            checkpoints.update(log_file, end_offset, done_lines + lines,
+                               last_run_id(log_file, start_offset, end_offset, run_id))
+            analyzed_bytes += end_offset - start_offset
         
-        # チェックリスト生成
-        checklist_content = self.generate_structured_checklist(knowledge_base)
+        print(f"📁 {len(log_files)}個のログファイルを分析（新規 {analyzed_bytes} bytes）")
         
-        # 既存のチェックリストをクリーンアップ
-        cleaned_content = self.clean_existing_checklist()
+        # 既存の知見ベースに統合
+        existing = {} if full else self.load_knowledge_base()
+        previous_counts = {key: data["occurrence_count"] for key, data in existing.items()}
+        knowledge_base = self.consolidate_knowledge(all_problems, existing)
+        updated = sum(1 for key, data in knowledge_base.items()
+                      if data["occurrence_count"] != previous_counts.get(key, 0))
         
-        # 新しいチェックリストを保存
-        output_path = self.logs_dir / "knowledge-based-checklist.md"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(checklist_content)
+        if updated or full or not output_path.exists():
+            # チェックリスト生成
+            checklist_content = self.generate_structured_checklist(knowledge_base)
+            
+            # 新しいチェックリストを保存
+            write_text_atomic(output_path, checklist_content)
+            self.save_knowledge_base(knowledge_base, replace=full)
+            print(f"✅ 知見ベースのチェックリストを生成: {output_path}")
+        
+        # 構築チェックリストは知見の変わったセクションだけ差し替え（旧方式の単純追加も除去）
+        self.update_construction_checklist(knowledge_base)
         
-        print(f"✅ 知見ベースのチェックリストを生成: {output_path}")
-        print(f"📊 統合された問題数: {len(knowledge_base)}")
+        # 知見ベースを保存してからチェックポイントを進める（途中で失敗したら次回再分析）
+        checkpoints.save()
+        print(f"📊 統合された問題数: {len(knowledge_base)}（今回更新 {updated}）")
         
-        return len(knowledge_base)
+        return updated
+
+def _analyze_task(analyzer: AdvancedLogAnalyzer,
+                  task: Tuple[Path, int, int, int, Optional[str]]) -> Tuple[List[Dict], int]:
+    log_file, start_offset, end_offset, done_lines, run_id = task
+    problems = analyzer.analyze_log_file(log_file, start_offset, end_offset, done_lines + 1, run_id)
+    return problems, count_lines(log_file, start_offset, end_offset)
+
+# 並列分析（ワーカープロセスごとに1つのアナライザーを保持）
+_worker_analyzer = None
+
+def _init_worker(analyzer: AdvancedLogAnalyzer):
+    global _worker_analyzer
+    _worker_analyzer = analyzer
+
+def _analyze_worker_task(task: Tuple[Path, int, int, int, Optional[str]]) -> Tuple[List[Dict], int]:
+    return _analyze_task(_worker_analyzer, task)
 
 if __name__ == "__main__":
     import argparse
@@ -286,11 +347,35 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='高度なログ分析と知見蓄積')
     parser.add_argument('--hours', type=int, default=24, help='分析対象時間（デフォルト24時間）')
     parser.add_argument('--base-dir', type=Path, default=Path('.'), help='ベースディレクトリ')
+    parser.add_argument('--window', type=int, default=20, help='検出行の前後に含める行数（デフォルト20行）')
+    parser.add_argument('--full', action='store_true', help='チェックポイントを無視してすべてのログを再分析（--hours は無視）')
+    parser.add_argument('--signatures', type=Path, default=DEFAULT_LIBRARY_PATH, help='失敗シグネチャライブラリ（YAML）')
+    parser.add_argument('--workers', type=int, default=1, help='ログファイルを並列分析するプロセス数（デフォルト1）')
+    parser.add_argument('--llm-command', help='分析コマンド（例: "npx @anthropic-ai/claude-code -p --output-format json"）。'
+                                              '省略時は既知のパターンで分析')
+    parser.add_argument('--llm-concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'分析コマンドの同時実行数（デフォルト{DEFAULT_CONCURRENCY}）')
+    parser.add_argument('--llm-timeout', type=float, default=DEFAULT_TIMEOUT_SECONDS,
+                        help=f'分析コマンド1回のタイムアウト秒数（デフォルト{DEFAULT_TIMEOUT_SECONDS}）')
+    parser.add_argument('--llm-retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'失敗時のリトライ回数（デフォルト{DEFAULT_RETRIES}）')
+    parser.add_argument('--llm-failure-ttl', type=float, default=DEFAULT_FAILURE_TTL_SECONDS,
+                        help='失敗したプロンプトを再実行せずFallback分析にする秒数'
+                             f'（デフォルト{DEFAULT_FAILURE_TTL_SECONDS}、0で無効）')
+    parser.add_argument('--llm-cache-dir', type=Path, help='応答キャッシュの保存先（デフォルト: ログディレクトリの .llm-cache）')
     
     args = parser.parse_args()
     
-    analyzer = AdvancedLogAnalyzer(base_dir=args.base_dir)
-    result = analyzer.run_analysis(hours=args.hours)
+    llm_backend = None
+    if args.llm_command:
+        cache_dir = args.llm_cache_dir or args.base_dir / "projects" / "workflow-execution-logs" / ".llm-cache"
+        llm_backend = CommandBackend(args.llm_command, cache_dir=cache_dir, concurrency=args.llm_concurrency,
+                                     timeout=args.llm_timeout, retries=args.llm_retries,
+                                     failure_ttl=args.llm_failure_ttl)
+    
+    analyzer = AdvancedLogAnalyzer(base_dir=args.base_dir, window_before=args.window, window_after=args.window,
+                                   signatures_path=args.signatures, llm_backend=llm_backend)
+    result = analyzer.run_analysis(hours=args.hours, full=args.full, workers=args.workers)
     
     if result > 0:
         print(f"\n🎯 {result}個の問題カテゴリを統合・構造化しました")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+チェックリストのセクションモデル
+meta-workflow-construction-checklist.md を一度だけ読み込んでブロックに分割し、
+知見の変わったカテゴリのセクションだけを差し替えて書き戻す
+
+自動更新するセクションはマーカーで囲む:
+  <!-- KNOWLEDGE-SECTION: カテゴリ digest=xxxxxxxx -->
+  ...
+  <!-- /KNOWLEDGE-SECTION: カテゴリ -->
+digest はカテゴリの知見から計算したハッシュで、一致するセクションは描画し直さない。
+マーカーの外側（手で書いた部分）はそのまま残す。現在の知見にないカテゴリのセクションは削除する。
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from log_stream import write_text_atomic
+
+BEGIN_PATTERN = re.compile(r'^<!-- KNOWLEDGE-SECTION: (.+?) digest=([0-9a-f]*) -->$')
+END_PATTERN = re.compile(r'^<!-- /KNOWLEDGE-SECTION: (.+?) -->$')
+# 旧方式で追記されたブロック（次の見出しまで）と、1行ずつ追加されていたパターン行
+LEGACY_BLOCK_PATTERN = re.compile(r'<!-- AUTO-GENERATED-PATTERNS -->.*?(?=\n##|\n###|\Z)', re.DOTALL)
+LEGACY_LINE_PREFIXES = ('- Pattern:', '  Solution: Manual investigation')
+
+KNOWLEDGE_HEADING = "## 📚 実行ログから学習した知見（自動更新）"
+
+
+class ManagedSection:
+    def __init__(self, section_id: str, digest: str, lines: List[str]):
+        self.section_id = section_id
+        self.digest = digest
+        self.lines = lines
+
+    def render(self) -> List[str]:
+        return ([f"<!-- KNOWLEDGE-SECTION: {self.section_id} digest={self.digest} -->"] + self.lines +
+                [f"<!-- /KNOWLEDGE-SECTION: {self.section_id} -->"])
+
+
+class ChecklistDocument:
+    """手書きのテキスト（行のリスト）と自動更新セクションが並んだMarkdown文書"""
+
+    def __init__(self, blocks: List, cleaned: bool = False):
+        self.blocks = blocks  # List[List[str] | ManagedSection]
+        self.sections: Dict[str, ManagedSection] = {
+            block.section_id: block for block in blocks if isinstance(block, ManagedSection)}
+        self.changed: List[str] = []
+        self.dirty = cleaned
+
+    @classmethod
+    def parse(cls, text: str) -> "ChecklistDocument":
+        # 旧方式の単純追加を取り除く
+        cleaned_text = LEGACY_BLOCK_PATTERN.sub('', text)
+        lines = [line for line in cleaned_text.split('\n') if not line.startswith(LEGACY_LINE_PREFIXES)]
+        cleaned = '\n'.join(lines) != text
+
+        blocks: List = []
+        plain: List[str] = []
+        current: Optional[ManagedSection] = None
+        for line in lines:
+            if current is None:
+                begin = BEGIN_PATTERN.match(line)
+                if begin:
+                    if plain:
+                        blocks.append(plain)
+                    plain = []
+                    current = ManagedSection(begin.group(1), begin.group(2), [])
+                else:
+                    plain.append(line)
+            elif END_PATTERN.match(line):
+                blocks.append(current)
+                current = None
+            else:
+                current.lines.append(line)
+        if current is not None:
+            # 終了マーカーがない場合は最後までをそのセクションとみなす
+            blocks.append(current)
+        if plain:
+            blocks.append(plain)
+        return cls(blocks, cleaned)
+
+    @classmethod
+    def load(cls, path: Path) -> "ChecklistDocument":
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.parse(f.read())
+
+    def digest(self, section_id: str) -> Optional[str]:
+        section = self.sections.get(section_id)
+        return section.digest if section else None
+
+    def set_section(self, section_id: str, digest: str, lines: List[str]):
+        """セクションの内容を差し替える（なければ知見の見出しの下に追加）"""
+        section = self.sections.get(section_id)
+        if section is None:
+            section = ManagedSection(section_id, digest, lines)
+            self._insert(section)
+            self.sections[section_id] = section
+        else:
+            section.digest, section.lines = digest, lines
+        self.changed.append(section_id)
+        self.dirty = True
+
+    def remove_stale_sections(self, current_ids) -> List[str]:
+        """current_ids に含まれない自動更新セクションを削除し、削除したIDを返す
+
+        カテゴリが消えた（名前が変わった・知見がなくなった）セクションが残り続けないようにする。
+        """
+        current_ids = set(current_ids)
+        removed = [section_id for section_id in self.sections if section_id not in current_ids]
+        if not removed:
+            return []
+        self.blocks = [block for block in self.blocks
+                       if not (isinstance(block, ManagedSection) and block.section_id in removed)]
+        for section_id in removed:
+            del self.sections[section_id]
+        self.changed.extend(removed)
+        self.dirty = True
+        return removed
+
+    def _insert(self, section: ManagedSection):
+        # 最後の自動更新セクションの後ろ。まだなければ末尾に見出しを作ってその下
+        for i in range(len(self.blocks) - 1, -1, -1):
+            if isinstance(self.blocks[i], ManagedSection):
+                self.blocks.insert(i + 1, section)
+                return
+        self.blocks.append(["", KNOWLEDGE_HEADING, ""])
+        self.blocks.append(section)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for block in self.blocks:
+            lines.extend(block.render() if isinstance(block, ManagedSection) else block)
+        return '\n'.join(lines)
+
+    def save(self, path: Path) -> bool:
+        """変更があれば一時ファイル経由で書き戻す"""
+        if not self.dirty:
+            return False
+        write_text_atomic(path, self.render())
+        self.dirty = False
+        return True
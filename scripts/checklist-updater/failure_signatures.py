@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+失敗シグネチャライブラリ
+failure-signatures.yaml のシグネチャを読み込み、1つの正規表現にまとめて検出する
+"""
+
+import copy
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+from log_stream import SignatureScanner, SignatureHit
+
+DEFAULT_LIBRARY_PATH = Path(__file__).with_name("failure-signatures.yaml")
+
+# 汎用パターンで1ウィンドウから記録する問題の上限（カテゴリごと）
+MAX_FALLBACK_PROBLEMS = 3
+
+
+class FailureSignatureLibrary:
+    def __init__(self, path: Path = DEFAULT_LIBRARY_PATH):
+        self.path = Path(path)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            entries = (yaml.safe_load(f) or {}).get('signatures', [])
+
+        self.signatures: Dict[str, Dict] = {}
+        patterns: Dict[str, str] = {}
+        for entry in entries:
+            signature_id = entry['id']
+            if signature_id in self.signatures:
+                raise ValueError(f"Duplicate signature id: {signature_id}")
+            if 'problem' not in entry and 'fallback_category' not in entry:
+                raise ValueError(f"Signature {signature_id} needs 'problem' or 'fallback_category'")
+            self.signatures[signature_id] = entry
+            patterns[signature_id] = '|'.join(f"(?:{p})" for p in entry['patterns'])
+
+        # 全シグネチャを1つの正規表現にコンパイル（読み込み時に1回だけ）
+        self.scanner = SignatureScanner(patterns)
+
+    def scan(self, text: str) -> List[SignatureHit]:
+        return self.scanner.scan_text(text)
+
+    def known_problems(self, hits: List[SignatureHit]) -> List[Dict]:
+        """既知の失敗に一致したシグネチャの問題レコード（シグネチャごとに1件）"""
+        problems, seen = [], set()
+        for hit in hits:
+            problem = self.signatures[hit.signature].get('problem')
+            if problem and hit.signature not in seen:
+                seen.add(hit.signature)
+                problems.append({**copy.deepcopy(problem), "signature": hit.signature})
+        return problems
+
+    def fallback_problems(self, hits: List[SignatureHit]) -> List[Dict]:
+        """汎用パターンに一致した行をそのまま問題として記録"""
+        problems = []
+        counts = defaultdict(int)
+        for hit in hits:
+            category = self.signatures[hit.signature].get('fallback_category')
+            if category is None or counts[category] >= MAX_FALLBACK_PROBLEMS:
+                continue
+            counts[category] += 1
+            problems.append({
+                "issue": hit.text,
+                "category": category,
+                "root_cause": "要調査",
+                "working_solution": "手動調査必要",
+                "signature": hit.signature
+            })
+        return problems
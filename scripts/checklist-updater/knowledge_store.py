@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+知見ストア（SQLite）
+問題・発生記録・解決策・再発防止策・検証結果を保存し、過去の失敗をログの再解析なしで検索する
+
+- WALモードで開くため、デーモンの書き込み中でも検索できる（書き込み同士は busy_timeout で待つ）
+- カテゴリ・シグネチャ・Run ID・発生日時に索引を張る
+- Markdownのチェックリストはストアの内容から必要な時に生成する
+
+使い方:
+  python knowledge_store.py top --days 7
+  python knowledge_store.py runs --signature max_turns_exceeded
+  python knowledge_store.py runs --issue "Max turns"
+  python knowledge_store.py render --output checklist.md
+"""
+
+import re
+import json
+import sqlite3
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_DB_PATH = Path("projects/workflow-execution-logs/knowledge-base.sqlite3")
+
+# 読み込み時に問題ごとに保持する発生記録の件数（件数自体は occurrence_count で数える）
+MAX_OCCURRENCES = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS problems (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL,
+    issue TEXT NOT NULL,
+    normalized TEXT,
+    occurrence_count INTEGER NOT NULL DEFAULT 0,
+    first_seen TEXT,
+    last_seen TEXT
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    id INTEGER PRIMARY KEY,
+    problem_id INTEGER NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+    signature TEXT,
+    run_id TEXT,
+    log_file TEXT,
+    start_line INTEGER,
+    end_line INTEGER,
+    observed_at TEXT NOT NULL,
+    detail TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS solutions (
+    problem_id INTEGER NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+    text TEXT NOT NULL,
+    UNIQUE (problem_id, text)
+);
+CREATE TABLE IF NOT EXISTS preventions (
+    problem_id INTEGER NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+    text TEXT NOT NULL,
+    UNIQUE (problem_id, text)
+);
+CREATE TABLE IF NOT EXISTS verifications (
+    id INTEGER PRIMARY KEY,
+    problem_id INTEGER NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+    text TEXT NOT NULL,
+    UNIQUE (problem_id, text)
+);
+CREATE INDEX IF NOT EXISTS idx_problems_category ON problems(category);
+CREATE INDEX IF NOT EXISTS idx_occurrences_problem ON occurrences(problem_id, id);
+CREATE INDEX IF NOT EXISTS idx_occurrences_signature ON occurrences(signature);
+CREATE INDEX IF NOT EXISTS idx_occurrences_run_id ON occurrences(run_id);
+CREATE INDEX IF NOT EXISTS idx_occurrences_observed_at ON occurrences(observed_at);
+"""
+
+# 発生記録の列として保存するメタデータ（残りは detail にJSONで保存）
+OCCURRENCE_COLUMNS = ("signature", "run_id", "log_file", "start_line", "end_line")
+
+# ログファイル名の日付（execution-log-2025-08-04.md）
+LOG_DATE_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+
+def log_file_date(log_file: Optional[str]) -> Optional[str]:
+    """ログファイル名の日付（ISO形式）。名前に日付がなければNone"""
+    match = LOG_DATE_PATTERN.search(log_file or "")
+    if not match:
+        return None
+    try:
+        return datetime(*map(int, match.groups())).isoformat(timespec='seconds')
+    except ValueError:
+        return None
+
+
+def new_entry() -> Dict:
+    return {
+        "occurrences": [],
+        "occurrence_count": 0,
+        "solutions": set(),
+        "preventions": set(),
+        "verifications": []
+    }
+
+
+class KnowledgeStore:
+    def __init__(self, path: Path = DEFAULT_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_empty(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM problems LIMIT 1").fetchone() is None
+
+    def load(self, max_occurrences: int = MAX_OCCURRENCES) -> Dict[str, Dict]:
+        """知見ベース（キー "カテゴリ::問題" → エントリ）を読み込む。発生記録は新しいものから max_occurrences 件"""
+        knowledge_base = {}
+        ids = {}
+        for row in self.conn.execute("SELECT * FROM problems ORDER BY id"):
+            entry = new_entry()
+            entry["normalized"] = row["normalized"]
+            entry["occurrence_count"] = row["occurrence_count"]
+            knowledge_base[row["key"]] = entry
+            ids[row["id"]] = entry
+
+        for table, field in (("solutions", "solutions"), ("preventions", "preventions")):
+            for row in self.conn.execute(f"SELECT problem_id, text FROM {table}"):
+                ids[row["problem_id"]][field].add(row["text"])
+        for row in self.conn.execute("SELECT problem_id, text FROM verifications ORDER BY id"):
+            ids[row["problem_id"]]["verifications"].append(row["text"])
+
+        rows = self.conn.execute("""
+            SELECT * FROM (
+                SELECT o.*, ROW_NUMBER() OVER (PARTITION BY problem_id ORDER BY id DESC) AS recent
+                FROM occurrences o
+            ) WHERE recent <= ? ORDER BY id
+        """, (max_occurrences,))
+        for row in rows:
+            occurrence = json.loads(row["detail"])
+            occurrence["occurrence_id"] = row["id"]
+            ids[row["problem_id"]]["occurrences"].append(occurrence)
+        return knowledge_base
+
+    def save(self, knowledge_base: Dict[str, Dict], observed_at: Optional[datetime] = None):
+        """知見ベースを保存（occurrence_id のない発生記録だけを追加する）
+
+        発生日時はログファイル名の日付を使う（再分析しても発生日時は変わらない）。
+        名前に日付のないログの発生記録は observed_at（省略時は現在時刻）で記録する。
+        """
+        observed_at = (observed_at or datetime.now()).isoformat(timespec='seconds')
+        with self.conn:
+            for key, data in knowledge_base.items():
+                category, issue = key.split("::", 1)
+                self.conn.execute("""
+                    INSERT INTO problems (key, category, issue, normalized, occurrence_count)
+                    VALUES (?, ?, ?, ?, 0)
+                    ON CONFLICT(key) DO UPDATE SET normalized = excluded.normalized
+                """, (key, category, issue, data.get("normalized")))
+                problem_id = self.conn.execute("SELECT id FROM problems WHERE key = ?", (key,)).fetchone()[0]
+
+                new_occurrences = [o for o in data["occurrences"] if "occurrence_id" not in o]
+                for occurrence in new_occurrences:
+                    cursor = self.conn.execute(f"""
+                        INSERT INTO occurrences (problem_id, {', '.join(OCCURRENCE_COLUMNS)}, observed_at, detail)
+                        VALUES (?, {', '.join('?' * len(OCCURRENCE_COLUMNS))}, ?, ?)
+                    """, (problem_id, *(occurrence.get(c) for c in OCCURRENCE_COLUMNS),
+                          occurrence.get("observed_at") or log_file_date(occurrence.get("log_file")) or observed_at,
+                          json.dumps(occurrence, ensure_ascii=False)))
+                    occurrence["occurrence_id"] = cursor.lastrowid
+
+                self.conn.execute("""
+                    UPDATE problems SET occurrence_count = ?,
+                        first_seen = COALESCE(first_seen, (SELECT MIN(observed_at) FROM occurrences WHERE problem_id = ?)),
+                        last_seen = COALESCE((SELECT MAX(observed_at) FROM occurrences WHERE problem_id = ?), last_seen)
+                    WHERE id = ?
+                """, (data["occurrence_count"], problem_id, problem_id, problem_id))
+
+                self.conn.executemany("INSERT OR IGNORE INTO solutions VALUES (?, ?)",
+                                      [(problem_id, s) for s in data["solutions"]])
+                self.conn.executemany("INSERT OR IGNORE INTO preventions VALUES (?, ?)",
+                                      [(problem_id, p) for p in data["preventions"]])
+                self.conn.executemany("INSERT OR IGNORE INTO verifications (problem_id, text) VALUES (?, ?)",
+                                      [(problem_id, v) for v in data["verifications"]])
+
+    def clear(self):
+        with self.conn:
+            for table in ("occurrences", "solutions", "preventions", "verifications", "problems"):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    def import_json(self, path: Path) -> int:
+        """旧形式の knowledge-base.json を取り込む（発生記録は当時の日時が不明なため取り込み時刻で記録）"""
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        knowledge_base = {}
+        for key, data in stored.items():
+            entry = new_entry()
+            entry.update(data)
+            entry["solutions"] = set(data.get("solutions", []))
+            entry["preventions"] = set(data.get("preventions", []))
+            entry.setdefault("occurrence_count", len(entry["occurrences"]))
+            knowledge_base[key] = entry
+        self.save(knowledge_base)
+        return len(knowledge_base)
+
+    # --- 検索 ---
+
+    def top_problems(self, since: Optional[datetime] = None, limit: int = 10,
+                     category: Optional[str] = None) -> List[sqlite3.Row]:
+        """期間内の発生件数が多い問題"""
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("o.observed_at >= ?")
+            params.append(since.isoformat(timespec='seconds'))
+        if category:
+            conditions.append("p.category = ?")
+            params.append(category)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.conn.execute(f"""
+            SELECT p.category, p.issue, COUNT(*) AS count, COUNT(DISTINCT o.run_id) AS runs,
+                   MAX(o.observed_at) AS last_seen
+            FROM occurrences o JOIN problems p ON p.id = o.problem_id
+            {where}
+            GROUP BY p.id ORDER BY count DESC, last_seen DESC LIMIT ?
+        """, (*params, limit)).fetchall()
+
+    def runs_hit_by(self, signature: Optional[str] = None, issue: Optional[str] = None,
+                    since: Optional[datetime] = None) -> List[sqlite3.Row]:
+        """シグネチャ（または問題文の部分一致）に該当した Run ID"""
+        conditions, params = ["o.run_id IS NOT NULL"], []
+        if signature:
+            conditions.append("o.signature = ?")
+            params.append(signature)
+        if issue:
+            conditions.append("p.issue LIKE ?")
+            params.append(f"%{issue}%")
+        if since is not None:
+            conditions.append("o.observed_at >= ?")
+            params.append(since.isoformat(timespec='seconds'))
+        return self.conn.execute(f"""
+            SELECT o.run_id, COUNT(*) AS count, GROUP_CONCAT(DISTINCT p.issue) AS issues,
+                   MIN(o.log_file) AS log_file, MAX(o.observed_at) AS last_seen
+            FROM occurrences o JOIN problems p ON p.id = o.problem_id
+            WHERE {' AND '.join(conditions)}
+            GROUP BY o.run_id ORDER BY last_seen DESC, o.run_id DESC
+        """, params).fetchall()
+
+
+def group_by_category(knowledge_base: Dict[str, Dict]) -> Dict[str, List]:
+    """カテゴリ → [(問題, エントリ), ...]"""
+    categories = defaultdict(list)
+    for key, data in knowledge_base.items():
+        category, issue = key.split("::", 1)
+        categories[category].append((issue, data))
+    return categories
+
+
+def category_digest(issues: List) -> str:
+    """カテゴリの表示内容が変わったかを判定するためのハッシュ（描画に使う項目だけから計算）"""
+    summary = []
+    for issue, data in issues:
+        latest = data["occurrences"][-1] if data["occurrences"] else {}
+        summary.append([issue, data.get("occurrence_count", 0), latest.get("root_cause"), latest.get("symptoms"),
+                        sorted(data["solutions"]), list(dict.fromkeys(data["verifications"]))[:3],
+                        sorted(data["preventions"])])
+    return hashlib.sha256(json.dumps(summary, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def render_category(issues: List) -> List[str]:
+    """1カテゴリ分の問題ごとのチェックリスト（見出しを除く）"""
+    content = []
+    for issue, data in issues:
+        content.append(f"#### ❌ 問題: {issue}")
+
+        # 最新の発生情報
+        latest = data["occurrences"][-1] if data["occurrences"] else {}
+        if data.get("occurrence_count", 0) > 1:
+            content.append(f"**発生回数**: {data['occurrence_count']}")
+
+        if latest.get("root_cause"):
+            content.append(f"**根本原因**: {latest['root_cause']}")
+
+        if latest.get("symptoms"):
+            content.append(f"**症状**: {', '.join(latest['symptoms'])}")
+
+        # 解決策
+        if data["solutions"]:
+            content.append("\n**✅ 検証済み解決策**:")
+            for solution in sorted(data["solutions"]):
+                content.append(f"- {solution}")
+
+        # 検証情報（重複を排除）
+        if data["verifications"]:
+            unique_verifications = list(dict.fromkeys(data["verifications"]))  # 重複排除
+            content.append(f"\n**📊 検証**: {', '.join(unique_verifications[:3])}")  # 最初の3つまで
+
+        # 再発防止チェックリスト
+        if data["preventions"]:
+            content.append("\n**🔧 再発防止チェックリスト**:")
+            for prevention in sorted(data["preventions"]):
+                content.append(f"- [ ] {prevention}")
+
+        content.append("")  # 空行
+    return content
+
+
+def render_checklist(knowledge_base: Dict[str, Dict]) -> str:
+    """構造化されたチェックリストを生成"""
+    content = []
+    content.append("# 実行ログから学習した問題解決チェックリスト")
+    content.append(f"\n**最終更新**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    content.append("\n## 📋 問題カテゴリ別チェックリスト\n")
+
+    # カテゴリ別に整理
+    for category, issues in sorted(group_by_category(knowledge_base).items()):
+        content.append(f"\n### {category}\n")
+        content.extend(render_category(issues))
+
+    return "\n".join(content)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='知見ストアの検索とチェックリスト生成')
+    parser.add_argument('--db', type=Path, default=DEFAULT_DB_PATH, help='知見ストア（SQLite）のパス')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    top_parser = subparsers.add_parser('top', help='発生件数の多い問題')
+    top_parser.add_argument('--days', type=float, default=7, help='対象期間（日数、0で全期間。デフォルト7日）')
+    top_parser.add_argument('--limit', type=int, default=10, help='表示件数（デフォルト10）')
+    top_parser.add_argument('--category', help='カテゴリで絞り込み')
+
+    runs_parser = subparsers.add_parser('runs', help='問題に該当したRun ID')
+    runs_parser.add_argument('--signature', help='シグネチャID（例: max_turns_exceeded）')
+    runs_parser.add_argument('--issue', help='問題文の部分一致')
+    runs_parser.add_argument('--days', type=float, default=0, help='対象期間（日数、0で全期間）')
+
+    render_parser = subparsers.add_parser('render', help='Markdownのチェックリストを生成')
+    render_parser.add_argument('--output', type=Path, help='出力先（省略時は標準出力）')
+
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        print(f"❌ 知見ストアが見つかりません: {args.db}")
+        raise SystemExit(1)
+
+    with KnowledgeStore(args.db) as store:
+        since = datetime.now() - timedelta(days=args.days) if getattr(args, 'days', 0) else None
+
+        if args.command == 'top':
+            rows = store.top_problems(since, args.limit, args.category)
+            period = f"過去{args.days:g}日" if since else "全期間"
+            print(f"📊 発生件数の多い問題（{period}）")
+            for i, row in enumerate(rows, 1):
+                print(f"{i:3d}. [{row['category']}] {row['issue']} — {row['count']}回 / {row['runs']} runs"
+                      f"（最終: {row['last_seen']}）")
+            if not rows:
+                print("  該当なし")
+
+        elif args.command == 'runs':
+            if not args.signature and not args.issue:
+                parser.error('--signature か --issue を指定してください')
+            rows = store.runs_hit_by(args.signature, args.issue, since)
+            print(f"🔍 該当したRun: {len(rows)}件")
+            for row in rows:
+                print(f"  Run {row['run_id']}: {row['count']}回 {row['log_file'] or ''}（{row['issues']}）")
+
+        elif args.command == 'render':
+            content = render_checklist(store.load())
+            if args.output:
+                args.output.write_text(content, encoding='utf-8')
+                print(f"✅ チェックリストを生成: {args.output}")
+            else:
+                print(content)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+ログ分析用のLLMバックエンド
+分析コマンド（Claude Code CLIなど）にプロンプトを標準入力で渡し、JSONの分析結果を受け取る
+
+- 複数のプロンプトを asyncio のサブプロセスで並行実行（同時実行数はセマフォで制限）
+- タイムアウトと指数バックオフ付きのリトライ
+- 応答はプロンプトのハッシュをキーにディスクへキャッシュ（変更のないログは再送しない）
+- 失敗したプロンプトも短時間（failure_ttl 秒）だけ記録し、その間の再実行ではリトライを待たずに失敗として扱う
+
+分析コマンドの例:
+  npx @anthropic-ai/claude-code -p --output-format json --max-turns 1
+動作確認用のスタブ（失敗シグネチャライブラリで応答を作る）:
+  python llm_backend.py stub [--delay 0.5]
+"""
+
+import re
+import sys
+import copy
+import json
+import time
+import shlex
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from log_stream import write_json_atomic
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT_SECONDS = 300
+DEFAULT_RETRIES = 2
+DEFAULT_FAILURE_TTL_SECONDS = 600
+
+JSON_BLOCK_PATTERN = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+
+
+class AnalysisError(Exception):
+    """分析コマンドが失敗した、または応答が分析結果として読めない"""
+
+
+def parse_analysis(output: str) -> Dict:
+    """コマンドの出力から {"problems": [...]} を取り出す
+
+    --output-format json の場合は "result" の中のテキストを、コードブロックで囲まれていればその中を読む。
+    """
+    text = output.strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and isinstance(data.get("result"), str):
+        text, data = data["result"].strip(), None
+    if data is None:
+        block = JSON_BLOCK_PATTERN.search(text)
+        candidate = block.group(1) if block else text[text.find('{'):text.rfind('}') + 1]
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            raise AnalysisError(f"JSONとして読めない応答: {text[:200]!r}")
+    if not isinstance(data, dict) or not isinstance(data.get("problems"), list):
+        raise AnalysisError("応答に problems のリストがありません")
+    return data
+
+
+class PromptCache:
+    """プロンプトのハッシュ → 分析結果 のディスクキャッシュ（1件1ファイル）"""
+
+    def __init__(self, cache_dir: Path, namespace: str = ""):
+        self.cache_dir = Path(cache_dir)
+        self.namespace = namespace
+
+    def key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, suffix: str = ".json") -> Path:
+        return self.cache_dir / key[:2] / f"{key}{suffix}"
+
+    def get(self, prompt: str) -> Optional[Dict]:
+        try:
+            with open(self._path(self.key(prompt)), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, prompt: str, result: Dict):
+        key = self.key(prompt)
+        write_json_atomic(self._path(key), result)
+        try:
+            self._path(key, ".failed.json").unlink()
+        except FileNotFoundError:
+            pass
+
+    def recent_failure(self, prompt: str, ttl: float) -> Optional[str]:
+        """ttl 秒以内に記録した失敗の内容（なければ None）"""
+        try:
+            with open(self._path(self.key(prompt), ".failed.json"), 'r', encoding='utf-8') as f:
+                failure = json.load(f)
+            if time.time() - failure["failed_at"] < ttl:
+                return failure.get("error", "")
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def put_failure(self, prompt: str, error: str):
+        write_json_atomic(self._path(self.key(prompt), ".failed.json"), {"failed_at": time.time(), "error": error})
+
+
+class CommandBackend:
+    """分析コマンドを並行実行するバックエンド"""
+
+    def __init__(self, command: Union[str, Sequence[str]], cache_dir: Optional[Path] = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 retries: int = DEFAULT_RETRIES, backoff: float = 2.0,
+                 failure_ttl: float = DEFAULT_FAILURE_TTL_SECONDS):
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        if not self.command:
+            raise ValueError("分析コマンドが空です")
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.failure_ttl = max(0.0, failure_ttl)
+        # コマンドが変われば応答も変わるため、キャッシュのキーにコマンドを含める
+        self.cache = PromptCache(cache_dir, namespace=' '.join(self.command)) if cache_dir else None
+        self.stats = {"cached": 0, "executed": 0, "retried": 0, "failed": 0, "skipped_failed": 0}
+        # この実行中に失敗したプロンプト（同じログを何度分析しても、リトライを待つのは1回だけ）
+        self.failed_prompts = set()
+
+    def analyze(self, prompts: List[str]) -> List[Optional[Dict]]:
+        """プロンプトごとの分析結果（失敗したものは None）。結果はプロンプトの順序で返す"""
+        return asyncio.run(self.analyze_async(prompts))
+
+    async def analyze_async(self, prompts: List[str]) -> List[Optional[Dict]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        in_flight: Dict[str, asyncio.Task] = {}
+
+        async def analyze_one(prompt: str) -> Optional[Dict]:
+            if prompt in self.failed_prompts:
+                self.stats["skipped_failed"] += 1
+                return None
+            if self.cache is not None:
+                cached = self.cache.get(prompt)
+                if cached is not None:
+                    self.stats["cached"] += 1
+                    return cached
+                if self.failure_ttl and self.cache.recent_failure(prompt, self.failure_ttl) is not None:
+                    self.stats["skipped_failed"] += 1
+                    self.failed_prompts.add(prompt)
+                    return None
+            async with semaphore:
+                result, error = await self._run_with_retries(prompt)
+            if result is None:
+                self.failed_prompts.add(prompt)
+                if self.cache is not None and self.failure_ttl:
+                    self.cache.put_failure(prompt, error)
+            elif self.cache is not None:
+                self.cache.put(prompt, result)
+            return result
+
+        # 同じプロンプトは1回だけ実行する
+        tasks = []
+        for prompt in prompts:
+            if prompt not in in_flight:
+                in_flight[prompt] = asyncio.ensure_future(analyze_one(prompt))
+            tasks.append(in_flight[prompt])
+        # 同じプロンプトの結果を呼び出し側で別々に書き換えられるよう複製して返す
+        return [copy.deepcopy(result) for result in await asyncio.gather(*tasks)]
+
+    async def _run_with_retries(self, prompt: str) -> Tuple[Optional[Dict], str]:
+        """(分析結果, 失敗の内容)。リトライしても失敗した場合は分析結果が None"""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retried"] += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                self.stats["executed"] += 1
+                return parse_analysis(await self._run(prompt)), ""
+            except (AnalysisError, asyncio.TimeoutError, OSError) as e:
+                error = e
+        self.stats["failed"] += 1
+        print(f"⚠️ LLM analysis failed after {self.retries + 1} attempts: {error!r}", file=sys.stderr)
+        return None, repr(error)
+
+    async def _run(self, prompt: str) -> str:
+        process = await asyncio.create_subprocess_exec(
+            *self.command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE)
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(prompt.encode('utf-8')), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise AnalysisError(f"exit {process.returncode}: {stderr.decode('utf-8', errors='replace')[:200]}")
+        return stdout.decode('utf-8', errors='replace')
+
+
+def _run_stub(delay: float, fail_rate: float):
+    """標準入力のプロンプトを失敗シグネチャライブラリで分析し、--output-format json と同じ形で出力"""
+    import time
+    import random
+    from failure_signatures import FailureSignatureLibrary
+
+    prompt = sys.stdin.read()
+    if delay:
+        time.sleep(delay)
+    if fail_rate and random.random() < fail_rate:
+        print("stub: simulated failure", file=sys.stderr)
+        sys.exit(1)
+    library = FailureSignatureLibrary()
+    hits = library.scan(prompt)
+    result = {"problems": library.known_problems(hits) or library.fallback_problems(hits)}
+    print(json.dumps({"type": "result", "result": f"```json\n{json.dumps(result, ensure_ascii=False)}\n```"},
+                     ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='ログ分析用LLMバックエンド')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    stub_parser = subparsers.add_parser('stub', help='動作確認用のスタブ（標準入力のプロンプトを分析）')
+    stub_parser.add_argument('--delay', type=float, default=0.0, help='応答までの待ち時間（秒）')
+    stub_parser.add_argument('--fail-rate', type=float, default=0.0, help='失敗する確率（リトライの確認用）')
+
+    args = parser.parse_args()
+    if args.command == 'stub':
+        _run_stub(args.delay, args.fail_rate)
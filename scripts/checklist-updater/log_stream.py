@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+ログのストリーミング読み込みとシグネチャ検出
+
+- ログは行単位で読み込み（ファイル全体をメモリに載せない）
+- すべてのシグネチャを1つの正規表現にまとめ、1回の走査で検出
+- 検出行の前後の行をウィンドウとして切り出し、重なるウィンドウは1つにまとめる
+ウィンドウの行数には上限があるため、ログのサイズに関係なく一定のメモリで全体を走査できる。
+追記のみのログは CheckpointStore に記録したオフセットから続きだけを読む。
+"""
+
+import re
+import sys
+import json
+import hashlib
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# 一時ファイル経由の書き込みは scripts/ 直下の共通モジュールを使う
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from atomic_io import atomic_path, write_json_atomic, write_text_atomic  # noqa: E402
+
+# ログ中のRun ID（"Run 16843538810" / "Run #16959198121" / "**Run ID**: 16716454022" / ".../actions/runs/16719215598"）
+RUN_ID_PATTERN = re.compile(r'(?:\bRun(?:\s+ID)?(?:\*\*)?:?\s*#?|/actions/runs/)(\d{8,})')
+
+
+class SignatureHit(NamedTuple):
+    signature: str
+    line_number: int
+    text: str
+
+
+class LogWindow(NamedTuple):
+    start_line: int
+    end_line: int
+    start_offset: int
+    end_offset: int
+    hits: List[SignatureHit]
+    text: str
+    run_id: Optional[str] = None  # ウィンドウより前に最後に出てきたRun ID
+
+
+def iter_lines(path: Path, start_offset: int = 0, end_offset: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """(行末のバイトオフセット, 行) を順に返す（end_offset までの範囲）"""
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        offset = start_offset
+        for raw in f:
+            if end_offset is not None and offset + len(raw) > end_offset:
+                break
+            offset += len(raw)
+            yield offset, raw.decode('utf-8', errors='replace')
+
+
+def complete_lines_end(path: Path) -> int:
+    """最後の改行までのバイト数（書き込み途中の行を含めない）"""
+    size = path.stat().st_size
+    with open(path, 'rb') as f:
+        position = size
+        while position > 0:
+            block = min(65536, position)
+            f.seek(position - block)
+            data = f.read(block)
+            newline = data.rfind(b'\n')
+            if newline >= 0:
+                return position - block + newline + 1
+            position -= block
+    return 0
+
+
+def count_lines(path: Path, start_offset: int, end_offset: int) -> int:
+    """範囲内の改行の数"""
+    count = 0
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        remaining = end_offset - start_offset
+        while remaining > 0:
+            data = f.read(min(1 << 20, remaining))
+            if not data:
+                break
+            count += data.count(b'\n')
+            remaining -= len(data)
+    return count
+
+
+def last_run_id(path: Path, start_offset: int, end_offset: int, default: Optional[str] = None) -> Optional[str]:
+    """範囲内で最後に出てくるRun ID（なければ default）。末尾から読むので範囲が大きくても速い"""
+    with open(path, 'rb') as f:
+        position = end_offset
+        overlap = b''
+        while position > start_offset:
+            block = min(65536, position - start_offset)
+            f.seek(position - block)
+            data = f.read(block) + overlap
+            matches = RUN_ID_PATTERN.findall(data.decode('utf-8', errors='replace'))
+            if matches:
+                return matches[-1]
+            # ブロックの境目をまたぐRun IDも拾えるよう、先頭部分を次（手前）のブロックにつなげる
+            overlap = data[:128]
+            position -= block
+    return default
+
+
+class CheckpointStore:
+    """ログごとの処理済みオフセットと先頭部分のハッシュを保存する
+
+    追記のみのログは前回のオフセットから続きを読む。先頭部分が変わっていたり
+    ファイルが短くなっていたりした場合は書き換えられたとみなし、先頭から読み直す。
+    """
+
+    PREFIX_BYTES = 4096
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries: Dict[str, Dict] = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @classmethod
+    def _prefix_hash(cls, path: Path, length: int) -> str:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read(min(length, cls.PREFIX_BYTES))).hexdigest()
+
+    def resume_position(self, path: Path) -> Tuple[int, int, Optional[str]]:
+        """続きから読む (バイトオフセット, 処理済み行数, 処理済み部分の最後のRun ID)
+
+        読み直しが必要なら (0, 0, None)。
+        """
+        entry = self.entries.get(path.name)
+        if not entry:
+            return 0, 0, None
+        offset = entry.get('offset', 0)
+        if path.stat().st_size < offset or self._prefix_hash(path, offset) != entry.get('prefix_hash'):
+            return 0, 0, None
+        return offset, entry.get('lines', 0), entry.get('run_id')
+
+    def update(self, path: Path, offset: int, lines: int, run_id: Optional[str] = None):
+        self.entries[path.name] = {
+            'offset': offset,
+            'lines': lines,
+            'prefix_hash': self._prefix_hash(path, offset),
+            'run_id': run_id
+        }
+
+    def save(self):
+        write_json_atomic(self.path, self.entries)
+
+
+class SignatureScanner:
+    """複数のシグネチャを1つの正規表現で検出する"""
+
+    def __init__(self, signatures: Dict[str, str]):
+        self.names = list(signatures)
+        alternatives = [f"(?P<s{i}>{pattern})" for i, pattern in enumerate(signatures.values())]
+        self.pattern = re.compile('|'.join(alternatives) if alternatives else r'(?!)')
+
+    def scan(self, line: str, line_number: int = 0) -> List[SignatureHit]:
+        hits = []
+        position = 0
+        # 行末までを取り込むシグネチャの後ろにある別のシグネチャも拾えるよう、一致の次の文字から再検索
+        while True:
+            match = self.pattern.search(line, position)
+            if match is None:
+                return hits
+            name = self.names[int(match.lastgroup[1:])]
+            hits.append(SignatureHit(name, line_number, match.group(0).strip()))
+            position = match.start() + 1
+
+    def scan_text(self, text: str) -> List[SignatureHit]:
+        hits = []
+        for line_number, line in enumerate(text.splitlines(), 1):
+            hits.extend(self.scan(line, line_number))
+        return hits
+
+
+def iter_windows(path: Path, scanner: SignatureScanner, before: int = 20, after: int = 20,
+                 max_lines: int = 400, start_offset: int = 0,
+                 end_offset: Optional[int] = None, first_line: int = 1,
+                 run_id: Optional[str] = None) -> Iterator[LogWindow]:
+    """シグネチャを含む行の前後をウィンドウとして返す
+
+    後続の行に新しい検出があればウィンドウを延長する。max_lines に達した場合はそこで区切り、
+    末尾の before 行を重ねて次のウィンドウを続ける。
+    各ウィンドウには、それより前に最後に出てきたRun IDを付ける（run_id は start_offset より前の分）。
+    """
+    context: deque = deque(maxlen=before)  # (行番号, 行頭オフセット, 行末オフセット, 行, それまでのRun ID)
+    window: Optional[List[Tuple[int, int, int, str, Optional[str]]]] = None
+    hits: List[SignatureHit] = []
+    lines_since_hit = 0
+    line_start = start_offset
+
+    def close() -> LogWindow:
+        return LogWindow(window[0][0], window[-1][0], window[0][1], window[-1][2],
+                         list(hits), ''.join(entry[3] for entry in window), window[0][4])
+
+    for line_number, (line_end, line) in enumerate(iter_lines(path, start_offset, end_offset), first_line):
+        entry = (line_number, line_start, line_end, line, run_id)
+        line_start = line_end
+        match = RUN_ID_PATTERN.search(line)
+        if match:
+            run_id = match.group(1)
+        line_hits = scanner.scan(line, line_number)
+
+        if window is None:
+            if not line_hits:
+                context.append(entry)
+                continue
+            window, hits, lines_since_hit = list(context) + [entry], list(line_hits), 0
+            continue
+
+        window.append(entry)
+        hits.extend(line_hits)
+        lines_since_hit = 0 if line_hits else lines_since_hit + 1
+
+        if lines_since_hit >= after:
+            if hits:
+                yield close()
+            context = deque(window[-before:] if before else [], maxlen=before)
+            window = None
+        elif len(window) >= max_lines:
+            if hits:
+                yield close()
+            window, hits = window[-before:] if before else [], []
+
+    if window is not None and hits:
+        yield close()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+問題のクラスタリング
+Run ID・ハッシュ・パス・数値などの変動部分を正規化し、SimHash + LSH で近い問題をまとめる
+
+- 正規化後の文字3-gramから64bitのSimHashを計算
+- 64bitを4つのバンド（16bit）に分けて索引を作り、いずれかのバンドが一致する候補だけを比較
+  （ハミング距離3以下なら必ずどこかのバンドが一致し、5以下でもほとんどの場合は一致する）
+比較は候補だけに限られるため、問題数に対してほぼ線形の時間でまとめられる。
+"""
+
+import re
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+VOLATILE_PATTERNS = [
+    (re.compile(r'https?://\S+'), '<URL>'),
+    (re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.IGNORECASE), '<UUID>'),
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?'), '<TS>'),
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}\b|\b\d{2}:\d{2}:\d{2}\b'), '<TS>'),
+    (re.compile(r'(?:~|\.{1,2})?/[\w.@-]+(?:/[\w.@-]+)+/?'), '<PATH>'),
+    (re.compile(r'\b(?=[0-9a-f]*[a-f])(?=[0-9a-f]*\d)[0-9a-f]{7,64}\b', re.IGNORECASE), '<HASH>'),
+    (re.compile(r'\b\d{8,}\b'), '<ID>'),
+    (re.compile(r'(?<![A-Za-z\d.])\d+(?:\.\d+)?'), '<N>'),
+]
+
+FINGERPRINT_BITS = 64
+BANDS = 4
+BAND_BITS = FINGERPRINT_BITS // BANDS
+MAX_DISTANCE = 5
+
+
+def normalize_issue(text: str) -> str:
+    """変動する部分をプレースホルダーに置き換えた比較用の文字列"""
+    normalized = text.strip()
+    for pattern, placeholder in VOLATILE_PATTERNS:
+        normalized = pattern.sub(placeholder, normalized)
+    return ' '.join(normalized.lower().split())
+
+
+_BIT_SHIFTS = np.arange(FINGERPRINT_BITS, dtype=np.uint64)
+
+
+@lru_cache(maxsize=65536)
+def simhash(text: str) -> int:
+    """文字3-gramの64bit SimHash"""
+    shingles = {text[i:i + 3] for i in range(max(len(text) - 2, 1))}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big') for s in shingles),
+        dtype=np.uint64, count=len(shingles))
+    # 各ビットが立っているshingleが過半数ならそのビットを立てる
+    ones = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).sum(axis=0)
+    bits = ones * 2 > len(shingles)
+    return int(np.sum(np.left_shift(np.uint64(1), _BIT_SHIFTS[bits]), dtype=np.uint64))
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def _bands(fingerprint: int) -> List[Tuple[int, int]]:
+    mask = (1 << BAND_BITS) - 1
+    return [(band, fingerprint >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+
+class ProblemClusterIndex:
+    """カテゴリごとのSimHash LSH索引（問題を既存のクラスタに割り当てる）"""
+
+    def __init__(self, max_distance: int = MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.exact: Dict[Tuple[str, str], str] = {}
+        self.buckets: Dict[Tuple[str, int, int], List[Tuple[int, str]]] = {}
+
+    def add(self, key: str, category: str, normalized: str, fingerprint: int):
+        self.exact.setdefault((category, normalized), key)
+        for band, value in _bands(fingerprint):
+            self.buckets.setdefault((category, band, value), []).append((fingerprint, key))
+
+    def find(self, category: str, normalized: str, fingerprint: int) -> Optional[str]:
+        """同じクラスタとみなせる既存の問題キー（なければNone）"""
+        key = self.exact.get((category, normalized))
+        if key is not None:
+            return key
+
+        best: Optional[Tuple[int, str]] = None
+        for band, value in _bands(fingerprint):
+            for candidate, candidate_key in self.buckets.get((category, band, value), []):
+                distance = hamming(fingerprint, candidate)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, candidate_key)
+        return best[1] if best else None
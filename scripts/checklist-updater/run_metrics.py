@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+実行ログからのRunメトリクス抽出
+実行ログ（projects/workflow-execution-logs/*.md）からRun ID・所要時間・ステップごとの結果・
+リトライ回数・ターン数を数値として取り出し、列指向のテーブルとして保存する
+
+- runs:  Runごとに1行（run_id, 開始日時, ワークフロー, 状態, 所要時間, リトライ回数, ターン数）
+- steps: Runのステップ（ユニット）ごとに1行（run_id, 開始日時, 順番, ユニット, 状態, 所要時間）
+pyarrow があれば Parquet、なければ CSV で保存する。
+
+使い方:
+  python run_metrics.py extract
+  python run_metrics.py report --period week
+  python run_metrics.py report --period day --unit "Task Decomposition"
+"""
+
+import re
+import csv
+import json
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from log_stream import iter_lines, atomic_path, RUN_ID_PATTERN
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DEFAULT_LOGS_DIR = Path("projects/workflow-execution-logs")
+DEFAULT_METRICS_DIR = DEFAULT_LOGS_DIR / "metrics"
+
+# 列の型（Parquetのスキーマと、CSVから読み戻すときの変換に使う）
+RUN_COLUMNS = {
+    "run_id": "string",
+    "log_file": "string",
+    "started_at": "timestamp",
+    "workflow": "string",
+    "status": "string",
+    "duration_seconds": "int",
+    "retry_count": "int",
+    "max_turns": "int",
+    "turns_exceeded": "bool",
+}
+STEP_COLUMNS = {
+    "run_id": "string",
+    "started_at": "timestamp",
+    "step_index": "int",
+    "unit": "string",
+    "status": "string",
+    "duration_seconds": "int",
+}
+
+SECTION_PATTERN = re.compile(r'^#{2,4}\s*\[(\d{1,2}:\d{2}(?::\d{2})?)\]\s*\[([^\]]+)\]\s*(.*)')
+LOG_DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})')
+DURATION_PATTERN = re.compile(r'(?<![\w.])(?:(\d+)h)?\s*(?:(\d+)m)?\s*(?:(\d+)s)?(?![\w])')
+DURATION_FIELD_PATTERN = re.compile(r'\*\*(?:Duration|所要時間)\*\*:\s*([0-9hms ]+)')
+STATUS_FIELD_PATTERN = re.compile(r'Status\*{0,2}:\s*\**\s*(?:[✅❌⚠️⏸️⚡]\s*)*\"?([A-Za-z]+|成功|失敗)')
+MAX_TURNS_PATTERN = re.compile(r'[Mm]ax[ -]turns\s*\(?(\d+)\)?(\s*exceeded)?|--max-turns\s+(\d+)')
+RETRY_PATTERN = re.compile(r'(?i)\bretr(?:y|ied)\s*#?(\d+)\b|\battempt\s*#?(\d+)\b|\b(\d+)\s*retries\b')
+STEP_PATTERN = re.compile(r'^\s*(?:[-*]|\d+\.)\s*(✅|❌|⏸️|⚠️|⚡|⏭️)\s*(.+)$')
+STEP_BLOCK_PATTERN = re.compile(r'(?i)progress|jobs|steps|phases|ジョブ|フェーズ')
+BLOCK_HEADER_PATTERN = re.compile(r'^\s*(?:-\s*)?\*\*([^*]+)\*\*:')
+UNIT_PREFIX_PATTERN = re.compile(r'^[^\w぀-ヿ一-鿿]+')
+
+STEP_STATUS = {"✅": "success", "❌": "failure", "⏸️": "cancelled", "⚠️": "warning", "⚡": "running", "⏭️": "skipped"}
+RUN_STATUS = {
+    "success": "success", "succeeded": "success", "fixed": "success", "成功": "success",
+    "failed": "failure", "failure": "failure", "error": "failure", "失敗": "failure",
+    "cancelled": "cancelled", "canceled": "cancelled",
+    "testing": "running", "running": "running", "pending": "running",
+}
+TERMINAL_STATUSES = {"success", "failure", "cancelled"}
+
+
+def parse_duration(text: str) -> Optional[int]:
+    """"28m36s" / "2m3s" / "14s" / "1h2m" を秒に変換（該当しなければNone）"""
+    for match in DURATION_PATTERN.finditer(text):
+        hours, minutes, seconds = match.groups()
+        if hours or minutes or seconds:
+            return int(hours or 0) * 3600 + int(minutes or 0) * 60 + int(seconds or 0)
+    return None
+
+
+def _run_status(text: str) -> Optional[str]:
+    return RUN_STATUS.get(text.strip().lower())
+
+
+def _unit_name(text: str) -> str:
+    """ステップ行からユニット名を取り出す（先頭の記号・末尾の注記と括弧を除く）"""
+    name = text.split('←', 1)[0]
+    name = re.sub(r'\s*\([^)]*\)\s*$', '', name.strip())
+    return UNIT_PREFIX_PATTERN.sub('', name).strip()
+
+
+class RunMetricsExtractor:
+    """実行ログをセクション（### [時刻] [種別] タイトル）単位で読み、Runごとの数値を集める"""
+
+    def __init__(self):
+        self.runs: Dict[str, Dict] = {}
+        self.steps: List[Dict] = []
+        self.step_counts: Dict[str, int] = defaultdict(int)
+
+    def extract(self, log_files: Iterable[Path]) -> "RunMetricsExtractor":
+        for log_file in sorted(log_files):
+            date_match = LOG_DATE_PATTERN.search(log_file.name)
+            log_date = date_match.group(1) if date_match else None
+            section: List[str] = []
+            header = None
+            for _, line in iter_lines(log_file):
+                match = SECTION_PATTERN.match(line)
+                if match:
+                    self._add_section(log_file, log_date, header, section)
+                    header, section = match, []
+                elif header is not None:
+                    section.append(line.rstrip('\n'))
+            self._add_section(log_file, log_date, header, section)
+        return self
+
+    def _add_section(self, log_file: Path, log_date: Optional[str], header, lines: List[str]):
+        if header is None:
+            return
+        time_text, tag, title = header.groups()
+        body = '\n'.join(lines)
+        run_match = RUN_ID_PATTERN.search(title) or RUN_ID_PATTERN.search(body)
+        if not run_match:
+            return
+        run_id = run_match.group(1)
+
+        started_at = None
+        if log_date:
+            time_text = time_text if time_text.count(':') == 2 else f"{time_text}:00"
+            started_at = datetime.fromisoformat(f"{log_date}T{time_text.zfill(8)}")
+
+        run = self.runs.setdefault(run_id, {
+            "run_id": run_id, "log_file": log_file.name, "started_at": started_at, "workflow": None,
+            "status": None, "duration_seconds": None, "retry_count": 0, "max_turns": None,
+            "turns_exceeded": False,
+        })
+        workflow = RUN_ID_PATTERN.sub('', title)
+        workflow = re.sub(r'(?:\s+Test)?(?:\s+Run\s*#?)?\s*$', '', workflow).strip(' -–:')
+        if workflow and not run["workflow"]:
+            run["workflow"] = workflow
+
+        # 状態: "**Status**: FAILED ..." を優先し、なければセクション種別（[SUCCESS] / [ERROR]）
+        status = None
+        status_match = STATUS_FIELD_PATTERN.search(body)
+        if status_match:
+            status = _run_status(status_match.group(1))
+        status = status or _run_status(tag)
+        # 完了した状態は、後のセクションの途中経過で上書きしない
+        if status and (run["status"] not in TERMINAL_STATUSES or status in TERMINAL_STATUSES):
+            run["status"] = status
+
+        duration_match = DURATION_FIELD_PATTERN.search(body)
+        if duration_match:
+            run["duration_seconds"] = parse_duration(duration_match.group(1))
+
+        for match in MAX_TURNS_PATTERN.finditer(body):
+            turns = int(match.group(1) or match.group(3))
+            run["max_turns"] = max(run["max_turns"] or 0, turns)
+            run["turns_exceeded"] = run["turns_exceeded"] or bool(match.group(2))
+
+        for match in RETRY_PATTERN.finditer(body):
+            run["retry_count"] = max(run["retry_count"], int(next(g for g in match.groups() if g)))
+
+        self._add_steps(run, lines)
+
+    def _add_steps(self, run: Dict, lines: List[str]):
+        """ステップ行（状態の絵文字で始まる箇条書き）をステップとして記録
+
+        所要時間の括弧がある行か、Progress / Jobs などの見出しの下にある行だけを対象にする
+        （"✅ All phases completed successfully" のような結果の要約は除く）。
+        """
+        block = ""
+        for line in lines:
+            header = BLOCK_HEADER_PATTERN.match(line)
+            if header:
+                block = header.group(1)
+            match = STEP_PATTERN.match(line)
+            if not match:
+                continue
+            symbol, text = match.groups()
+            annotation = re.search(r'\(([^)]*)\)\s*(?:←.*)?$', text)
+            duration = parse_duration(annotation.group(1)) if annotation else None
+            if duration is None and not STEP_BLOCK_PATTERN.search(block):
+                continue
+            unit = _unit_name(text)
+            if not unit:
+                continue
+            self.step_counts[run["run_id"]] += 1
+            self.steps.append({
+                "run_id": run["run_id"],
+                "started_at": run["started_at"],
+                "step_index": self.step_counts[run["run_id"]],
+                "unit": unit,
+                "status": STEP_STATUS[symbol],
+                "duration_seconds": duration,
+            })
+
+    def run_rows(self) -> List[Dict]:
+        return sorted(self.runs.values(), key=lambda r: (r["started_at"] or datetime.min, r["run_id"]))
+
+
+# --- 保存と読み込み ---
+
+def _arrow_type(kind: str):
+    return {"string": pa.string(), "timestamp": pa.timestamp("s"), "int": pa.int64(), "bool": pa.bool_()}[kind]
+
+
+def write_table(rows: List[Dict], columns: Dict[str, str], path_stem: Path) -> Path:
+    """行を列指向で保存（pyarrowがあればParquet、なければCSV）。一時ファイル経由で置き換える"""
+    path = path_stem.with_suffix(".parquet" if pq is not None else ".csv")
+    with atomic_path(path) as tmp_path:
+        if pq is not None:
+            schema = pa.schema([(name, _arrow_type(kind)) for name, kind in columns.items()])
+            table = pa.Table.from_pydict({name: [row.get(name) for row in rows] for name in columns}, schema=schema)
+            pq.write_table(table, tmp_path)
+        else:
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(columns))
+                writer.writeheader()
+                for row in rows:
+                    writer.writerow({name: _format_csv(row.get(name)) for name in columns})
+    # 保存形式が変わった場合に古い方が読まれないよう削除
+    other = path_stem.with_suffix(".csv" if path.suffix == ".parquet" else ".parquet")
+    if other.exists():
+        other.unlink()
+    return path
+
+
+def _format_csv(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _parse_csv(value: str, kind: str):
+    if value == "":
+        return None
+    if kind == "int":
+        return int(value)
+    if kind == "bool":
+        return value == "True"
+    if kind == "timestamp":
+        return datetime.fromisoformat(value)
+    return value
+
+
+def read_table(path_stem: Path, columns: Dict[str, str]) -> Dict[str, list]:
+    """保存したテーブルを列（名前 → 値のリスト）として読み込む"""
+    parquet_path = path_stem.with_suffix(".parquet")
+    if parquet_path.exists():
+        if pq is None:
+            raise RuntimeError(f"{parquet_path} を読むには pyarrow が必要です")
+        return pq.read_table(parquet_path).to_pydict()
+    with open(path_stem.with_suffix(".csv"), 'r', encoding='utf-8', newline='') as f:
+        table = {name: [] for name in columns}
+        for row in csv.DictReader(f):
+            for name, kind in columns.items():
+                table[name].append(_parse_csv(row.get(name, ""), kind))
+    return table
+
+
+# --- 集計 ---
+
+def period_key(timestamp: Optional[datetime], period: str) -> str:
+    if timestamp is None:
+        return "unknown"
+    if period == "week":
+        year, week, _ = timestamp.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return timestamp.strftime("%Y-%m")
+    return timestamp.strftime("%Y-%m-%d")
+
+
+def _percentiles(values: List[int]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None}
+    p50, p95 = np.percentile(np.asarray(values, dtype=float), [50, 95])
+    return {"p50": float(p50), "p95": float(p95)}
+
+
+def summarize(table: Dict[str, list], group_by: List[str], period: str) -> List[Dict]:
+    """期間・グループごとの件数、失敗率、所要時間のp50/p95"""
+    groups = defaultdict(lambda: {"count": 0, "failures": 0, "durations": []})
+    for i in range(len(table["run_id"])):
+        key = (period_key(table["started_at"][i], period),) + tuple(table[name][i] for name in group_by)
+        group = groups[key]
+        group["count"] += 1
+        group["failures"] += table["status"][i] == "failure"
+        if table["duration_seconds"][i] is not None:
+            group["durations"].append(table["duration_seconds"][i])
+
+    results = []
+    for key, group in sorted(groups.items(), key=lambda item: tuple(str(k) for k in item[0])):
+        results.append({
+            "period": key[0],
+            **dict(zip(group_by, key[1:])),
+            "count": group["count"],
+            "failure_rate": group["failures"] / group["count"],
+            **_percentiles(group["durations"]),
+        })
+    return results
+
+
+def _format_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    minutes, seconds = divmod(int(round(value)), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+def format_report(rows: List[Dict], label: str) -> str:
+    lines = [f"| 期間 | {label} | 件数 | 失敗率 | p50 | p95 |", "|---|---|---:|---:|---:|---:|"]
+    for row in rows:
+        name = row.get("unit") or row.get("workflow") or "(全体)"
+        lines.append(f"| {row['period']} | {name} | {row['count']} | {row['failure_rate']:.0%} | "
+                     f"{_format_seconds(row['p50'])} | {_format_seconds(row['p95'])} |")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='実行ログからRunメトリクスを抽出・集計')
+    parser.add_argument('--metrics-dir', type=Path, default=DEFAULT_METRICS_DIR, help='メトリクスの保存先')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    extract_parser = subparsers.add_parser('extract', help='実行ログからメトリクスを抽出')
+    extract_parser.add_argument('--logs-dir', type=Path, default=DEFAULT_LOGS_DIR, help='実行ログのディレクトリ')
+
+    report_parser = subparsers.add_parser('report', help='ユニットごとの所要時間と失敗率')
+    report_parser.add_argument('--period', choices=['day', 'week', 'month'], default='week', help='集計期間（デフォルト week）')
+    report_parser.add_argument('--unit', help='ユニット名の部分一致で絞り込み')
+    report_parser.add_argument('--json', action='store_true', help='JSONで出力')
+
+    args = parser.parse_args()
+
+    if args.command == 'extract':
+        log_files = [p for p in args.logs_dir.glob("execution-log-*.md")]
+        extractor = RunMetricsExtractor().extract(log_files)
+        runs_path = write_table(extractor.run_rows(), RUN_COLUMNS, args.metrics_dir / "runs")
+        steps_path = write_table(extractor.steps, STEP_COLUMNS, args.metrics_dir / "steps")
+        print(f"📁 {len(log_files)}個のログファイルから抽出")
+        print(f"✅ Run: {len(extractor.runs)}件 → {runs_path}")
+        print(f"✅ ステップ: {len(extractor.steps)}件 → {steps_path}")
+
+    elif args.command == 'report':
+        runs = read_table(args.metrics_dir / "runs", RUN_COLUMNS)
+        steps = read_table(args.metrics_dir / "steps", STEP_COLUMNS)
+        if args.unit:
+            keep = [i for i, unit in enumerate(steps["unit"]) if args.unit.lower() in unit.lower()]
+            steps = {name: [values[i] for i in keep] for name, values in steps.items()}
+
+        run_summary = summarize(runs, [], args.period)
+        unit_summary = summarize(steps, ["unit"], args.period)
+        if args.json:
+            print(json.dumps({"runs": run_summary, "units": unit_summary}, ensure_ascii=False, indent=2))
+        else:
+            print("## 📊 Run全体\n")
+            print(format_report(run_summary, "対象"))
+            print("\n## 🧩 ユニット別\n")
+            print(format_report(unit_summary, "ユニット"))
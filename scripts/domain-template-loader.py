@@ -12,6 +12,8 @@ import argparse
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
+from mcp_service_catalog import McpServiceCatalog, DEFAULT_LOGS_DIR
+
 # GitHub Actionsのステップあたりの文字数制限
 MAX_CHARS_PER_STEP = 21000
 # 安全マージン（YAMLシンタックスやエスケープ文字のため）
@@ -23,6 +25,7 @@ class DomainTemplateLoader:
         self.templates_dir = Path(templates_dir)
         self.index_path = self.templates_dir / "index.yaml"
         self.index_data = self._load_index()
+        self._service_catalog = None
     
     def _load_index(self) -> Dict[str, Any]:
         """インデックスファイルを読み込む"""
@@ -282,7 +285,8 @@ class DomainTemplateLoader:
         
         return key_info
     
-    def get_domain_summary_for_task_decomposition(self, domain: str) -> Dict[str, Any]:
+    def get_domain_summary_for_task_decomposition(self, domain: str, time_budget_seconds: Optional[float] = None,
+                                                  fan_out: int = 1) -> Dict[str, Any]:
         """タスク分解用に詳細な情報を保持したドメインサマリーを取得"""
         
         # 各YAMLファイルから完全な情報を読み込み
@@ -334,7 +338,8 @@ class DomainTemplateLoader:
             # 実装リソース情報
             "implementation_resources": {
                 "minimal_units_list": domain_info.get('minimal_units', []),
-                "recommended_mcp_services": self._get_recommended_mcp_services(domain),
+                "recommended_mcp_services": self._get_recommended_mcp_services(domain, time_budget_seconds, fan_out),
+                "mcp_service_plan": self.plan_mcp_services(domain, time_budget_seconds, fan_out),
                 "external_apis": self._get_recommended_external_apis(domain)
             },
             
@@ -347,8 +352,28 @@ class DomainTemplateLoader:
             }
         }
     
-    def _get_recommended_mcp_services(self, domain: str) -> List[str]:
-        """ドメインに応じて推奨されるMCPサービスを返す"""
+    @property
+    def service_catalog(self) -> McpServiceCatalog:
+        """MCPサービスカタログ（初回利用時に実行ログの観測値も読み込む）"""
+        if self._service_catalog is None:
+            logs_dir = DEFAULT_LOGS_DIR if os.path.isdir(DEFAULT_LOGS_DIR) else None
+            self._service_catalog = McpServiceCatalog(str(self.templates_dir / "common" / "mcp-services.yaml"), logs_dir)
+        return self._service_catalog
+
+    def plan_mcp_services(self, domain: str, time_budget_seconds: Optional[float] = None,
+                          fan_out: int = 1) -> Dict[str, Any]:
+        """推奨サービスを時間予算に収まるように置き換えた構成と推定所要時間を返す"""
+        return self.service_catalog.select_services(self._base_mcp_services(domain), time_budget_seconds, fan_out)
+
+    def _get_recommended_mcp_services(self, domain: str, time_budget_seconds: Optional[float] = None,
+                                      fan_out: int = 1) -> List[str]:
+        """ドメインに応じて推奨されるMCPサービスを返す（時間予算があれば予算内の構成）"""
+        if time_budget_seconds is None:
+            return self._base_mcp_services(domain)
+        return self.plan_mcp_services(domain, time_budget_seconds, fan_out)['services']
+
+    def _base_mcp_services(self, domain: str) -> List[str]:
+        """ドメインごとの品質優先の推奨MCPサービス"""
         mcp_mapping = {
             "video-production": ["t2i-google-imagen3", "i2v-fal-hailuo-02-pro", "t2s-fal-minimax-speech-02-turbo", "v2v-fal-creatify-lipsync"],
             "3d-modeling": ["t2i-google-imagen3", "i2i3d-fal-hunyuan3d-v21"],
@@ -401,6 +426,8 @@ def main():
     parser.add_argument('--chunk', type=str, help='Chunk type to load')
     parser.add_argument('--section', type=str, help='Specific section to load')
     parser.add_argument('--output', type=str, help='Output file path')
+    parser.add_argument('--time-budget', type=float, help='Wall-clock budget in minutes for MCP service selection')
+    parser.add_argument('--fan-out', type=int, default=1, help='Items per media stage (e.g. scene count)')
     
     args = parser.parse_args()
     
@@ -455,7 +482,8 @@ def main():
             print("Error: --domain is required for summary-for-decomposition action")
             sys.exit(1)
         
-        result = loader.get_domain_summary_for_task_decomposition(args.domain)
+        time_budget = args.time_budget * 60 if args.time_budget is not None else None
+        result = loader.get_domain_summary_for_task_decomposition(args.domain, time_budget, args.fan_out)
     
     # 結果を出力
     if args.output:
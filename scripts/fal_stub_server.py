@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+FAL.ai ストレージのスタブサーバー
+fal_upload_helper.py をネットワークなしで動作確認するためのローカルHTTPサーバー
+
+- POST /storage/upload : multipart の file を保存し {"url": ".../files/<id>/<name>"} を返す
+- 分割アップロード:
+    POST /storage/upload/multipart/initiate              -> {"upload_id"}
+    PUT  /storage/upload/multipart/<upload_id>/parts/<n> -> {"etag"}（パートのMD5）
+    POST /storage/upload/multipart/<upload_id>/complete  -> {"url"}（パートを番号順に連結）
+- GET  /files/<id>/<name> : 保存したファイルを返す（Range: bytes=a-b に対応、ETagつき。HEADにも対応）
+- --fail-every N : N回に1回 503 を返す（リトライの確認用）
+- --no-ranges : Range を無視して常に全体を返す（1本のストリームへのフォールバックの確認用）
+- --drop-every N : ファイル取得のN回に1回、半分だけ送って接続を切る（ダウンロード再開の確認用）
+- --delay 秒 : 応答までの待ち時間（並行アップロードの確認用）
+- --no-multipart : 分割アップロードのAPIを 404 にする（1回のPOSTへのフォールバックの確認用）
+
+使い方:
+  python scripts/fal_stub_server.py --port 8765
+  FAL_KEY=dummy FAL_UPLOAD_URL=http://127.0.0.1:8765/storage/upload python scripts/fal_upload_helper.py a.png
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import uuid
+import tempfile
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote, unquote, urlparse
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BUFFER_SIZE = 1024 * 1024
+
+
+class FalStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, storage_dir: Path, fail_every: int = 0, delay: float = 0.0,
+                 ranges: bool = True, drop_every: int = 0, multipart: bool = True):
+        super().__init__(address, FalStubHandler)
+        self.storage_dir = Path(storage_dir)
+        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.fail_every = fail_every
+        self.delay = delay
+        self.ranges = ranges
+        self.drop_every = drop_every
+        self.multipart = multipart
+        self.requests_seen = 0
+        self.file_gets = 0
+        self.part_puts = 0
+        self.multipart_uploads = {}  # upload_id -> file_name
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            self.requests_seen += 1
+            return bool(self.fail_every) and self.requests_seen % self.fail_every == 0
+
+    def should_drop(self) -> bool:
+        with self.lock:
+            self.file_gets += 1
+            return bool(self.drop_every) and self.file_gets % self.drop_every == 0
+
+
+class FalStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: FalStubServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _check_request(self) -> bool:
+        """認証と障害の注入。応答済みならFalse"""
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if not (self.headers.get('Authorization') or '').startswith('Key '):
+            self._send_json(401, {'detail': 'missing FAL key'})
+            return False
+        if self.server.should_fail():
+            self._send_json(503, {'detail': 'injected failure'}, {'Retry-After': '0'})
+            return False
+        return True
+
+    def _store(self, name: str, data: bytes) -> str:
+        file_id = uuid.uuid4().hex
+        path = self.server.storage_dir / file_id / name
+        path.parent.mkdir(parents=True)
+        path.write_bytes(data)
+        return f"{self.server.base_url}/files/{file_id}/{quote(name)}"
+
+    def _multipart_dir(self, upload_id: str) -> Path:
+        return self.server.storage_dir / '_multipart' / upload_id
+
+    def do_POST(self):
+        body = self._read_body()
+        path = urlparse(self.path).path
+        if path.startswith('/storage/upload/multipart/'):
+            if not self.server.multipart:
+                self._send_json(404, {'detail': 'not found'})
+            elif self._check_request():
+                self._handle_multipart_post(path.split('/')[4:], body)
+            return
+        if path != '/storage/upload':
+            self._send_json(404, {'detail': 'not found'})
+            return
+        if not self._check_request():
+            return
+
+        header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode('latin-1')
+        message = BytesParser(policy=HTTP).parsebytes(header + body)
+        for part in message.iter_parts() if message.is_multipart() else []:
+            if part.get_param('name', header='content-disposition') == 'file':
+                name = os.path.basename(part.get_filename() or 'upload.bin')
+                self._send_json(200, {'url': self._store(name, part.get_payload(decode=True) or b'')})
+                return
+        self._send_json(400, {'detail': 'multipart field "file" is required'})
+
+    def _handle_multipart_post(self, parts, body: bytes):
+        if parts == ['initiate']:
+            request = json.loads(body or b'{}')
+            upload_id = uuid.uuid4().hex
+            self._multipart_dir(upload_id).mkdir(parents=True)
+            with self.server.lock:
+                self.server.multipart_uploads[upload_id] = os.path.basename(request.get('file_name') or 'upload.bin')
+            self._send_json(200, {'upload_id': upload_id})
+            return
+
+        if len(parts) == 2 and parts[1] == 'complete' and parts[0] in self.server.multipart_uploads:
+            upload_dir = self._multipart_dir(parts[0])
+            data = bytearray()
+            for part in json.loads(body or b'{}').get('parts', []):
+                part_path = upload_dir / str(part['part_number'])
+                if not part_path.is_file():
+                    self._send_json(400, {'detail': f"part {part['part_number']} is missing"})
+                    return
+                chunk = part_path.read_bytes()
+                if hashlib.md5(chunk).hexdigest() != part['etag']:
+                    self._send_json(400, {'detail': f"etag mismatch for part {part['part_number']}"})
+                    return
+                data += chunk
+            with self.server.lock:
+                name = self.server.multipart_uploads.pop(parts[0])
+            self._send_json(200, {'url': self._store(name, bytes(data))})
+            return
+
+        self._send_json(404, {'detail': 'unknown upload'})
+
+    def do_PUT(self):
+        body = self._read_body()
+        parts = urlparse(self.path).path.split('/')
+        if not self.server.multipart:
+            self._send_json(404, {'detail': 'not found'})
+            return
+        # /storage/upload/multipart/<upload_id>/parts/<n>
+        if (len(parts) != 7 or parts[1:4] != ['storage', 'upload', 'multipart'] or parts[5] != 'parts'
+                or not parts[6].isdigit()):
+            self._send_json(404, {'detail': 'not found'})
+            return
+        if not self._check_request():
+            return
+        if parts[4] not in self.server.multipart_uploads:
+            self._send_json(404, {'detail': 'unknown upload'})
+            return
+        (self._multipart_dir(parts[4]) / parts[6]).write_bytes(body)
+        with self.server.lock:
+            self.server.part_puts += 1
+        self._send_json(200, {'etag': hashlib.md5(body).hexdigest()})
+
+    def do_HEAD(self):
+        self._send_file(head_only=True)
+
+    def do_GET(self):
+        self._send_file()
+
+    def _send_file(self, head_only: bool = False):
+        parts = unquote(urlparse(self.path).path).split('/')
+        # /files/<id>/<name>
+        if len(parts) != 4 or parts[1] != 'files' or '..' in parts:
+            self._send_json(404, {'detail': 'not found'})
+            return
+        path = self.server.storage_dir / parts[2] / parts[3]
+        if not path.is_file():
+            self._send_json(404, {'detail': 'not found'})
+            return
+
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        match = RANGE_PATTERN.match(self.headers.get('Range', '')) if self.server.ranges else None
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(end, int(match.group(2))) if match.group(2) else end
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        length = end - start + 1
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(length))
+        self.send_header('ETag', f'"{parts[2]}"')
+        if self.server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        if head_only:
+            return
+
+        # 障害の注入: 半分だけ送って接続を切る
+        if self.server.should_drop():
+            length //= 2
+            self.close_connection = True
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while length > 0:
+                block = f.read(min(STREAM_BUFFER_SIZE, length))
+                if not block:
+                    break
+                self.wfile.write(block)
+                length -= len(block)
+
+
+def start_stub_server(port: int = 0, storage_dir: Path = None, **options) -> FalStubServer:
+    """バックグラウンドスレッドでスタブサーバーを起動（port=0 なら空いているポート）"""
+    server = FalStubServer(('127.0.0.1', port), storage_dir or Path(tempfile.mkdtemp(prefix='fal-stub-')),
+                           **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Local stub of the FAL.ai storage API')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--storage-dir', help='Directory for uploaded files (default: temporary directory)')
+    parser.add_argument('--fail-every', type=int, default=0, help='Return 503 on every Nth request')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before each response')
+    parser.add_argument('--no-ranges', action='store_true', help='Ignore Range headers on file downloads')
+    parser.add_argument('--drop-every', type=int, default=0,
+                        help='Cut every Nth file download off halfway through the body')
+    parser.add_argument('--no-multipart', action='store_true', help='Answer the multipart upload API with 404')
+    args = parser.parse_args()
+
+    storage_dir = Path(args.storage_dir) if args.storage_dir else Path(tempfile.mkdtemp(prefix='fal-stub-'))
+    server = FalStubServer(('127.0.0.1', args.port), storage_dir, args.fail_every, args.delay,
+                           ranges=not args.no_ranges, drop_every=args.drop_every,
+                           multipart=not args.no_multipart)
+    print(f"🧪 FAL stub server: {server.base_url}/storage/upload (storage: {storage_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
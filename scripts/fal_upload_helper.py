@@ -2,13 +2,169 @@
 """
 FAL.ai アップロードヘルパー
 ローカルファイルをFAL.aiにアップロードするための共通機能
+
+- 接続は共有の requests.Session で使い回す（コネクションプール）
+- 429 / 5xx はバックオフ付きでリトライ、すべての通信にタイムアウトを設定
+- upload_many で複数ファイルをスレッドプールで並行アップロード
+- CHUNKED_UPLOAD_THRESHOLD 以上のファイルは固定サイズのパートに分けて送る（再開可能）
+  完了したパートはファイル横の状態ファイル（<file>.fal-upload.json）に記録し、
+  接続が切れても次回は残りのパートから再開する
+  分割アップロードのAPIがないエンドポイント（initiate が 404 / 405 / 501）では1回のPOSTで送る
+- download_file はサーバーがRangeに対応していれば区間ごとに並列取得し、
+  事前に確保したファイルへ os.pwrite で書き込む（途中のファイルからの再開、サイズ・SHA-256の検証つき）
+- アップロード済みのURLはファイルのSHA-256をキーに .cache/fal-uploads に保存し、
+  同じ内容のファイルは有効期限内ならアップロードせずにそのURLを返す（CIではディレクトリごとキャッシュして引き継ぐ）
+- AsyncFalClient / async_upload_file / async_download_file で、1つのイベントループから多数の転送を並行させる
+  （同期版を専用のスレッドプールで実行する薄いラッパー）
+
+エンドポイントは環境変数 FAL_UPLOAD_URL で差し替えられる（ローカルのスタブサーバーでの確認用）:
+  python scripts/fal_stub_server.py --port 8765 &
+  FAL_KEY=dummy FAL_UPLOAD_URL=http://127.0.0.1:8765/storage/upload python scripts/fal_upload_helper.py a.png b.png
 """
 
 import os
 import sys
-import requests
 import json
+import asyncio
+import functools
+import shutil
+import hashlib
+import time
+import threading
 from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from urllib3.util.retry import Retry
+
+from atomic_io import write_json_atomic
+
+DEFAULT_UPLOAD_URL = "https://api.fal.ai/storage/upload"
+# (接続, 読み込み) のタイムアウト秒数
+DEFAULT_TIMEOUT = (10, 300)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_WORKERS = 4
+POOL_SIZE = 16
+# これ以上のサイズは分割アップロード（1パートずつディスクから読み出して送る）
+CHUNKED_UPLOAD_THRESHOLD = 64 * 1024 * 1024
+PART_SIZE = 16 * 1024 * 1024
+PART_RETRIES = 3
+# 分割アップロードのAPIがないことを示す initiate の応答（1回のPOSTに切り替える）
+MULTIPART_UNSUPPORTED_STATUSES = (404, 405, 501)
+STATE_SUFFIX = '.fal-upload.json'
+# 並列ダウンロードの同時接続数・1区間のサイズ・1回の読み書きのサイズ
+DOWNLOAD_WORKERS = 4
+SEGMENT_SIZE = 8 * 1024 * 1024
+BUFFER_SIZE = 1024 * 1024
+SEGMENT_RETRIES = 3
+PARTIAL_SUFFIX = '.part'
+# アップロード済みURLのキャッシュ（空文字で無効）と有効期限（秒）
+DEFAULT_UPLOAD_CACHE_DIR = os.environ.get('FAL_UPLOAD_CACHE_DIR', '.cache/fal-uploads')
+DEFAULT_UPLOAD_CACHE_TTL = int(os.environ.get('FAL_UPLOAD_CACHE_TTL', 7 * 24 * 3600))
+
+_session = None
+_session_lock = threading.Lock()
+_multipart_unsupported = set()  # 分割アップロードに対応していなかったエンドポイント
+_upload_cache = None
+
+def create_session(retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, pool_size=POOL_SIZE):
+    """
+    リトライとコネクションプールを設定したSessionを作成
+
+    429 / 5xx と接続エラーは指数バックオフでリトライする（Retry-After があればそれに従う）。
+    アップロードのPOSTもリトライ対象に含める（同じファイルの再送なので副作用はない）。
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD', 'POST', 'PUT']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session():
+    """プロセス内で共有するSession（スレッド間で共有してよい）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+class UploadCache:
+    """
+    ファイルのSHA-256 → アップロード済みURL のキャッシュ（1件1ファイルのJSON）
+
+    1件ずつ一時ファイル経由で書き込むので、並列のスレッド・プロセスから使っても壊れない。
+    アップロード先（FAL_UPLOAD_URL）が違うURLは使わない。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_UPLOAD_CACHE_DIR, ttl=DEFAULT_UPLOAD_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    def get(self, digest, endpoint):
+        """有効期限内のURL（なければNone。期限切れのエントリは削除）"""
+        path = self._path(digest)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('endpoint') != endpoint:
+            return None
+        if time.time() - entry.get('uploaded_at', 0) > self.ttl:
+            self.discard(digest)
+            return None
+        return entry.get('url')
+
+    def put(self, digest, endpoint, url, size):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_json_atomic(path, {
+            'url': url,
+            'endpoint': endpoint,
+            'size': size,
+            'uploaded_at': time.time()
+        })
+
+    def discard(self, digest):
+        try:
+            os.unlink(self._path(digest))
+        except OSError:
+            pass
+
+def get_upload_cache():
+    """プロセス内で共有するアップロードキャッシュ（FAL_UPLOAD_CACHE_DIR が空なら None）"""
+    global _upload_cache
+    if _upload_cache is None and DEFAULT_UPLOAD_CACHE_DIR:
+        _upload_cache = UploadCache()
+    return _upload_cache
+
+def is_url_alive(url, session=None, timeout=DEFAULT_TIMEOUT):
+    """HEADリクエストでURLがまだ取得できるかを確認"""
+    try:
+        response = (session or get_session()).head(url, allow_redirects=True, timeout=timeout)
+        return response.status_code == 200
+    except requests.RequestException:
+        return False
+
+def get_upload_url():
+    """アップロードAPIのエンドポイント（FAL_UPLOAD_URL で上書き可能）"""
+    return os.environ.get('FAL_UPLOAD_URL') or DEFAULT_UPLOAD_URL
 
 def setup_fal_client():
     """
@@ -18,17 +174,24 @@ def setup_fal_client():
     if not fal_key:
         print("❌ FAL_KEY環境変数が設定されていません")
         return False
-    
+
     print(f"✅ FAL APIキーが設定されています")
     return True
 
-def upload_file(file_path):
+def upload_file(file_path, session=None, timeout=DEFAULT_TIMEOUT, chunked=None, part_size=PART_SIZE,
+                use_cache=True, verify_cache=False):
     """
     ファイルをFAL.aiにアップロード
-    
+
     Args:
         file_path (str): アップロードするファイルのパス
-        
+        session (requests.Session): 使用するSession（省略時は共有Session）
+        timeout: (接続, 読み込み) のタイムアウト秒数
+        chunked (bool): 分割アップロードするか（省略時はサイズが CHUNKED_UPLOAD_THRESHOLD 以上なら分割）
+        part_size (int): 分割アップロードの1パートのサイズ
+        use_cache (bool): 同じ内容のファイルのアップロード済みURLがあればそれを返す
+        verify_cache (bool): キャッシュのURLを返す前にHEADリクエストで取得できることを確認
+
     Returns:
         str: アップロードされたファイルのURL、失敗時はNone
     """
@@ -36,83 +199,549 @@ def upload_file(file_path):
     if not fal_key:
         print("❌ FAL_KEY環境変数が設定されていません")
         return None
-    
+
+    session = session or get_session()
+
     try:
         # ファイルサイズ確認
         file_size = os.path.getsize(file_path)
-        print(f"📁 ファイルサイズ: {file_size / (1024 * 1024):.2f} MB")
-        
-        # FAL.ai Upload API エンドポイント
-        upload_url = "https://api.fal.ai/storage/upload"
-        
+        print(f"📁 ファイルサイズ: {file_size / (1024 * 1024):.2f} MB ({os.path.basename(file_path)})")
+
+        # 同じ内容のファイルをアップロード済みならそのURLを使う
+        endpoint = get_upload_url()
+        cache, digest, cached_url = _lookup_upload_cache(file_path, endpoint, use_cache)
+        if cached_url:
+            if not verify_cache or is_url_alive(cached_url, session, timeout):
+                print(f"♻️ アップロード済みのURLを使用: {cached_url}")
+                return cached_url
+            cache.discard(digest)
+
         headers = {
             'Authorization': f'Key {fal_key}',
         }
-        
-        # ファイルアップロード
-        with open(file_path, 'rb') as f:
-            files = {
-                'file': (os.path.basename(file_path), f, 'application/octet-stream')
-            }
-            
-            print(f"🚀 FAL.aiにアップロード中...")
-            response = requests.post(upload_url, headers=headers, files=files)
-        
-        if response.status_code == 200:
-            result = response.json()
-            uploaded_url = result.get('url')
-            print(f"✅ アップロード成功: {uploaded_url}")
-            return uploaded_url
-        else:
-            print(f"❌ アップロード失敗: {response.status_code}")
-            print(f"Response: {response.text}")
-            return None
-            
+
+        if chunked is None:
+            chunked = file_size >= CHUNKED_UPLOAD_THRESHOLD and endpoint not in _multipart_unsupported
+        uploaded_url = None
+        if chunked:
+            try:
+                uploaded_url = _upload_chunked(file_path, file_size, headers, session, timeout, part_size)
+            except _MultipartUnsupported as e:
+                # 分割アップロードのAPIがないエンドポイント: 以降は最初から1回のPOSTで送る
+                _multipart_unsupported.add(endpoint)
+                print(f"⚠️ 分割アップロード非対応（{e}）のため1回のPOSTで送信します")
+                chunked = False
+        if not chunked:
+            uploaded_url = _upload_single(file_path, endpoint, headers, session, timeout)
+
+        if uploaded_url and cache:
+            cache.put(digest, endpoint, uploaded_url, file_size)
+        return uploaded_url
+
     except Exception as e:
         print(f"❌ アップロードエラー: {str(e)}")
         return None
 
-def download_file(url, local_path):
+def _upload_single(file_path, endpoint, headers, session, timeout):
+    """
+    ファイル全体を1回のmultipart/form-dataのPOSTで送る（URL、失敗時はNone）
+    """
+    with open(file_path, 'rb') as f:
+        files = {
+            'file': (os.path.basename(file_path), f, 'application/octet-stream')
+        }
+
+        print(f"🚀 FAL.aiにアップロード中...")
+        response = session.post(endpoint, headers=headers, files=files, timeout=timeout)
+
+    if response.status_code != 200:
+        print(f"❌ アップロード失敗: {response.status_code}")
+        print(f"Response: {response.text}")
+        return None
+    uploaded_url = response.json().get('url')
+    print(f"✅ アップロード成功: {uploaded_url}")
+    return uploaded_url
+
+def _lookup_upload_cache(file_path, endpoint, use_cache):
+    """
+    (キャッシュ, ファイルのSHA-256, キャッシュ済みURL) を返す（キャッシュを使わなければすべてNone）
+    """
+    cache = get_upload_cache() if use_cache else None
+    if not cache:
+        return None, None, None
+    digest = file_sha256(file_path)
+    return cache, digest, cache.get(digest, endpoint)
+
+class _MultipartUnsupported(Exception):
+    """
+    エンドポイントが分割アップロードに対応していない
+    """
+
+class _PartReader:
+    """
+    ファイルの一部（offset から length バイト）だけを読むファイルオブジェクト
+
+    パートをメモリに読み込まずにそのままリクエストボディとして流す。
+    tell/seek があるので、リトライ時にurllib3がパートの先頭まで巻き戻せる。
+    """
+
+    def __init__(self, f, offset, length):
+        self._f = f
+        self._offset = offset
+        self._length = length
+        self._pos = 0
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        remaining = self._length - self._pos
+        if remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        self._f.seek(self._offset + self._pos)
+        data = self._f.read(size)
+        self._pos += len(data)
+        return data
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=0):
+        base = {0: 0, 1: self._pos, 2: self._length}[whence]
+        self._pos = max(0, min(self._length, base + pos))
+        return self._pos
+
+def _state_path(file_path):
+    return f"{file_path}{STATE_SUFFIX}"
+
+def _load_upload_state(file_path, file_size, part_size, endpoint):
+    """
+    前回の分割アップロードの状態（同じファイル・同じ設定のときだけ再開する）
+    """
+    try:
+        with open(_state_path(file_path), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(file_path)
+    if (state.get('size'), state.get('mtime_ns'), state.get('part_size'), state.get('endpoint')) != \
+            (file_size, stat.st_mtime_ns, part_size, endpoint):
+        return None
+    return state
+
+def _upload_chunked(file_path, file_size, headers, session, timeout, part_size, restarted=False):
+    """
+    固定サイズのパートに分けてアップロード（中断後は完了済みのパートを飛ばして再開）
+
+    エンドポイント（アップロードURLの下）:
+        POST {upload}/multipart/initiate               -> {"upload_id"}
+        PUT  {upload}/multipart/{upload_id}/parts/{n}  -> {"etag"}
+        POST {upload}/multipart/{upload_id}/complete   -> {"url"}
+
+    initiate が 404 / 405 / 501 なら _MultipartUnsupported を送出する（呼び出し元が1回のPOSTで送り直す）。
+    パートの送信中にアップロードがサーバー側で破棄されていたら（404）、新しい upload_id で1回だけやり直す。
+    """
+    endpoint = get_upload_url()
+    base_url = f"{endpoint.rstrip('/')}/multipart"
+    part_count = max(1, -(-file_size // part_size))
+
+    state = _load_upload_state(file_path, file_size, part_size, endpoint)
+    if state:
+        print(f"🔁 分割アップロードを再開: {len(state['parts'])}/{part_count} パート完了済み")
+    else:
+        response = session.post(f"{base_url}/initiate", headers=headers, timeout=timeout, json={
+            'file_name': os.path.basename(file_path),
+            'content_type': 'application/octet-stream',
+            'size': file_size,
+            'part_size': part_size
+        })
+        if response.status_code in MULTIPART_UNSUPPORTED_STATUSES:
+            raise _MultipartUnsupported(f"{response.status_code}")
+        if response.status_code != 200:
+            print(f"❌ 分割アップロード開始失敗: {response.status_code}")
+            print(f"Response: {response.text}")
+            return None
+        state = {
+            'upload_id': response.json()['upload_id'],
+            'endpoint': endpoint,
+            'size': file_size,
+            'mtime_ns': os.stat(file_path).st_mtime_ns,
+            'part_size': part_size,
+            'parts': {}
+        }
+        write_json_atomic(_state_path(file_path), state)
+    upload_url = f"{base_url}/{state['upload_id']}"
+
+    print(f"🚀 FAL.aiに分割アップロード中... ({part_count} パート)")
+    expired = False
+    with open(file_path, 'rb') as f:
+        for part_number in range(1, part_count + 1):
+            if str(part_number) in state['parts']:
+                continue
+            offset = (part_number - 1) * part_size
+            length = min(part_size, file_size - offset)
+            for attempt in range(PART_RETRIES):
+                try:
+                    response = session.put(
+                        f"{upload_url}/parts/{part_number}", data=_PartReader(f, offset, length),
+                        headers={**headers, 'Content-Type': 'application/octet-stream',
+                                 'Content-Length': str(length)},
+                        timeout=timeout)
+                except requests.RequestException as e:
+                    response, error = None, str(e)
+                else:
+                    error = f"{response.status_code} {response.text[:200]}"
+                    if response.status_code == 200:
+                        break
+                    if response.status_code == 404:
+                        break
+            if response is not None and response.status_code == 404:
+                # サーバー側でアップロードが破棄された（期限切れなど）: 状態を消して最初からやり直す
+                os.unlink(_state_path(file_path))
+                expired = True
+                break
+            if response is None or response.status_code != 200:
+                print(f"❌ パート {part_number}/{part_count} のアップロード失敗: {error}")
+                return None
+            state['parts'][str(part_number)] = response.json()['etag']
+            write_json_atomic(_state_path(file_path), state)
+            print(f"  📦 パート {part_number}/{part_count} 完了")
+
+    if expired:
+        if restarted:
+            print(f"❌ 分割アップロードがサーバー側で破棄されました（upload_id {state['upload_id']}）")
+            return None
+        print(f"🔁 分割アップロードがサーバー側で破棄されたため、新しいアップロードとしてやり直します")
+        return _upload_chunked(file_path, file_size, headers, session, timeout, part_size, restarted=True)
+
+    parts = [{'part_number': int(n), 'etag': etag}
+             for n, etag in sorted(state['parts'].items(), key=lambda item: int(item[0]))]
+    response = session.post(f"{upload_url}/complete", headers=headers, json={'parts': parts}, timeout=timeout)
+    if response.status_code != 200:
+        print(f"❌ 分割アップロード完了失敗: {response.status_code}")
+        print(f"Response: {response.text}")
+        return None
+
+    os.unlink(_state_path(file_path))
+    uploaded_url = response.json().get('url')
+    print(f"✅ アップロード成功: {uploaded_url}")
+    return uploaded_url
+
+def upload_many(paths: Iterable[str], workers: int = DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT,
+                use_cache=True, verify_cache=False) -> Dict[str, Optional[str]]:
+    """
+    複数ファイルをスレッドプールで並行アップロード
+
+    Args:
+        paths: アップロードするファイルのパス
+        workers (int): 同時アップロード数
+        timeout: (接続, 読み込み) のタイムアウト秒数
+        use_cache (bool) / verify_cache (bool): upload_file と同じ
+
+    Returns:
+        dict: パス → アップロードされたURL（失敗したものはNone）。順序は入力の順
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    paths = list(dict.fromkeys(str(p) for p in paths))
+    if not paths:
+        return {}
+    session = get_session()
+    workers = max(1, min(workers, len(paths)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        urls = executor.map(lambda path: upload_file(path, session=session, timeout=timeout, use_cache=use_cache,
+                                                     verify_cache=verify_cache), paths)
+        return dict(zip(paths, urls))
+
+def download_file(url, local_path, session=None, timeout=DEFAULT_TIMEOUT, workers=DOWNLOAD_WORKERS,
+                  expected_sha256=None):
     """
     URLからファイルをダウンロード
-    
+
+    Range に対応したサーバーからは SEGMENT_SIZE ごとの区間を並列に取得して <local_path>.part に書き込み、
+    完了した区間を <local_path>.part.json に記録する（中断しても次回は残りの区間から再開）。
+    Range に対応していなければ1本のストリームで取得する。
+
     Args:
         url (str): ダウンロード元URL
         local_path (str): 保存先パス
-        
+        session (requests.Session): 使用するSession（省略時は共有Session）
+        timeout: (接続, 読み込み) のタイムアウト秒数
+        workers (int): 並列ダウンロードの同時接続数
+        expected_sha256 (str): 指定すればダウンロード後にSHA-256を検証
+
     Returns:
         bool: 成功時True、失敗時False
     """
+    session = session or get_session()
+    partial_path = f"{local_path}{PARTIAL_SUFFIX}"
+
     try:
         print(f"📥 ダウンロード中: {url}")
-        response = requests.get(url, stream=True)
-        
-        if response.status_code == 200:
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            file_size = os.path.getsize(local_path)
-            print(f"✅ ダウンロード完了: {local_path} ({file_size} bytes)")
-            return True
+        # 先頭1バイトのRange要求で、Range対応とサイズを調べる（非対応なら全体が返るのでそのまま使う）
+        response = session.get(url, headers={'Range': 'bytes=0-0', 'Accept-Encoding': 'identity'},
+                               stream=True, timeout=timeout)
+        content_range = response.headers.get('Content-Range', '')
+        total = content_range.rsplit('/', 1)[-1]
+
+        if response.status_code == 206 and total.isdigit() and hasattr(os, 'pwrite'):
+            response.close()
+            total = int(total)
+            validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            _download_ranged(url, partial_path, total, validator, session, timeout, workers)
+        elif response.status_code == 416 and total == '0':
+            # 空のファイルには満たせる範囲がないため 416（Content-Range: bytes */0）が返る
+            response.close()
+            total = 0
+            open(partial_path, 'wb').close()
+        elif response.status_code in (200, 206, 416):
+            if response.status_code != 200:
+                # サイズが不明、pwriteが使えない、または範囲を受け付けない場合は全体を1本のストリームで取り直す
+                response.close()
+                response = session.get(url, headers={'Accept-Encoding': 'identity'}, stream=True, timeout=timeout)
+                response.raise_for_status()
+            total = response.headers.get('Content-Length')
+            total = int(total) if total and total.isdigit() else None
+            with response:
+                response.raw.decode_content = True
+                with open(partial_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, BUFFER_SIZE)
         else:
+            response.close()
             print(f"❌ ダウンロード失敗: {response.status_code}")
             return False
-            
+
+        file_size = os.path.getsize(partial_path)
+        if total is not None and file_size != total:
+            print(f"❌ サイズ不一致: {file_size} bytes（期待値 {total} bytes）")
+            _remove_partial(partial_path)
+            return False
+        if expected_sha256:
+            digest = file_sha256(partial_path)
+            if digest != expected_sha256.lower():
+                print(f"❌ SHA-256不一致: {digest}（期待値 {expected_sha256}）")
+                _remove_partial(partial_path)
+                return False
+
+        os.replace(partial_path, local_path)
+        _remove_partial(partial_path)
+        print(f"✅ ダウンロード完了: {local_path} ({file_size} bytes)")
+        return True
+
     except Exception as e:
+        # 途中までのファイルと状態は残し、次回はそこから再開する
         print(f"❌ ダウンロードエラー: {str(e)}")
         return False
 
-if __name__ == "__main__":
-    # テスト実行
-    if len(sys.argv) > 1:
-        test_file = sys.argv[1]
-        if setup_fal_client():
-            result = upload_file(test_file)
-            if result:
-                print(f"テストアップロード成功: {result}")
+def _download_ranged(url, partial_path, total, validator, session, timeout, workers):
+    """
+    区間ごとにRange要求を並列に出し、事前に確保したファイルの該当位置へ書き込む
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    state_path = f"{partial_path}.json"
+    segment_count = max(1, -(-total // SEGMENT_SIZE))
+    state = None
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        pass
+    # 同じURL・同じ内容（サイズとETag）で途中のファイルが残っているときだけ再開する
+    resumable = (state is not None and os.path.exists(partial_path) and
+                 (state.get('url'), state.get('size'), state.get('validator'), state.get('segment_size')) ==
+                 (url, total, validator, SEGMENT_SIZE))
+    if resumable:
+        print(f"🔁 ダウンロードを再開: {len(state['done'])}/{segment_count} 区間完了済み")
+    else:
+        state = {'url': url, 'size': total, 'validator': validator, 'segment_size': SEGMENT_SIZE, 'done': []}
+    done = set(state['done'])
+    pending = [index for index in range(segment_count) if index not in done]
+    lock = threading.Lock()
+
+    fd = os.open(partial_path, os.O_RDWR | os.O_CREAT | (0 if resumable else os.O_TRUNC), 0o644)
+    try:
+        # 最終サイズで確保しておき、各区間は自分の位置へ書き込む
+        if os.fstat(fd).st_size != total:
+            os.ftruncate(fd, total)
+        write_json_atomic(state_path, state)
+
+        def fetch(index):
+            offset = index * SEGMENT_SIZE
+            end = min(total, offset + SEGMENT_SIZE) - 1
+            error = None
+            for attempt in range(SEGMENT_RETRIES):
+                # 接続が切れたら、書き込めたところから続きを要求する
+                try:
+                    with session.get(url, headers={'Range': f'bytes={offset}-{end}', 'Accept-Encoding': 'identity'},
+                                     stream=True, timeout=timeout) as response:
+                        if response.status_code != 206:
+                            raise IOError(f"Range要求が {response.status_code} を返しました")
+                        while offset <= end:
+                            buffer = response.raw.read(min(BUFFER_SIZE, end - offset + 1))
+                            if not buffer:
+                                break
+                            os.pwrite(fd, buffer, offset)
+                            offset += len(buffer)
+                    if offset > end:
+                        break
+                    error = IOError(f"区間 {index} の応答が途中で終了しました")
+                except (requests.RequestException, Urllib3HTTPError, OSError) as e:
+                    error = e
             else:
-                print("テストアップロード失敗")
+                raise IOError(f"区間 {index} の取得に失敗: {error}")
+            with lock:
+                state['done'].append(index)
+                write_json_atomic(state_path, state)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending) or 1))) as executor:
+            list(executor.map(fetch, pending))
+    finally:
+        os.close(fd)
+
+def _remove_partial(partial_path):
+    for path in (partial_path, f"{partial_path}.json"):
+        if os.path.exists(path):
+            os.unlink(path)
+
+def file_sha256(file_path):
+    """ファイルのSHA-256（BUFFER_SIZEずつ読み込んで計算）"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class AsyncFalClient:
+    """
+    asyncio から使う転送クライアント（同時実行数は concurrency まで）
+
+    転送の実装は同期版の1つだけで、このクライアントはそれを専用のスレッドプールで実行する
+    （共有の requests.Session のコネクションプール・リトライ・分割アップロード・並列ダウンロード・
+    アップロード済みURLのキャッシュはすべて同期版と共通）。イベントループは転送中もブロックしない。
+
+        async with AsyncFalClient(concurrency=8) as client:
+            urls = await client.upload_many(paths)
+            job = submit_i2v(urls)  # 他の処理と並行させる場合は asyncio.create_task で
+    """
+
+    def __init__(self, concurrency=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self._semaphore = None
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='fal-transfer')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _limit(self):
+        # セマフォはイベントループの中で作る
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _run_sync(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def upload_file(self, file_path, use_cache=True, verify_cache=False):
+        """upload_file の非同期版（URL、失敗時はNone）"""
+        async with self._limit():
+            return await self._run_sync(upload_file, file_path, timeout=self.timeout,
+                                        use_cache=use_cache, verify_cache=verify_cache)
+
+    async def download_file(self, url, local_path, expected_sha256=None, workers=DOWNLOAD_WORKERS):
+        """download_file の非同期版（Range対応なら並列取得・再開・検証も同期版と同じ）"""
+        async with self._limit():
+            return await self._run_sync(download_file, url, local_path, timeout=self.timeout,
+                                        workers=workers, expected_sha256=expected_sha256)
+
+    async def upload_many(self, paths: Iterable[str], use_cache=True, verify_cache=False) -> Dict[str, Optional[str]]:
+        """パス → URL（失敗はNone）。すべてのアップロードを並行に投入する"""
+        paths = list(dict.fromkeys(str(p) for p in paths))
+        urls = await asyncio.gather(*(self.upload_file(path, use_cache, verify_cache) for path in paths))
+        return dict(zip(paths, urls))
+
+    async def download_many(self, targets: Dict[str, str], expected_sha256: Optional[Dict[str, str]] = None
+                            ) -> Dict[str, bool]:
+        """URL → 保存先 の対応をすべてダウンロードし、URL → 成否 を返す"""
+        expected_sha256 = expected_sha256 or {}
+        results = await asyncio.gather(*(self.download_file(url, path, expected_sha256.get(url))
+                                         for url, path in targets.items()))
+        return dict(zip(targets, results))
+
+async def async_upload_file(file_path, client=None, **kwargs):
+    """
+    ファイルを非同期でアップロード（複数の転送を並行させるときは client を共有する）
+    """
+    if client is not None:
+        return await client.upload_file(file_path, **kwargs)
+    async with AsyncFalClient(concurrency=1) as client:
+        return await client.upload_file(file_path, **kwargs)
+
+async def async_download_file(url, local_path, client=None, **kwargs):
+    """
+    URLから非同期でダウンロード（複数の転送を並行させるときは client を共有する）
+    """
+    if client is not None:
+        return await client.download_file(url, local_path, **kwargs)
+    async with AsyncFalClient(concurrency=1) as client:
+        return await client.download_file(url, local_path, **kwargs)
+
+async def async_upload_many(paths: Iterable[str], concurrency=DEFAULT_WORKERS, **kwargs) -> Dict[str, Optional[str]]:
+    async with AsyncFalClient(concurrency=concurrency) as client:
+        return await client.upload_many(paths, **kwargs)
+
+async def async_download_many(targets: Dict[str, str], concurrency=DEFAULT_WORKERS, **kwargs) -> Dict[str, bool]:
+    async with AsyncFalClient(concurrency=concurrency) as client:
+        return await client.download_many(targets, **kwargs)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Upload files to FAL.ai storage')
+    parser.add_argument('files', nargs='*', help='Files to upload')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent uploads / download connections')
+    parser.add_argument('--manifest', help='Write path -> URL manifest JSON to this file')
+    parser.add_argument('--download', nargs=2, metavar=('URL', 'OUTPUT'), help='Download URL to OUTPUT instead')
+    parser.add_argument('--sha256', help='Expected SHA-256 of the --download file')
+    parser.add_argument('--no-cache', action='store_true', help='Always upload, ignoring cached URLs')
+    parser.add_argument('--verify-cache', action='store_true', help='Check cached URLs with a HEAD request before reuse')
+    args = parser.parse_args()
+
+    if args.download:
+        url, output = args.download
+        sys.exit(0 if download_file(url, output, workers=args.workers, expected_sha256=args.sha256) else 1)
+    if not args.files:
+        parser.error('files are required unless --download is given')
+
+    if not setup_fal_client():
+        sys.exit(1)
+
+    manifest = upload_many(args.files, workers=args.workers, use_cache=not args.no_cache,
+                           verify_cache=args.verify_cache)
+    failed = [path for path, url in manifest.items() if not url]
+
+    if args.manifest:
+        Path(args.manifest).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.manifest, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        print(f"📝 マニフェスト保存: {args.manifest}")
     else:
-        print("Usage: python3 fal_upload_helper.py <test_file_path>")
\ No newline at end of file
+        print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    print(f"{'✅' if not failed else '⚠️'} アップロード完了: {len(manifest) - len(failed)}/{len(manifest)}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
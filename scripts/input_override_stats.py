@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Input Override Stats
+過去の実行で既定値から変更された入力パラメータをドメインごとに集計する
+
+workflow_dispatch の入力として公開されていないパラメータを変えるには、ワークフローを編集して
+再生成する必要がある。変更された回数が多いパラメータほど、入力として公開すれば再生成の往復を減らせる。
+
+集計元:
+- dispatchペイロード（JSON / JSONL）: {"domain": ..., "workflow": ..., "inputs": {...}}
+  domain がなければ workflow の名前からドメインを推定
+- 実行ログ（projects/workflow-execution-logs/*.md）:
+  `gh workflow run <workflow> -f name=value ...` と `**Inputs**: name=value, ...` の行
+
+結果は meta/domain-templates/common/input-override-stats.json に保存し、
+WorkflowInputsGenerator が読み込んで入力項目の優先順位付けに使う（ドメイン → パラメータ → 回数）。
+"""
+
+import re
+import json
+import shlex
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import yaml
+
+from atomic_io import write_text_atomic
+
+DEFAULT_STATS_PATH = Path("meta/domain-templates/common/input-override-stats.json")
+DEFAULT_TEMPLATES_DIR = Path("meta/domain-templates")
+DEFAULT_LOGS_DIR = Path("projects/workflow-execution-logs")
+STATS_VERSION = 1
+
+SCHEMA_GROUPS = ('required', 'recommended', 'optional')
+GH_RUN_PATTERN = re.compile(r'gh\s+workflow\s+run\s+(.+)')
+INPUTS_LINE_PATTERN = re.compile(r'\*\*(?:Inputs|入力)\*\*:\s*(.+)')
+KEY_VALUE_PATTERN = re.compile(r'([A-Za-z_][\w-]*)\s*=\s*("[^"]*"|\'[^\']*\'|[^,\s`]+)')
+
+
+class InputOverrideStats:
+    """保存済みの集計表（ドメインごとの実行回数と、パラメータごとの変更回数）"""
+
+    def __init__(self, path: Path = DEFAULT_STATS_PATH):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.domains: Dict[str, Dict[str, Any]] = data.get('domains', {}) if data.get('version') == STATS_VERSION else {}
+
+    def runs(self, domain: str) -> int:
+        return self.domains.get(domain, {}).get('runs', 0)
+
+    def overrides(self, domain: str) -> Dict[str, int]:
+        """パラメータ名 → 既定値から変更された回数"""
+        return self.domains.get(domain, {}).get('overrides', {})
+
+
+def load_schema_defaults(templates_dir: Path = DEFAULT_TEMPLATES_DIR) -> Dict[str, Dict[str, Optional[str]]]:
+    """ドメイン → パラメータ名 → 既定値（文字列。既定値がなければNone）"""
+    defaults = {}
+    for schema_path in sorted(Path(templates_dir).glob("*/input-schema.yaml")):
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            schema = yaml.safe_load(f) or {}
+        params = {}
+        for group in SCHEMA_GROUPS:
+            for name, info in ((schema.get('inputs') or {}).get(group) or {}).items():
+                default = info.get('default') if isinstance(info, dict) else None
+                params[name] = None if default is None else _normalize_value(default)
+        defaults[schema_path.parent.name] = params
+    return defaults
+
+
+def load_domain_keywords(templates_dir: Path = DEFAULT_TEMPLATES_DIR) -> Dict[str, List[str]]:
+    """index.yaml のドメインごとのキーワード（ワークフロー名からのドメイン推定に使う）"""
+    try:
+        with open(Path(templates_dir) / "index.yaml", 'r', encoding='utf-8') as f:
+            index = yaml.safe_load(f) or {}
+    except OSError:
+        return {}
+    return {domain: [str(k).lower() for k in (info or {}).get('keywords', [])]
+            for domain, info in (index.get('domains') or {}).items()}
+
+
+def infer_domain(workflow: str, domain_keywords: Dict[str, List[str]]) -> Optional[str]:
+    """ワークフロー名に含まれるキーワードが最も多いドメイン（同数なら index.yaml の順）"""
+    tokens = set(re.split(r'[^a-z0-9]+', Path(workflow).stem.lower()))
+    best, best_count = None, 0
+    for domain, keywords in domain_keywords.items():
+        count = sum(1 for keyword in keywords if keyword in tokens)
+        if count > best_count:
+            best, best_count = domain, count
+    return best
+
+
+def _normalize_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value).strip().strip('"\'')
+
+
+def iter_payload_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """dispatchペイロード（JSONの配列 / 1件のJSON / JSONL）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+        records = data if isinstance(data, list) else [data]
+    except ValueError:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    for record in records:
+        if isinstance(record, dict) and isinstance(record.get('inputs'), dict):
+            yield record
+
+
+def iter_log_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """実行ログ中の gh workflow run -f ... と **Inputs**: ... の行"""
+    workflow = None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            gh_run = GH_RUN_PATTERN.search(line)
+            if gh_run:
+                try:
+                    args = shlex.split(gh_run.group(1).split('`')[0])
+                except ValueError:
+                    continue
+                if not args:
+                    continue
+                workflow, inputs = args[0], {}
+                for flag, value in zip(args, args[1:]):
+                    if flag in ('-f', '-F', '--field', '--raw-field') and '=' in value:
+                        name, field_value = value.split('=', 1)
+                        inputs[name] = field_value
+                if inputs:
+                    yield {'workflow': workflow, 'inputs': inputs}
+                continue
+
+            inputs_line = INPUTS_LINE_PATTERN.search(line)
+            if inputs_line:
+                inputs = {name: value for name, value in KEY_VALUE_PATTERN.findall(inputs_line.group(1))}
+                if inputs:
+                    yield {'workflow': workflow or '', 'inputs': inputs}
+
+
+def build_stats(records: Iterator[Dict[str, Any]], templates_dir: Path = DEFAULT_TEMPLATES_DIR) -> Dict[str, Any]:
+    """実行ごとの入力から、ドメインごとの変更回数の集計表を作る
+
+    スキーマにあるパラメータで、値が既定値と異なる（既定値がなく値が指定された）ものを「変更」と数える。
+    """
+    defaults = load_schema_defaults(templates_dir)
+    domain_keywords = load_domain_keywords(templates_dir)
+    domains: Dict[str, Dict[str, Any]] = defaultdict(lambda: {'runs': 0, 'overrides': defaultdict(int)})
+    skipped = 0
+
+    for record in records:
+        domain = record.get('domain') or infer_domain(record.get('workflow') or '', domain_keywords)
+        if domain not in defaults:
+            skipped += 1
+            continue
+        entry = domains[domain]
+        entry['runs'] += 1
+        for name, value in record['inputs'].items():
+            if name not in defaults[domain]:
+                continue
+            value = _normalize_value(value)
+            if value and value != defaults[domain][name]:
+                entry['overrides'][name] += 1
+
+    return {
+        'version': STATS_VERSION,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'skipped_records': skipped,
+        'domains': {
+            domain: {
+                'runs': entry['runs'],
+                # 変更回数の多い順（同数は名前順）
+                'overrides': dict(sorted(entry['overrides'].items(), key=lambda item: (-item[1], item[0])))
+            }
+            for domain, entry in sorted(domains.items())
+        }
+    }
+
+
+def save_stats(stats: Dict[str, Any], path: Path = DEFAULT_STATS_PATH):
+    """一時ファイル経由で保存"""
+    write_text_atomic(path, json.dumps(stats, ensure_ascii=False, indent=2) + '\n')
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Aggregate overridden workflow inputs per domain')
+    parser.add_argument('--payloads', nargs='*', default=[], help='Dispatch payload files (JSON / JSONL)')
+    parser.add_argument('--logs-dir', default=str(DEFAULT_LOGS_DIR), help='Execution logs directory')
+    parser.add_argument('--no-logs', action='store_true', help='Do not read execution logs')
+    parser.add_argument('--templates-dir', default=str(DEFAULT_TEMPLATES_DIR), help='Domain templates directory')
+    parser.add_argument('--output', default=str(DEFAULT_STATS_PATH), help='Output stats JSON')
+    args = parser.parse_args()
+
+    def records():
+        for payload_path in args.payloads:
+            yield from iter_payload_records(Path(payload_path))
+        if not args.no_logs:
+            for log_path in sorted(Path(args.logs_dir).glob("*.md")):
+                yield from iter_log_records(log_path)
+
+    stats = build_stats(records(), Path(args.templates_dir))
+    save_stats(stats, Path(args.output))
+
+    print(f"✅ Input override stats saved: {args.output}")
+    for domain, entry in stats['domains'].items():
+        top = ', '.join(f"{name}={count}" for name, count in list(entry['overrides'].items())[:5]) or '-'
+        print(f"  {domain}: {entry['runs']} runs | {top}")
+    if stats['skipped_records']:
+        print(f"⚠️ {stats['skipped_records']} records skipped (domain unknown)")
+
+
+if __name__ == "__main__":
+    main()
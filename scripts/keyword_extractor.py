@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Keyword Extractor
+meta/domain-templates/index.yaml の keyword_lexicon を使った単一パスのキーワード抽出
+
+- 要求文の正規化（NFKC + casefold）は1回だけ
+- 英字は単語単位で照合（単語境界を保証、"*" 付きの語は前方一致）
+  語形変化（-s / -es / -ed / -ing）は語幹に戻してから照合（editing → edit, searched → search）
+- 日本語などの非英字はトライ木による辞書照合
+"""
+
+import sys
+import json
+import argparse
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Tuple, Iterable, NamedTuple
+
+import yaml
+
+
+class KeywordHit(NamedTuple):
+    keyword: str
+    term: str
+    start: int
+    end: int
+
+
+def normalize_text(text: str) -> str:
+    """全角/半角・大文字小文字の揺れを吸収した文字列を返す"""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def _is_latin(ch: str) -> bool:
+    return ('a' <= ch <= 'z') or ('0' <= ch <= '9')
+
+
+# 語幹に戻すときに外す語尾（長いものから順に試す）と、語幹の最小文字数
+INFLECTION_SUFFIXES = ('ing', 'es', 'ed', 's')
+MIN_STEM_LENGTH = 3
+
+
+def _stems(token: str) -> List[str]:
+    """語形変化を外した語幹の候補（editing → edit, searches → search, mails → mail）"""
+    stems = []
+    for suffix in INFLECTION_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            stems.append(token[:-len(suffix)])
+    return stems
+
+
+class KeywordExtractor:
+    def __init__(self, lexicon_path: str = "meta/domain-templates/index.yaml",
+                 lexicon: Dict[str, List[str]] = None):
+        self.lexicon_path = Path(lexicon_path)
+        if lexicon is None:
+            lexicon = self._load_lexicon()
+        # 出力順を安定させるため辞書の定義順を保持
+        self.keyword_order = {keyword: i for i, keyword in enumerate(lexicon)}
+        self.word_terms: Dict[str, List[str]] = {}
+        self.prefix_terms: Dict[str, List[str]] = {}
+        self.phrase_terms: Dict[Tuple[str, ...], List[str]] = {}
+        self.trie: Dict = {}
+        self._compile(lexicon)
+
+    def _load_lexicon(self) -> Dict[str, List[str]]:
+        """index.yamlからキーワード辞書を読み込む"""
+        with open(self.lexicon_path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+
+        lexicon = data.get('keyword_lexicon')
+        if not lexicon:
+            raise ValueError(f"keyword_lexicon not found in {self.lexicon_path}")
+        return lexicon
+
+    def _compile(self, lexicon: Dict[str, List[str]]):
+        """辞書を照合用の構造に変換"""
+        for keyword, terms in lexicon.items():
+            for raw_term in terms:
+                term = normalize_text(str(raw_term)).strip()
+                if not term:
+                    continue
+
+                if term.endswith('*'):
+                    self.prefix_terms.setdefault(term[:-1], []).append(keyword)
+                elif all(_is_latin(ch) for ch in term):
+                    self.word_terms.setdefault(term, []).append(keyword)
+                elif all(_is_latin(ch) or ch == ' ' for ch in term):
+                    # "machine learning" のような複数語フレーズ
+                    self.phrase_terms.setdefault(tuple(term.split()), []).append(keyword)
+                else:
+                    node = self.trie
+                    for ch in term:
+                        node = node.setdefault(ch, {})
+                    node.setdefault('', []).append(keyword)
+
+        self.max_phrase_len = max((len(p) for p in self.phrase_terms), default=0)
+
+    def _match_word(self, token: str) -> List[Tuple[str, str]]:
+        """英字トークンを辞書と照合"""
+        if token in self.word_terms:
+            return [(k, token) for k in self.word_terms[token]]
+
+        # 複数形・過去形・進行形（videos, searches, searched, editing）
+        for stem in _stems(token):
+            if stem in self.word_terms:
+                return [(k, stem) for k in self.word_terms[stem]]
+
+        for length in range(len(token), 0, -1):
+            prefix = token[:length]
+            if prefix in self.prefix_terms:
+                return [(k, prefix + '*') for k in self.prefix_terms[prefix]]
+        return []
+
+    def find_hits(self, request: str) -> List[KeywordHit]:
+        """要求文を1回走査して全てのヒットを返す（位置は正規化後の文字列基準）"""
+        text = normalize_text(request)
+        hits = []
+        tokens = []  # フレーズ照合用 (token, start, end)
+        length = len(text)
+        i = 0
+
+        while i < length:
+            ch = text[i]
+
+            if _is_latin(ch):
+                start = i
+                while i < length and _is_latin(text[i]):
+                    i += 1
+                token = text[start:i]
+                for keyword, term in self._match_word(token):
+                    hits.append(KeywordHit(keyword, term, start, i))
+                if self.max_phrase_len:
+                    tokens.append((token, start, i))
+                continue
+
+            node = self.trie.get(ch)
+            j = i + 1
+            while node is not None:
+                for keyword in node.get('', []):
+                    hits.append(KeywordHit(keyword, text[i:j], i, j))
+                if j >= length:
+                    break
+                node = node.get(text[j])
+                j += 1
+            i += 1
+
+        if self.phrase_terms:
+            hits.extend(self._match_phrases(tokens))
+
+        return hits
+
+    def _match_phrases(self, tokens: List[Tuple[str, int, int]]) -> List[KeywordHit]:
+        """連続する英字トークン列を複数語フレーズと照合"""
+        hits = []
+        words = [t[0] for t in tokens]
+        for i in range(len(words)):
+            for n in range(2, min(self.max_phrase_len, len(words) - i) + 1):
+                phrase = tuple(words[i:i + n])
+                for keyword in self.phrase_terms.get(phrase, []):
+                    hits.append(KeywordHit(keyword, ' '.join(phrase), tokens[i][1], tokens[i + n - 1][2]))
+        return hits
+
+    def extract(self, request: str) -> List[str]:
+        """要求文からキーワードを抽出（辞書の定義順、重複なし）"""
+        found = {hit.keyword for hit in self.find_hits(request)}
+        return sorted(found, key=lambda k: self.keyword_order.get(k, len(self.keyword_order)))
+
+    def extract_many(self, requests: Iterable[str]) -> List[List[str]]:
+        """複数の要求文をまとめて処理"""
+        return [self.extract(request) for request in requests]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keyword Extractor')
+    parser.add_argument('requests', nargs='*', help='Request texts (default: one per line from stdin)')
+    parser.add_argument('--lexicon', default='meta/domain-templates/index.yaml',
+                        help='YAML file containing keyword_lexicon')
+    parser.add_argument('--hits', action='store_true', help='Output matched terms and positions')
+
+    args = parser.parse_args()
+
+    extractor = KeywordExtractor(args.lexicon)
+    requests = args.requests or [line.rstrip('\n') for line in sys.stdin if line.strip()]
+
+    for request in requests:
+        if args.hits:
+            result = {'request': request, 'hits': [hit._asdict() for hit in extractor.find_hits(request)]}
+        else:
+            result = {'request': request, 'keywords': extractor.extract(request)}
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+MCP Service Catalog
+MCPサービスのレイテンシ・同時実行数・相対コストを管理し、時間予算に収まるサービス構成を選ぶ
+
+- 宣言値: meta/domain-templates/common/mcp-services.yaml
+- 観測値: 実行ログ中の「サービス名 + 所要時間」の記録（3件以上あれば宣言値を上書き）
+"""
+
+import re
+import json
+import math
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+DEFAULT_CATALOG_PATH = "meta/domain-templates/common/mcp-services.yaml"
+DEFAULT_LOGS_DIR = "projects/workflow-execution-logs"
+
+# シーン数などに比例して呼び出し回数が増えるcapability
+FAN_OUT_CAPABILITIES = {'t2i', 'i2i', 'i2v', 't2v', 'r2v', 'lipsync', 't2s'}
+
+# サーバー名の照合で無視するプロバイダー名
+PROVIDER_TOKENS = {'fal', 'google', 'kamui', 'kc'}
+
+# 観測値で宣言値を上書きするのに必要なサンプル数
+MIN_OBSERVED_SAMPLES = 3
+
+DURATION_PATTERN = re.compile(
+    r'(?<![\w.])(?:(?P<h>\d+)h)?(?:(?P<m>\d+)m)?(?P<s>\d+(?:\.\d+)?)s\b'
+    r'|(?P<sec>\d+(?:\.\d+)?)\s*(?:秒|seconds?|secs?)\b'
+)
+
+
+def parse_duration(text: str) -> List[float]:
+    """'2m3s' '45s' '30秒' のような表記を秒に変換"""
+    durations = []
+    for match in DURATION_PATTERN.finditer(text):
+        if match.group('sec'):
+            durations.append(float(match.group('sec')))
+        else:
+            durations.append(int(match.group('h') or 0) * 3600 + int(match.group('m') or 0) * 60
+                             + float(match.group('s')))
+    return durations
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    ordered = sorted(samples)
+    index = (len(ordered) - 1) * percentile / 100
+    lower, upper = math.floor(index), math.ceil(index)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+class McpServiceCatalog:
+    def __init__(self, catalog_path: str = DEFAULT_CATALOG_PATH, logs_dir: Optional[str] = None):
+        self.catalog_path = Path(catalog_path)
+        with open(self.catalog_path, 'r', encoding='utf-8') as f:
+            self.services: Dict[str, Dict] = (yaml.safe_load(f) or {}).get('services', {})
+        self.observed: Dict[str, List[float]] = {}
+        if logs_dir:
+            self.learn_from_logs(logs_dir)
+
+    def learn_from_logs(self, logs_dir: str) -> Dict[str, int]:
+        """実行ログからサービスごとの所要時間サンプルを収集"""
+        service_pattern = re.compile(
+            r'(?<![\w-])(' + '|'.join(re.escape(s) for s in sorted(self.services, key=len, reverse=True)) + r')(?![\w-])'
+        )
+        for log_file in sorted(Path(logs_dir).glob('*.md')):
+            with open(log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    services = set(service_pattern.findall(line))
+                    if len(services) != 1:
+                        continue
+                    durations = parse_duration(line)
+                    if durations:
+                        self.observed.setdefault(services.pop(), []).append(durations[0])
+
+        return {service: len(samples) for service, samples in self.observed.items()}
+
+    def latency(self, service: str, percentile: str = 'p95') -> float:
+        """サービス1回あたりの所要時間（秒）。観測値が十分あれば観測値を使う"""
+        samples = self.observed.get(service, [])
+        if len(samples) >= MIN_OBSERVED_SAMPLES:
+            return _percentile(samples, float(percentile.lstrip('p')))
+        info = self.services.get(service, {})
+        return float(info.get('latency_seconds', {}).get(percentile, 0))
+
+    def resolve(self, name: str) -> Optional[str]:
+        """MCPサーバー名（例: t2i-kamui-imagen4-ultra）をカタログのサービスIDに対応付ける"""
+        if name in self.services:
+            return name
+        tokens = {t for t in name.lower().split('-') if t} - PROVIDER_TOKENS
+        if len(tokens) < 2:  # capabilityだけでは特定できない
+            return None
+        for service in self.services:
+            if tokens <= set(service.lower().split('-')) - PROVIDER_TOKENS:
+                return service
+        return None
+
+    def capability(self, service: str) -> Optional[str]:
+        return self.services.get(service, {}).get('capability')
+
+    def quality(self, service: str) -> int:
+        return int(self.services.get(service, {}).get('quality', 3))
+
+    def cost(self, service: str) -> float:
+        return float(self.services.get(service, {}).get('relative_cost', 1.0))
+
+    def concurrency(self, service: str) -> int:
+        return max(1, int(self.services.get(service, {}).get('concurrency', 1)))
+
+    def alternatives(self, service: str) -> List[str]:
+        """同じcapabilityの代替サービス（品質の高い順）"""
+        capability = self.capability(service)
+        if capability is None:
+            return []
+        candidates = [s for s, info in self.services.items()
+                      if info.get('capability') == capability and s != service]
+        return sorted(candidates, key=lambda s: (-self.quality(s), self.latency(s)))
+
+    def stage_seconds(self, service: str, items: int = 1, percentile: str = 'p95') -> float:
+        """items件を同時実行数の上限で処理した場合の所要時間"""
+        if self.capability(service) not in FAN_OUT_CAPABILITIES:
+            items = 1
+        waves = math.ceil(max(items, 1) / self.concurrency(service))
+        return self.latency(service, percentile) * waves
+
+    def select_services(self, services: List[str], time_budget_seconds: Optional[float] = None,
+                        fan_out: int = 1, percentile: str = 'p95') -> Dict:
+        """時間予算に収まるようにサービスを選択
+
+        各段を直列に実行した場合の合計（クリティカルパスの上限）が予算を超える間、
+        「短縮秒数 / 品質の低下」が最も大きい置き換えを1つずつ適用する。
+        各段を最速の代替にしても予算に届かない場合は置き換えず、品質優先の構成を予算超過として返す。
+        """
+        chosen = list(services)
+
+        def total() -> float:
+            return sum(self.stage_seconds(s, fan_out, percentile) for s in chosen)
+
+        # 置き換えで到達できる最短時間（各段で最速のサービスを選んだ場合）
+        minimum = sum(min(self.stage_seconds(s, fan_out, percentile) for s in [current] + self.alternatives(current))
+                      for current in chosen)
+        feasible = time_budget_seconds is None or minimum <= time_budget_seconds
+
+        substitutions = []
+        while feasible and time_budget_seconds is not None and total() > time_budget_seconds:
+            best = None
+            for index, current in enumerate(chosen):
+                current_seconds = self.stage_seconds(current, fan_out, percentile)
+                for alternative in self.alternatives(current):
+                    saved = current_seconds - self.stage_seconds(alternative, fan_out, percentile)
+                    if saved <= 0:
+                        continue
+                    quality_loss = max(self.quality(current) - self.quality(alternative), 0) + 0.1
+                    score = (saved / quality_loss, -self.cost(alternative))
+                    if best is None or score > best[0]:
+                        best = (score, index, alternative, saved)
+
+            if best is None:
+                break
+            _, index, alternative, saved = best
+            substitutions.append({'from': chosen[index], 'to': alternative, 'saved_seconds': round(saved, 1)})
+            chosen[index] = alternative
+
+        estimated = total()
+        return {
+            'services': chosen,
+            'estimated_seconds': round(estimated, 1),
+            'time_budget_seconds': time_budget_seconds,
+            'within_budget': time_budget_seconds is None or estimated <= time_budget_seconds,
+            'minimum_seconds': round(minimum, 1),
+            'relative_cost': round(sum(self.cost(s) * (fan_out if self.capability(s) in FAN_OUT_CAPABILITIES else 1)
+                                       for s in chosen), 2),
+            'substitutions': substitutions,
+            'unknown_services': [s for s in chosen if s not in self.services]
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MCP service catalog')
+    parser.add_argument('services', nargs='+', help='Services in pipeline order')
+    parser.add_argument('--time-budget', type=float, help='Wall-clock budget in minutes')
+    parser.add_argument('--fan-out', type=int, default=1, help='Items per media stage (e.g. scene count)')
+    parser.add_argument('--logs-dir', default=DEFAULT_LOGS_DIR, help='Execution logs used to learn latencies')
+
+    args = parser.parse_args()
+
+    catalog = McpServiceCatalog(logs_dir=args.logs_dir if Path(args.logs_dir).exists() else None)
+    budget = args.time_budget * 60 if args.time_budget is not None else None
+    result = catalog.select_services(args.services, budget, args.fan_out)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
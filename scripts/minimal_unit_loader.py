@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Minimal Unit Loader
+minimal-units/ 配下のユニット定義（名前・説明・入出力）を読み込む共通機能
+
+ユニットの中にはrunブロック内のインラインコードが原因でYAML全体を
+パースできないものがあるため、その場合は jobs: より前のヘッダー部分だけを読む。
+"""
+
+import os
+import sys
+import glob
+from typing import Dict, Iterator, Tuple
+
+import yaml
+
+HEADER_TERMINATORS = ('\njobs:', '\nimplementation:', '\nsteps:')
+
+
+def load_unit_definition(file_path: str) -> Dict:
+    """ユニットYAMLを読み込む（失敗時はヘッダー部分のみ）"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    try:
+        data = yaml.safe_load(text)
+        if isinstance(data, dict):
+            return data
+    except yaml.YAMLError:
+        pass
+
+    header = text
+    for terminator in HEADER_TERMINATORS:
+        index = header.find(terminator)
+        if index != -1:
+            header = header[:index]
+
+    try:
+        data = yaml.safe_load(header)
+    except yaml.YAMLError as e:
+        print(f"Error loading {file_path}: {e}", file=sys.stderr)
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def get_workflow_call(definition: Dict) -> Dict:
+    """on.workflow_call セクションを返す（PyYAMLは on: を True として読む）"""
+    triggers = definition.get('on', definition.get(True))
+    if isinstance(triggers, dict) and isinstance(triggers.get('workflow_call'), dict):
+        return triggers['workflow_call']
+    return {}
+
+
+def iter_minimal_units(minimal_units_dir: str = "minimal-units") -> Iterator[Tuple[str, Dict]]:
+    """(ユニットパス, 定義) をパス順に列挙"""
+    pattern = os.path.join(minimal_units_dir, "**", "*.yml")
+    for file_path in sorted(glob.glob(pattern, recursive=True)):
+        yield file_path, load_unit_definition(file_path)
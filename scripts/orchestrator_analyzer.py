@@ -8,37 +8,100 @@ import json
 import os
 import sys
 import re
+import time
+import glob
+import hashlib
 import yaml
 from typing import List, Dict, Tuple, Optional
 from datetime import datetime
+from pathlib import Path
+
+from keyword_extractor import KeywordExtractor
+from relevance_ranker import RelevanceRanker
+from unit_graph import UnitCompatibilityGraph, DEFAULT_AVAILABLE_INPUTS, minimal_units_signature
+from plan_cache import PlanCache
+from workflow_merger import WorkflowMerger, dag_levels
 
 class OrchestratorAnalyzer:
-    def __init__(self):
+    def __init__(self, use_plan_cache: bool = True):
         self.orchestrator_dir = "kamuicode-workflow/module-workflow"
         self.minimal_units_dir = "minimal-units"
+        self.lexicon_path = "meta/domain-templates/index.yaml"
+        self.plan_cache = PlanCache() if use_plan_cache else None
+        self.load_index()
+    
+    def load_index(self):
+        """オーケストレーター・キーワード辞書・ミニマルユニットを読み込み、ランキング用インデックスを構築"""
+        self.index_signature = self._index_signature()
+        self.keyword_extractor = KeywordExtractor(self.lexicon_path)
         self.orchestrators = self.load_orchestrators()
+        self.keyword_artifacts = self.load_keyword_artifacts()
+        self._unit_graph = None
+        self.ranker = RelevanceRanker(self.keyword_extractor, self.orchestrators, self.minimal_units_dir)
+        
+        # 計画キャッシュのキー: 計画の材料（オーケストレーター・index.yaml・ユニット定義）が変われば別のキーになる
+        digest = hashlib.sha256(self.orchestrators_hash.encode('utf-8'))
+        with open(self.lexicon_path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).hexdigest().encode('utf-8'))
+        for unit_path in sorted(Path(self.minimal_units_dir).rglob('*.yml')):
+            digest.update(str(unit_path).encode('utf-8') + b'\0' + unit_path.read_bytes() + b'\0')
+        digest.update(','.join(sorted(DEFAULT_AVAILABLE_INPUTS)).encode('utf-8'))
+        self.index_hash = digest.hexdigest()
+    
+    def _orchestrator_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.orchestrator_dir, "orchestrator-*.yml")))
+    
+    def _index_signature(self) -> Tuple:
+        """変更検知用シグネチャ（オーケストレーターと index.yaml のパス・mtime・サイズ、ユニット定義のハッシュ）"""
+        signature = []
+        for file_path in self._orchestrator_files() + [self.lexicon_path]:
+            stat = os.stat(file_path)
+            signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+        signature.append(minimal_units_signature(self.minimal_units_dir))
+        return tuple(signature)
+    
+    def refresh_if_changed(self) -> bool:
+        """オーケストレーター・index.yaml・ユニット定義が変わっていればインデックスを再構築"""
+        if self._index_signature() == self.index_signature:
+            return False
+        self.load_index()
+        return True
         
     def load_orchestrators(self) -> Dict[str, Dict]:
-        """すべてのオーケストレーターファイルを読み込む"""
+        """すべてのオーケストレーターファイルを読み込む（内容のハッシュも計算）"""
         orchestrators = {}
-        pattern = os.path.join(self.orchestrator_dir, "orchestrator-*.yml")
+        digest = hashlib.sha256()
         
-        import glob
-        for file_path in glob.glob(pattern):
+        for file_path in self._orchestrator_files():
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = yaml.safe_load(f)
-                    name = os.path.basename(file_path).replace('.yml', '')
-                    orchestrators[name] = {
-                        'path': file_path,
-                        'content': content,
-                        'jobs': self.extract_jobs(content)
-                    }
+                with open(file_path, 'rb') as f:
+                    raw = f.read()
+                digest.update(file_path.encode('utf-8') + b'\0' + raw + b'\0')
+                content = yaml.safe_load(raw.decode('utf-8'))
+                name = os.path.basename(file_path).replace('.yml', '')
+                orchestrators[name] = {
+                    'path': file_path,
+                    'content': content,
+                    'jobs': self.extract_jobs(content)
+                }
             except Exception as e:
                 print(f"Error loading {file_path}: {e}", file=sys.stderr)
-                
+        
+        self.orchestrators_hash = digest.hexdigest()
         return orchestrators
     
+    def load_keyword_artifacts(self) -> Dict[str, List[str]]:
+        """キーワード→必要な成果物の対応を読み込む"""
+        with open(self.lexicon_path, 'r', encoding='utf-8') as f:
+            return (yaml.safe_load(f) or {}).get('keyword_artifacts', {})
+    
+    @property
+    def unit_graph(self) -> UnitCompatibilityGraph:
+        """ミニマルユニット互換グラフ（初回利用時に読み込み、ディスクキャッシュを利用）"""
+        if self._unit_graph is None:
+            self._unit_graph = UnitCompatibilityGraph.load(self.minimal_units_dir)
+        return self._unit_graph
+    
     def extract_jobs(self, content: Dict) -> List[Dict]:
         """オーケストレーターからジョブ情報を抽出"""
         jobs = []
@@ -58,10 +121,11 @@ class OrchestratorAnalyzer:
         # キーワード抽出
         keywords = self.extract_keywords(request)
         
-        # 関連オーケストレーターの特定
+        # 関連オーケストレーターの特定（BM25スコアを一括計算）
+        scores = self.ranker.score_orchestrators(request, keywords)
         relevant_orchestrators = []
         for name, orch_data in self.orchestrators.items():
-            relevance_score = self.calculate_relevance(name, orch_data, keywords, request)
+            relevance_score = scores.get(name, 0.0)
             if relevance_score > 0.3:
                 relevant_orchestrators.append({
                     'name': name,
@@ -81,157 +145,59 @@ class OrchestratorAnalyzer:
     def extract_keywords(self, request: str) -> List[str]:
         """要求文からキーワードを抽出"""
         # 基本的なキーワード抽出（実際はClaude Code SDKで高度な分析を行う）
-        keywords = []
-        
-        # コンテンツタイプ
-        if any(word in request.lower() for word in ['動画', 'video', 'ビデオ']):
-            keywords.append('video')
-        if any(word in request.lower() for word in ['画像', 'image', '写真']):
-            keywords.append('image')
-        if any(word in request.lower() for word in ['音声', 'audio', '音楽', 'bgm']):
-            keywords.append('audio')
-        if any(word in request.lower() for word in ['ニュース', 'news']):
-            keywords.append('news')
-        if any(word in request.lower() for word in ['記事', 'article', 'ブログ']):
-            keywords.append('article')
-        if any(word in request.lower() for word in ['広告', 'advertisement', 'バナー']):
-            keywords.append('advertisement')
-        if any(word in request.lower() for word in ['分析', 'analysis', 'データ']):
-            keywords.append('analysis')
-        
-        # アクション
-        if any(word in request.lower() for word in ['検索', 'search', '調査']):
-            keywords.append('search')
-        if any(word in request.lower() for word in ['生成', 'generate', '作成']):
-            keywords.append('generation')
-        if any(word in request.lower() for word in ['編集', 'edit', '結合']):
-            keywords.append('editing')
-        
-        # 外部サービス
-        if any(word in request.lower() for word in ['youtube', 'ユーチューブ']):
-            keywords.append('youtube')
-        if any(word in request.lower() for word in ['twitter', 'x', 'ツイッター', 'ツイート']):
-            keywords.append('twitter')
-        if any(word in request.lower() for word in ['slack', 'スラック']):
-            keywords.append('slack')
-        if any(word in request.lower() for word in ['メール', 'email', 'mail']):
-            keywords.append('email')
-        if any(word in request.lower() for word in ['翻訳', 'translate', 'translation']):
-            keywords.append('translation')
-        if any(word in request.lower() for word in ['要約', 'summarize', 'summary']):
-            keywords.append('summary')
-        if any(word in request.lower() for word in ['天気', 'weather', '気象']):
-            keywords.append('weather')
-        if any(word in request.lower() for word in ['株', 'stock', '株価', 'market']):
-            keywords.append('stock')
-        
-        return list(set(keywords))
+        # 辞書は meta/domain-templates/index.yaml の keyword_lexicon で管理
+        return self.keyword_extractor.extract(request)
     
     def calculate_relevance(self, orch_name: str, orch_data: Dict, keywords: List[str], request: str) -> float:
-        """オーケストレーターの関連性スコアを計算"""
-        score = 0.0
-        
-        # 名前によるマッチング
-        for keyword in keywords:
-            if keyword in orch_name.lower():
-                score += 0.3
-        
-        # 特定のパターンマッチング
-        if 'news' in keywords and 'video' in keywords:
-            if 'news-video' in orch_name:
-                score += 0.5
-            elif 'news-article' in orch_name:
-                score += 0.3
-        
-        if 'banner' in keywords or 'advertisement' in keywords:
-            if 'banner-advertisement' in orch_name:
-                score += 0.6
-        
-        # ジョブ内容による追加スコア
-        job_names = [job['name'] for job in orch_data['jobs']]
-        for job_name in job_names:
-            for keyword in keywords:
-                if keyword in job_name.lower():
-                    score += 0.1
-        
-        return min(score, 1.0)
+        """オーケストレーターの関連性スコアを計算（BM25、最上位を1.0とする相対値）"""
+        return self.ranker.score_orchestrators(request, keywords).get(orch_name, 0.0)
     
     def merge_orchestrator_patterns(self, orchestrators: List[Dict], request: str) -> Dict:
-        """複数のオーケストレーターから最適なワークフローを構築"""
-        all_jobs = []
-        job_map = {}
+        """複数のオーケストレーターから最適なワークフローを構築
+
+        同じユニットを同じ入力で呼ぶジョブ（計画・検索・画像生成など）は1回にまとめ、
+        各オーケストレーターの needs を付け替えて1つのDAGにする。
+        """
+        merger = WorkflowMerger()
         
-        # すべてのジョブを収集
-        for orch in orchestrators:
-            for job in orch['data']['jobs']:
-                job_key = job['uses']
-                if job_key not in job_map:
-                    job_map[job_key] = {
-                        'job': job,
-                        'source': orch['name'],
-                        'relevance': orch['score']
-                    }
-                else:
-                    # より関連性の高いものを選択
-                    if orch['score'] > job_map[job_key]['relevance']:
-                        job_map[job_key] = {
-                            'job': job,
-                            'source': orch['name'],
-                            'relevance': orch['score']
-                        }
+        # 関連性の高い順に統合（ジョブIDと代表の入力は関連性の高い側を採用）
+        for orch in sorted(orchestrators, key=lambda o: o['score'], reverse=True):
+            merger.add(orch['name'], orch['score'], orch['data']['jobs'])
         
-        # 論理的な順序で並べ替え
-        ordered_jobs = self.create_logical_order(job_map, request)
+        ordered_jobs = merger.merged_jobs()
+        total_jobs = sum(len(orch['data']['jobs']) for orch in orchestrators)
         
         return {
             'jobs': ordered_jobs,
-            'sources': list(set([v['source'] for v in job_map.values()])),
-            'job_count': len(ordered_jobs)
+            'sources': sorted({source for job in ordered_jobs for source in job['sources']}),
+            'job_count': len(ordered_jobs),
+            'shared_job_count': total_jobs - len(ordered_jobs)
         }
     
-    def create_logical_order(self, job_map: Dict, request: str) -> List[Dict]:
-        """ジョブを論理的な順序に並べ替え"""
-        # ジョブタイプの分類
-        categories = {
-            'planning': [],
-            'search': [],
-            'analysis': [],
-            'content_creation': [],
-            'media_generation': [],
-            'post_processing': [],
-            'finalization': []
-        }
+    def generate_execution_plan(self, request: str) -> Dict:
+        """実行計画を生成（同じ形の要求はキャッシュから返す）"""
+        if self.plan_cache is None:
+            return self._generate_execution_plan(request)
         
-        for job_key, job_data in job_map.items():
-            job_name = job_data['job']['name']
-            uses = job_data['job']['uses']
-            
-            # カテゴリ分け
-            if any(word in job_name.lower() for word in ['planning', 'plan', '企画']):
-                categories['planning'].append(job_data)
-            elif any(word in job_name.lower() for word in ['search', 'web', '検索']):
-                categories['search'].append(job_data)
-            elif any(word in job_name.lower() for word in ['analysis', 'analyze', '分析']):
-                categories['analysis'].append(job_data)
-            elif any(word in job_name.lower() for word in ['article', 'content', 'text']):
-                categories['content_creation'].append(job_data)
-            elif any(word in uses.lower() for word in ['image', 'video', 'audio', 'banner']):
-                categories['media_generation'].append(job_data)
-            elif any(word in job_name.lower() for word in ['lipsync', 'edit', 'concat', 'overlay']):
-                categories['post_processing'].append(job_data)
-            else:
-                categories['finalization'].append(job_data)
+        self.refresh_if_changed()
+        keywords = self.extract_keywords(request)
+        cache_key = PlanCache.make_key(self.ranker.query_terms(request, keywords), self.index_hash)
         
-        # 論理的な順序で結合
-        ordered_jobs = []
-        for category in ['search', 'analysis', 'planning', 'content_creation', 
-                        'media_generation', 'post_processing', 'finalization']:
-            ordered_jobs.extend(categories[category])
+        plan = self.plan_cache.get(cache_key)
+        if plan is not None:
+            if 'request' in plan:
+                plan['request'] = request
+            if isinstance(plan.get('analysis'), dict):
+                plan['analysis']['analysis_timestamp'] = datetime.utcnow().isoformat() + 'Z'
+            plan['cache_hit'] = True
+            return plan
         
-        return ordered_jobs
+        plan = self._generate_execution_plan(request)
+        self.plan_cache.put(cache_key, plan)
+        plan['cache_hit'] = False
+        return plan
     
-    def generate_execution_plan(self, request: str) -> Dict:
-        """実行計画を生成"""
+    def _generate_execution_plan(self, request: str) -> Dict:
         # ユーザー要求を分析
         analysis = self.analyze_user_request(request)
         
@@ -255,39 +221,48 @@ class OrchestratorAnalyzer:
             'execution_pattern': self.determine_execution_pattern(optimized_workflow)
         }
     
-    def create_default_execution_plan(self, request: str, keywords: List[str]) -> Dict:
-        """デフォルトの実行計画を作成"""
-        # 専門家視点での基本的な実行順序
+    def create_default_execution_plan(self, request: str, keywords: List[str],
+                                      available_inputs: Optional[List[str]] = None) -> Dict:
+        """デフォルトの実行計画を作成（ミニマルユニット互換グラフから合成）"""
         default_plan = {
             'jobs': [],
             'sources': ['expert_knowledge'],
             'execution_pattern': 'sequential'
         }
         
-        # キーワードに基づいて基本的なジョブを追加
-        if 'search' in keywords:
-            default_plan['jobs'].append({
-                'name': 'web_search',
-                'category': 'search',
-                'unit': 'minimal-units/planning/web-search.yml'
-            })
+        # キーワードから必要な成果物を決め、要求文から得られる入力を起点に経路を探索
+        desired = []
+        for keyword in keywords:
+            for artifact in self.keyword_artifacts.get(keyword, []):
+                if artifact not in desired:
+                    desired.append(artifact)
+        if not desired:
+            return default_plan
         
-        if 'analysis' in keywords:
+        available = DEFAULT_AVAILABLE_INPUTS if available_inputs is None else available_inputs
+        composed = self.unit_graph.compose(available, desired)
+        
+        job_names = {unit['unit']: unit['name'].replace('-', '_') for unit in composed['units']}
+        for unit in composed['units']:
             default_plan['jobs'].append({
-                'name': 'data_analysis',
-                'category': 'analysis',
-                'unit': 'minimal-units/planning/data-analysis.yml'
+                'name': job_names[unit['unit']],
+                'category': unit['category'],
+                'unit': unit['unit'],
+                'needs': [job_names[u] for u in unit['needs']],
+                'provides': list(unit['provides'])
             })
         
-        # ... 他のキーワードに基づくジョブ追加
+        default_plan['execution_pattern'] = self.determine_execution_pattern(default_plan)
+        if composed['unsatisfied']:
+            default_plan['unsatisfied_artifacts'] = list(composed['unsatisfied'])
         
         return default_plan
     
     def optimize_parallel_execution(self, workflow: Dict) -> Dict:
         """並列実行の最適化"""
-        # 依存関係を分析して並列実行可能なジョブグループを特定
-        # （実装は省略 - 実際にはより複雑な依存関係解析が必要）
-        workflow['parallel_groups'] = []
+        # 依存関係の段数ごとに並列実行可能なジョブグループを特定
+        jobs = [entry.get('job', entry) for entry in workflow.get('jobs', [])]
+        workflow['parallel_groups'] = dag_levels(jobs)
         return workflow
     
     def determine_execution_pattern(self, workflow: Dict) -> str:
@@ -301,8 +276,129 @@ class OrchestratorAnalyzer:
             return 'complex_parallel'
 
 
+# --check で確認するデフォルト計画: (要求文, 選ばれるべきユニット名)
+DEFAULT_PLAN_CASES = [
+    ("translate and summarize this text", ['openai-summarize', 'openai-translate']),
+    ("このテキストを英語に翻訳して", ['openai-translate']),
+    ("summarize this text", ['openai-summarize']),
+    ("データを分析してレポートを作る", ['data-analysis']),
+]
+
+def check_default_plans(analyzer: OrchestratorAnalyzer) -> List[str]:
+    """DEFAULT_PLAN_CASES の合成結果を確認し、不一致の説明を返す"""
+    failures = []
+    for request, expected in DEFAULT_PLAN_CASES:
+        plan = analyzer.create_default_execution_plan(request, analyzer.extract_keywords(request))
+        units = sorted(os.path.basename(job['unit']).replace('.yml', '') for job in plan['jobs'])
+        if units != sorted(expected):
+            failures.append(f"{request}: units {units}, expected {sorted(expected)}")
+    return failures
+
+
+# バッチ処理（ワーカープロセスごとに1つのアナライザーを保持）
+_batch_analyzer = None
+
+def _init_batch_worker(analyzer: OrchestratorAnalyzer):
+    global _batch_analyzer
+    _batch_analyzer = analyzer
+
+def _plan_batch_record(item: Tuple[int, str]) -> Dict:
+    """JSONLの1行を計画してタイミング付きの結果を返す（壊れた行はエラーの結果にする）"""
+    line_no, line = item
+    try:
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError(f"expected a JSON object, got {type(record).__name__}")
+    except ValueError as e:
+        return {
+            'request_id': f"line-{line_no}",
+            'request': None,
+            'error': f"invalid JSON on line {line_no}: {e}",
+            'elapsed_ms': 0.0
+        }
+    
+    request = record.get('request') or '\n'.join(
+        str(record[key]) for key in ('title', 'body') if record.get(key)
+    )
+    result = {
+        'request_id': record.get('request_id', f"line-{line_no}"),
+        'request': request
+    }
+    
+    started = time.perf_counter()
+    try:
+        result['plan'] = _batch_analyzer.generate_execution_plan(request)
+    except Exception as e:
+        result['error'] = str(e)
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+def _read_batch_records(batch_path: str):
+    """空行を除いた (行番号, 行) を返す。JSONの解析はワーカー側で行う"""
+    with open(batch_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield line_no, line
+
+def run_batch(batch_path: str, output_path: str, workers: Optional[int] = None,
+              use_plan_cache: bool = True) -> int:
+    """JSONLの要求をプロセスプールで計画し、1行1計画でJSONLに書き出す"""
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # オーケストレーターのインデックスは1回だけ構築し、各ワーカーへ渡す
+    analyzer = OrchestratorAnalyzer(use_plan_cache=use_plan_cache)
+    workers = workers or os.cpu_count() or 1
+    
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    started = time.perf_counter()
+    count = 0
+    errors = 0
+    
+    with open(output_path, 'w', encoding='utf-8') as out, \
+         ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(analyzer,)) as executor:
+        for result in executor.map(_plan_batch_record, _read_batch_records(batch_path), chunksize=16):
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            out.flush()
+            count += 1
+            errors += 'error' in result
+    
+    elapsed = time.perf_counter() - started
+    print(f"✅ Batch orchestrator analysis completed: {count} requests in {elapsed:.2f}s ({workers} workers)")
+    if errors:
+        print(f"⚠️ {errors} requests failed (see \"error\" in the output)")
+    print(f"📁 Results saved to: {output_path}")
+    return count
+
+
 # メイン処理
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Orchestrator Analyzer')
+    parser.add_argument('--batch', help='JSONL file of requests (request_id, title/body or request per line)')
+    parser.add_argument('--output', help='Output JSONL path for --batch')
+    parser.add_argument('--workers', type=int, help='Worker processes for --batch (default: CPU count)')
+    parser.add_argument('--no-plan-cache', action='store_true', help='Always re-plan without the plan cache')
+    parser.add_argument('--check', action='store_true',
+                        help='Verify the units composed for the built-in default plan cases')
+    
+    args = parser.parse_args()
+    
+    if args.check:
+        failures = check_default_plans(OrchestratorAnalyzer(use_plan_cache=False))
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            sys.exit(1)
+        print(f"✅ {len(DEFAULT_PLAN_CASES)} default plan cases passed")
+        sys.exit(0)
+    
+    if args.batch:
+        output_path = args.output or "projects/current-session/metadata/orchestrator_analysis.jsonl"
+        run_batch(args.batch, output_path, args.workers, not args.no_plan_cache)
+        sys.exit(0)
+    
     # 環境変数から情報を取得
     request = os.environ.get('USER_REQUEST', '')
     capabilities = os.environ.get('CAPABILITIES', '')
@@ -312,7 +408,7 @@ if __name__ == "__main__":
         sys.exit(1)
     
     # アナライザーを初期化
-    analyzer = OrchestratorAnalyzer()
+    analyzer = OrchestratorAnalyzer(use_plan_cache=not args.no_plan_cache)
     
     # 実行計画を生成
     execution_plan = analyzer.generate_execution_plan(request)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Plan Cache
+正規化済みの要求（キーワード集合）とオーケストレーターインデックスのハッシュをキーに
+実行計画をキャッシュする
+
+- メモリ層: LRU（OrderedDict）
+- ディスク層: 1計画1ファイルのJSON（プロセス・ジョブをまたいで再利用）
+オーケストレーターファイルが変わるとインデックスのハッシュが変わるため、古い計画は参照されなくなる。
+"""
+
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from atomic_io import write_text_atomic
+
+CACHE_VERSION = 3
+DEFAULT_CACHE_DIR = os.environ.get('PLAN_CACHE_DIR', '.cache/plan-cache')
+
+
+class PlanCache:
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 max_entries: int = 256, max_disk_entries: int = 2048):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._puts_since_prune = 0
+
+    @staticmethod
+    def make_key(terms: Iterable[str], index_hash: str) -> str:
+        """正規化した語の集合とインデックスハッシュからキーを作る"""
+        payload = json.dumps({
+            'version': CACHE_VERSION,
+            'terms': sorted(set(terms)),
+            'index': index_hash
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """キャッシュ済みの計画（呼び出し側で変更してよいコピー）を返す"""
+        serialized = self._memory.get(key)
+        if serialized is not None:
+            self._memory.move_to_end(key)
+            return json.loads(serialized)
+
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                serialized = f.read()
+            plan = json.loads(serialized)
+            os.utime(path)  # ディスク層の削除順（最終利用時刻）を更新
+        except (OSError, ValueError):
+            return None
+
+        self._remember(key, serialized)
+        return plan
+
+    def put(self, key: str, plan: Dict):
+        """計画をメモリ層とディスク層に保存"""
+        serialized = json.dumps(plan, ensure_ascii=False)
+        self._remember(key, serialized)
+
+        if not self.cache_dir:
+            return
+        # 並列プロセスからの書き込みでも壊れないよう一時ファイル経由で置き換える
+        try:
+            write_text_atomic(self._disk_path(key), serialized)
+        except OSError:
+            return
+
+        self._puts_since_prune += 1
+        if self._puts_since_prune >= 64:
+            self._puts_since_prune = 0
+            self.prune_disk()
+
+    def _remember(self, key: str, serialized: str):
+        self._memory[key] = serialized
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def prune_disk(self):
+        """ディスク層を上限件数まで古い順に削除"""
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith('.json')]
+        except OSError:
+            return
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_disk_entries]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """メモリ層とディスク層を空にする"""
+        self._memory.clear()
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.json'):
+                    os.unlink(entry.path)
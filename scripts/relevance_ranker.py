@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Relevance Ranker
+オーケストレーター・ミニマルユニットをBM25でランキングする
+
+文書ごとのBM25重みを疎行列（文書×語彙）として事前計算しておき、
+要求文のスコアリングは1回の疎行列×ベクトル積で行う。複数要求は行列積でまとめて処理。
+
+- 要求文の語は抽出キーワードと、キーワードに含まれない非ストップワードの英字トークン
+- オーケストレーター名の語は NAME_WEIGHT 倍で数え、キーワードへの展開も名前だけに行う
+  （ジョブ名の "banner-text-overlay" だけで広告系と判定しない）
+- スコアは要求ごとの最上位文書を1.0とする相対値（閾値 0.3 は「最上位の3割以上」）
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from typing import Dict, List, Tuple, Optional, Iterable
+
+import numpy as np
+from scipy import sparse
+
+from keyword_extractor import KeywordExtractor, normalize_text
+from minimal_unit_loader import iter_minimal_units
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+NAME_WEIGHT = 3
+# 要求文から照合に使わない英単語（「AIで〜を作る」のような依頼で共通に現れる語を含む）
+STOP_WORDS = frozenset("""
+a an the of for to and or with about in on at by from into as is are be this that these it its
+my our your me us i we you please some any can could would make create build do get use using ai
+""".split())
+# --check で確認する選択結果: (要求文, 最上位, 選ばれるべきもの, 選ばれてはいけないもの)
+REGRESSION_CASES = [
+    ("Create a news video about AI", 'orchestrator-news-video-generation',
+     ['orchestrator-ai-news-article-generation'], []),
+    ("画像を生成してバナー広告を作る", 'orchestrator-banner-advertisement-creation',
+     [], ['orchestrator-news-video-generation']),
+    ("Make a banner advertisement for a cafe", 'orchestrator-banner-advertisement-creation',
+     [], ['orchestrator-news-video-generation']),
+]
+CATALOG_LINE_PATTERN = re.compile(r'^- \*\*(?P<name>[^*]+)\*\*: (?P<text>.*?)\s*\((?P<path>minimal-units/[^)]+\.yml)\)\s*$')
+
+
+class BM25Index:
+    """文書集合に対するBM25インデックス"""
+
+    def __init__(self, documents: Dict[str, List[str]], k1: float = 1.5, b: float = 0.75):
+        self.doc_ids = list(documents)
+        self.vocabulary: Dict[str, int] = {}
+        self.k1 = k1
+        self.b = b
+
+        rows, cols, counts = [], [], []
+        for row, doc_id in enumerate(self.doc_ids):
+            term_counts: Dict[int, int] = {}
+            for term in documents[doc_id]:
+                col = self.vocabulary.setdefault(term, len(self.vocabulary))
+                term_counts[col] = term_counts.get(col, 0) + 1
+            rows.extend([row] * len(term_counts))
+            cols.extend(term_counts.keys())
+            counts.extend(term_counts.values())
+
+        shape = (len(self.doc_ids), len(self.vocabulary))
+        tf = sparse.csr_matrix((np.asarray(counts, dtype=np.float64), (rows, cols)), shape=shape)
+
+        doc_len = np.asarray(tf.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if len(doc_len) and doc_len.mean() > 0 else 1.0
+        doc_freq = np.bincount(tf.indices, minlength=shape[1])
+        n_docs = shape[0]
+        self.idf = np.log((n_docs - doc_freq + 0.5) / (doc_freq + 0.5) + 1.0)
+
+        # BM25重み: idf * tf*(k1+1) / (tf + k1*(1-b+b*dl/avgdl))
+        norm = k1 * (1 - b + b * doc_len / avg_len)
+        weights = tf.copy()
+        row_norm = np.repeat(norm, np.diff(tf.indptr))
+        weights.data = tf.data * (k1 + 1) / (tf.data + row_norm)
+        self.weights = (weights @ sparse.diags(self.idf)).tocsr()
+
+    def vectorize(self, queries: List[List[str]]) -> sparse.csr_matrix:
+        """クエリ語リストを（クエリ×語彙）の0/1行列に変換（未知語は無視）"""
+        rows, cols = [], []
+        for row, terms in enumerate(queries):
+            for col in {self.vocabulary[t] for t in terms if t in self.vocabulary}:
+                rows.append(row)
+                cols.append(col)
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)),
+                                 shape=(len(queries), len(self.vocabulary)))
+
+    def score_many(self, queries: List[List[str]]) -> np.ndarray:
+        """（クエリ×文書）のスコア行列を返す
+
+        各クエリで最もBM25スコアの高い文書を1.0とした相対値（0〜1）。
+        クエリの語数でスコアの尺度が変わらないため、固定の閾値で選択できる。
+        """
+        if not self.doc_ids:
+            return np.zeros((len(queries), 0))
+
+        query_matrix = self.vectorize(queries)
+        raw = (self.weights @ query_matrix.T).T.toarray()
+        best = raw.max(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(best > 0, raw / best, 0.0)
+
+    def rank(self, query: List[str], top_k: Optional[int] = None,
+             min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """1クエリのランキング"""
+        return self.rank_many([query], top_k, min_score)[0]
+
+    def rank_many(self, queries: List[List[str]], top_k: Optional[int] = None,
+                  min_score: float = 0.0) -> List[List[Tuple[str, float]]]:
+        """複数クエリのランキングを一括計算"""
+        scores = self.score_many(queries)
+        results = []
+        for row in scores:
+            order = np.argsort(-row, kind='stable')
+            ranked = [(self.doc_ids[i], float(row[i])) for i in order if row[i] > min_score]
+            results.append(ranked[:top_k] if top_k else ranked)
+        return results
+
+
+class RelevanceRanker:
+    def __init__(self, keyword_extractor: KeywordExtractor, orchestrators: Dict[str, Dict],
+                 minimal_units_dir: str = "minimal-units"):
+        self.keyword_extractor = keyword_extractor
+        self.minimal_units_dir = minimal_units_dir
+        self.catalog_path = os.path.join(minimal_units_dir, "MINIMAL_UNITS_CATALOG.md")
+        self.orchestrator_index = BM25Index(
+            {name: self.orchestrator_terms(name, data) for name, data in orchestrators.items()}
+        )
+        self._unit_index = None
+
+    def analyze(self, text: str, keywords: Optional[List[str]] = None) -> List[str]:
+        """テキストを語のリストに変換（英字トークン + 抽出キーワード）"""
+        if keywords is None:
+            keywords = self.keyword_extractor.extract(text)
+        tokens = TOKEN_PATTERN.findall(normalize_text(text))
+        return tokens + [k for k in keywords if k not in tokens]
+
+    def query_terms(self, request: str, keywords: Optional[List[str]] = None) -> List[str]:
+        """要求文を照合用の語に変換（抽出キーワード + キーワードにならなかった非ストップワード）"""
+        if keywords is None:
+            keywords = self.keyword_extractor.extract(request)
+        text = normalize_text(request)
+        covered = {(hit.start, hit.end) for hit in self.keyword_extractor.find_hits(request)}
+        terms = list(keywords)
+        for match in TOKEN_PATTERN.finditer(text):
+            token = match.group()
+            if token not in STOP_WORDS and match.span() not in covered and token not in terms:
+                terms.append(token)
+        return terms
+
+    def orchestrator_terms(self, name: str, data: Dict) -> List[str]:
+        """オーケストレーター名（重み付き）・ジョブ名・uses先から文書を構成"""
+        terms = self.analyze(name.replace('orchestrator-', '', 1)) * NAME_WEIGHT
+        for job in data.get('jobs', []):
+            uses = os.path.basename(str(job['uses'])).replace('.yml', '')
+            terms.extend(TOKEN_PATTERN.findall(normalize_text(f"{job['name']} {uses}")))
+        return terms
+
+    @property
+    def unit_index(self) -> BM25Index:
+        """ミニマルユニットのインデックス（初回利用時に構築）"""
+        if self._unit_index is None:
+            catalog = self._load_catalog()
+            documents = {}
+            for path, definition in iter_minimal_units(self.minimal_units_dir):
+                text = ' '.join([
+                    os.path.basename(path).replace('.yml', ''),
+                    str(definition.get('name', '')),
+                    str(definition.get('description', '')),
+                    ' '.join(str(t) for t in definition.get('tags', []) or []),
+                    catalog.get(path, '')
+                ])
+                documents[path] = self.analyze(text)
+            self._unit_index = BM25Index(documents)
+        return self._unit_index
+
+    def _load_catalog(self) -> Dict[str, str]:
+        """MINIMAL_UNITS_CATALOG.mdからユニットパス→説明文の対応を読み込む"""
+        catalog = {}
+        if not os.path.exists(self.catalog_path):
+            return catalog
+
+        with open(self.catalog_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                match = CATALOG_LINE_PATTERN.match(line.strip())
+                if match:
+                    catalog[match.group('path')] = f"{match.group('name')} {match.group('text')}"
+        return catalog
+
+    def score_orchestrators(self, request: str, keywords: Optional[List[str]] = None) -> Dict[str, float]:
+        """全オーケストレーターの関連性スコア"""
+        scores = self.orchestrator_index.score_many([self.query_terms(request, keywords)])[0]
+        return dict(zip(self.orchestrator_index.doc_ids, scores.tolist()))
+
+    def rank_orchestrators_many(self, requests: Iterable[str], min_score: float = 0.0) -> List[List[Tuple[str, float]]]:
+        """複数要求のオーケストレーターランキング"""
+        return self.orchestrator_index.rank_many([self.query_terms(r) for r in requests], min_score=min_score)
+
+    def rank_units(self, request: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """要求に関連するミニマルユニットのランキング"""
+        return self.unit_index.rank(self.query_terms(request), top_k=top_k)
+
+    def rank_units_many(self, requests: Iterable[str], top_k: int = 10) -> List[List[Tuple[str, float]]]:
+        """複数要求のミニマルユニットランキング"""
+        return self.unit_index.rank_many([self.query_terms(r) for r in requests], top_k=top_k)
+
+
+def check_regressions(analyzer) -> List[str]:
+    """REGRESSION_CASES の選択結果を確認し、不一致の説明を返す"""
+    failures = []
+    for request, top, expected, unexpected in REGRESSION_CASES:
+        selected = [o['name'] for o in analyzer.analyze_user_request(request)['orchestrators']]
+        if not selected or selected[0] != top:
+            failures.append(f"{request}: top is {selected[:1]}, expected {top}")
+        for name in expected:
+            if name not in selected:
+                failures.append(f"{request}: {name} is not selected")
+        for name in unexpected:
+            if name in selected:
+                failures.append(f"{request}: {name} should not be selected")
+    return failures
+
+
+def main():
+    # orchestrator_analyzerはこのモジュールを読み込むため、循環を避けてここでインポート
+    from orchestrator_analyzer import OrchestratorAnalyzer
+
+    parser = argparse.ArgumentParser(description='Relevance Ranker (BM25)')
+    parser.add_argument('requests', nargs='*', help='Request texts (default: one per line from stdin)')
+    parser.add_argument('--target', choices=['orchestrators', 'units'], default='orchestrators',
+                        help='Documents to rank')
+    parser.add_argument('--top', type=int, default=10, help='Number of results per request')
+    parser.add_argument('--check', action='store_true',
+                        help='Verify the orchestrator selections of the built-in regression cases')
+
+    args = parser.parse_args()
+
+    analyzer = OrchestratorAnalyzer()
+    if args.check:
+        failures = check_regressions(analyzer)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            sys.exit(1)
+        print(f"✅ {len(REGRESSION_CASES)} regression cases passed")
+        return
+
+    requests = args.requests or [line.rstrip('\n') for line in sys.stdin if line.strip()]
+
+    if args.target == 'units':
+        rankings = analyzer.ranker.rank_units_many(requests, top_k=args.top)
+    else:
+        rankings = [r[:args.top] for r in analyzer.ranker.rank_orchestrators_many(requests)]
+
+    for request, ranking in zip(requests, rankings):
+        print(json.dumps({
+            'request': request,
+            'ranking': [{'name': name, 'score': round(score, 4)} for name, score in ranking]
+        }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
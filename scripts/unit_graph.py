@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Unit Compatibility Graph
+ミニマルユニットの入出力シグネチャから互換グラフを構築し、パイプラインを自動合成する
+
+- ノード: ミニマルユニット（workflow_call の inputs / outputs）
+- エッジ: あるユニットの出力が別ユニットの必須入力を満たす場合
+- 合成: 利用可能な入力から目的の成果物までの最小コスト経路（AND-OR グラフ上のKnuth-Dijkstra）
+
+グラフはユニットファイルの (パス, mtime, サイズ) をキーにディスクへキャッシュし、
+合成結果は (利用可能入力, 目的成果物) ごとにメモ化する。
+"""
+
+import os
+import sys
+import json
+import heapq
+import hashlib
+import argparse
+from pathlib import Path
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional, Iterable, FrozenSet
+
+from atomic_io import write_json_atomic
+from minimal_unit_loader import iter_minimal_units, get_workflow_call
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = os.environ.get('UNIT_GRAPH_CACHE', '.cache/unit-graph.json')
+
+# どのユニットでも常に与えられる入力
+AMBIENT_INPUTS = {'output_dir'}
+
+# 要求文から通常得られる入力
+DEFAULT_AVAILABLE_INPUTS = {
+    'prompt', 'text', 'concept', 'topic', 'query', 'search_query', 'title',
+    'video_concept', 'project_concept', 'user_concept',
+    # 翻訳先の言語と、分析対象として要求に添えられるデータ
+    'target_language', 'data_path'
+}
+
+# 同じ種類の成果物を表す入出力名の対応
+ARTIFACT_ALIASES = {
+    'audio_file': 'audio_path',
+    'bgm_path': 'audio_path',
+    'reference_path': 'image_path',
+    'title_image_path': 'image_path',
+    'image_files': 'image_path',
+    'asset_path': 'file_path',
+    'content_path': 'document_path',
+    'article_path': 'document_path',
+    'blog_path': 'document_path',
+    'summary_path': 'document_path',
+    'generated_text': 'text',
+    'summary_text': 'text',
+    'translated_text': 'text',
+    'tweet_text': 'text',
+    'message': 'text',
+    'content': 'text',
+    'script': 'text',
+    'verified_script': 'text',
+    'optimized_prompt': 'prompt',
+    'data_json': 'data_path',
+    'data_csv': 'data_path',
+    'synced_path': 'srt_path',
+    'translated_path': 'srt_path',
+}
+
+# 自動合成の対象外（リカバリー・ロギングなど呼び出し元が明示的に使うユニット）
+EXCLUDED_CATEGORIES = {'utility', 'workflows', 'git-ops'}
+
+
+def artifact_type(port_name: str) -> str:
+    """入出力名を成果物の型に正規化"""
+    return ARTIFACT_ALIASES.get(port_name, port_name)
+
+
+def _port_names(ports) -> Dict[str, Dict]:
+    """dict形式・list形式の入出力定義を {名前: 定義} に揃える"""
+    if isinstance(ports, dict):
+        return {str(k): (v if isinstance(v, dict) else {}) for k, v in ports.items()}
+    if isinstance(ports, list):
+        return {str(p['name']): p for p in ports if isinstance(p, dict) and 'name' in p}
+    return {}
+
+
+def _unit_cost(definition: Dict) -> float:
+    """ユニットの推定コスト（分）。宣言がなければ1"""
+    minutes = definition.get('estimated_duration_minutes')
+    if isinstance(minutes, (int, float)) and minutes > 0:
+        return float(minutes)
+    return 1.0
+
+
+def _signature(paths: Iterable[str]) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def minimal_units_signature(minimal_units_dir: str = "minimal-units") -> str:
+    """ミニマルユニット定義の変更検知用シグネチャ（パス・mtime・サイズのハッシュ）"""
+    return _signature(sorted(str(p) for p in Path(minimal_units_dir).rglob('*.yml')))
+
+
+class UnitCompatibilityGraph:
+    def __init__(self, units: Dict[str, Dict]):
+        self.units = units
+        self.producers: Dict[str, List[str]] = {}
+        self.consumers: Dict[str, List[str]] = {}
+        for path, unit in units.items():
+            for artifact in unit['outputs']:
+                self.producers.setdefault(artifact, []).append(path)
+            for artifact in unit['inputs']:
+                self.consumers.setdefault(artifact, []).append(path)
+        self._init_memo()
+
+    def _init_memo(self):
+        # 合成結果のメモ（インスタンスごと。グラフを破棄すればメモも消える）
+        self._compose = lru_cache(maxsize=1024)(self._compose_uncached)
+
+    def __getstate__(self):
+        # メモはプロセスプールへ渡すときに持ち越さない
+        state = self.__dict__.copy()
+        del state['_compose']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_memo()
+
+    @classmethod
+    def load(cls, minimal_units_dir: str = "minimal-units",
+             cache_path: Optional[str] = DEFAULT_CACHE_PATH) -> 'UnitCompatibilityGraph':
+        """キャッシュが有効ならそれを使い、なければユニットを読み込んで構築"""
+        signature = minimal_units_signature(minimal_units_dir)
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('version') == CACHE_VERSION and cached.get('signature') == signature:
+                    return cls(cached['units'])
+            except (OSError, ValueError, KeyError):
+                pass
+
+        units = cls.read_signatures(minimal_units_dir)
+        if cache_path:
+            # バッチのワーカーが同時に読み込むため、書きかけのファイルが見えないよう置き換えで保存
+            write_json_atomic(cache_path, {'version': CACHE_VERSION, 'signature': signature, 'units': units},
+                              indent=None)
+        return cls(units)
+
+    @staticmethod
+    def read_signatures(minimal_units_dir: str) -> Dict[str, Dict]:
+        """各ユニットの必須入力・出力を成果物の型として抽出"""
+        units = {}
+        for path, definition in iter_minimal_units(minimal_units_dir):
+            if Path(path).relative_to(minimal_units_dir).parts[0] in EXCLUDED_CATEGORIES:
+                continue
+
+            workflow_call = get_workflow_call(definition)
+            inputs = _port_names(workflow_call.get('inputs') or definition.get('inputs')
+                                 or definition.get('input_requirements'))
+            outputs = _port_names(workflow_call.get('outputs') or definition.get('outputs')
+                                  or definition.get('output_format'))
+            if not outputs:
+                continue
+
+            required = sorted({artifact_type(name) for name, info in inputs.items()
+                               if info.get('required', False)} - AMBIENT_INPUTS)
+            units[path] = {
+                'name': Path(path).stem,
+                'category': Path(path).parent.name,
+                'inputs': required,
+                'outputs': sorted({artifact_type(name) for name in outputs}),
+                'cost': _unit_cost(definition)
+            }
+        return units
+
+    def edges(self) -> List[Tuple[str, str, str]]:
+        """(供給ユニット, 消費ユニット, 成果物) の一覧"""
+        result = []
+        for artifact, producers in self.producers.items():
+            for consumer in self.consumers.get(artifact, []):
+                for producer in producers:
+                    if producer != consumer:
+                        result.append((producer, consumer, artifact))
+        return result
+
+    def compose(self, available: Iterable[str], desired: Iterable[str]) -> Dict:
+        """利用可能な入力から目的の成果物を得る最小コストのユニット列を返す"""
+        return self._compose(frozenset(artifact_type(a) for a in available) | AMBIENT_INPUTS,
+                             frozenset(artifact_type(d) for d in desired))
+
+    def _compose_uncached(self, available: FrozenSet[str], desired: FrozenSet[str]) -> Dict:
+        best_cost, best_producer = self._cheapest_derivations(available)
+
+        selected: List[str] = []
+        needs: Dict[str, List[str]] = {}
+        visiting = set()
+
+        def visit(artifact: str) -> Optional[str]:
+            unit = best_producer.get(artifact)
+            if unit is None or unit in needs or unit in visiting:
+                return unit
+            visiting.add(unit)
+            upstream = []
+            for required in self.units[unit]['inputs']:
+                producer = visit(required)
+                if producer and producer not in upstream:
+                    upstream.append(producer)
+            visiting.discard(unit)
+            needs[unit] = upstream
+            selected.append(unit)  # 後順走査なので依存元が先に並ぶ
+            return unit
+
+        unsatisfied = []
+        for artifact in sorted(desired):
+            if artifact in available:
+                continue
+            if artifact not in best_cost:
+                unsatisfied.append(artifact)
+                continue
+            visit(artifact)
+
+        return {
+            'units': [
+                {
+                    'unit': unit,
+                    'name': self.units[unit]['name'],
+                    'category': self.units[unit]['category'],
+                    'needs': needs[unit],
+                    'provides': self.units[unit]['outputs']
+                }
+                for unit in selected
+            ],
+            'total_cost': sum(self.units[u]['cost'] for u in selected),
+            'unsatisfied': unsatisfied
+        }
+
+    def _cheapest_derivations(self, available: FrozenSet[str]) -> Tuple[Dict[str, float], Dict[str, str]]:
+        """各成果物を得る最小コストと、その時の生成ユニット（Knuthの一般化Dijkstra）"""
+        best_cost = {artifact: 0.0 for artifact in available}
+        best_producer: Dict[str, str] = {}
+        remaining = {path: len(unit['inputs']) for path, unit in self.units.items()}
+        finalized = set()
+        queue = [(0.0, artifact) for artifact in sorted(available)]
+        heapq.heapify(queue)
+
+        def fire(unit_path: str):
+            unit = self.units[unit_path]
+            cost = unit['cost'] + sum(best_cost[i] for i in unit['inputs'])
+            for artifact in unit['outputs']:
+                if cost < best_cost.get(artifact, float('inf')):
+                    best_cost[artifact] = cost
+                    best_producer[artifact] = unit_path
+                    heapq.heappush(queue, (cost, artifact))
+
+        for path, count in remaining.items():
+            if count == 0:
+                fire(path)
+
+        while queue:
+            cost, artifact = heapq.heappop(queue)
+            if artifact in finalized or cost > best_cost.get(artifact, float('inf')):
+                continue
+            finalized.add(artifact)
+            for consumer in self.consumers.get(artifact, []):
+                remaining[consumer] -= 1
+                if remaining[consumer] == 0:
+                    fire(consumer)
+
+        return best_cost, best_producer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Minimal unit compatibility graph')
+    parser.add_argument('--desired', nargs='+', help='Desired artifacts (e.g. video_path audio_path)')
+    parser.add_argument('--available', nargs='*', help='Available inputs (default: request-derived inputs)')
+    parser.add_argument('--edges', action='store_true', help='Output graph edges instead of composing')
+    parser.add_argument('--units-dir', default='minimal-units', help='Minimal units directory')
+    parser.add_argument('--no-cache', action='store_true', help='Rebuild without using the disk cache')
+
+    args = parser.parse_args()
+
+    graph = UnitCompatibilityGraph.load(args.units_dir, None if args.no_cache else DEFAULT_CACHE_PATH)
+
+    if args.edges:
+        result = [{'from': p, 'to': c, 'artifact': a} for p, c, a in graph.edges()]
+    elif args.desired:
+        available = DEFAULT_AVAILABLE_INPUTS if args.available is None else args.available
+        result = graph.compose(available, args.desired)
+    else:
+        print("Error: --desired or --edges is required", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
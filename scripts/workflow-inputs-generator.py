@@ -6,58 +6,89 @@ Workflow Inputs Generator
 
 import os
 import sys
+import copy
+import time
 import yaml
 import json
 import argparse
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+
+from input_override_stats import InputOverrideStats
 
 class WorkflowInputsGenerator:
-    def __init__(self, templates_dir: str = "meta/domain-templates"):
+    def __init__(self, templates_dir: str = "meta/domain-templates", override_stats_path: Optional[str] = None):
         self.templates_dir = Path(templates_dir)
+        # 過去の実行で既定値から変更された回数（input_override_stats.py で集計。なければ空）
+        self.override_stats = InputOverrideStats(
+            Path(override_stats_path) if override_stats_path
+            else self.templates_dir / "common" / "input-override-stats.json")
         # GitHub Actions inputsの制限
         self.MAX_INPUTS = 10
         self.MAX_DESCRIPTION_LENGTH = 1000
         self.VALID_INPUT_TYPES = ['string', 'boolean', 'choice', 'environment']
+        # ドメインごとの解析済みスキーマとコンパイル結果（1プロセスで各ドメイン1回だけ解析）
+        self._schemas: Dict[str, Dict[str, Any]] = {}
+        self._compiled: Dict[str, Dict[str, Any]] = {}
         
     def load_domain_input_schema(self, domain: str) -> Dict[str, Any]:
-        """ドメインのinput-schema.yamlを読み込む"""
+        """ドメインのinput-schema.yamlを読み込む（解析結果はドメインごとにキャッシュ）"""
+        if domain in self._schemas:
+            return self._schemas[domain]
+        
         schema_path = self.templates_dir / domain / "input-schema.yaml"
         
         if not schema_path.exists():
             raise FileNotFoundError(f"Input schema not found for domain: {domain}")
             
         with open(schema_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+            schema = yaml.safe_load(f)
+        self._schemas[domain] = schema
+        return schema
+    
+    def compile_domain(self, domain: str) -> Dict[str, Any]:
+        """ドメインのスキーマをコンパイル（優先順位付けした入力一覧・GitHub inputs・YAMLブロックを事前計算）"""
+        compiled = self._compiled.get(domain)
+        if compiled is None:
+            schema = self.load_domain_input_schema(domain)
+            prioritized_inputs = self.prioritize_inputs(schema, domain)
+            workflow_inputs = self._build_workflow_inputs(prioritized_inputs)
+            compiled = {
+                'domain': domain,
+                'prioritized_inputs': prioritized_inputs,
+                'workflow_inputs': workflow_inputs,
+                'inputs_yaml': self._format_inputs_yaml(workflow_inputs)
+            }
+            self._compiled[domain] = compiled
+        return compiled
     
-    def prioritize_inputs(self, schema: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """入力項目を優先順位付けして最大10個に絞り込む"""
+    def prioritize_inputs(self, schema: Dict[str, Any], domain: Optional[str] = None) -> List[Dict[str, Any]]:
+        """入力項目を優先順位付けして最大10個に絞り込む
+
+        必須パラメータを先頭に、残りの枠は過去の実行で変更された回数が多いパラメータに割り当てる
+        （入力にないパラメータの変更はワークフローの再生成が必要になるため）。
+        履歴のないパラメータは、推奨パラメータのうち重要なキーワードを含むものだけを候補にする。
+        """
+        overrides = self.override_stats.overrides(domain) if domain else {}
         all_inputs = []
         
-        # 必須パラメータ（最優先）
-        if 'inputs' in schema and 'required' in schema['inputs']:
-            for param_name, param_info in schema['inputs']['required'].items():
+        # 必須（最優先）→ 推奨（中優先）→ 任意（変更履歴があるときだけ）
+        for group, priority in (('required', 1), ('recommended', 2), ('optional', 3)):
+            for param_name, param_info in ((schema.get('inputs') or {}).get(group) or {}).items():
+                override_count = overrides.get(param_name, 0)
+                if priority > 1 and not override_count and not (
+                        priority == 2 and self._is_important_param(param_name, param_info)):
+                    continue
                 all_inputs.append({
                     'name': param_name,
                     'info': param_info,
-                    'priority': 1,
-                    'required': True
+                    'priority': priority,
+                    'required': priority == 1,
+                    'overrides': override_count
                 })
         
-        # 推奨パラメータ（中優先）
-        if 'inputs' in schema and 'recommended' in schema['inputs']:
-            for param_name, param_info in schema['inputs']['recommended'].items():
-                # 最も重要そうなものを選択
-                if self._is_important_param(param_name, param_info):
-                    all_inputs.append({
-                        'name': param_name,
-                        'info': param_info,
-                        'priority': 2,
-                        'required': False
-                    })
-        
-        # 優先順位でソートして最大10個に制限
-        all_inputs.sort(key=lambda x: (x['priority'], x['name']))
+        # 必須 → 変更回数の多い順 → 優先順位でソートして最大10個に制限
+        all_inputs.sort(key=lambda x: (not x['required'], -x['overrides'], x['priority'], x['name']))
         return all_inputs[:self.MAX_INPUTS]
     
     def _is_important_param(self, name: str, info: Dict[str, Any]) -> bool:
@@ -185,13 +216,11 @@ class WorkflowInputsGenerator:
     def generate_workflow_inputs(self, domain: str, 
                                 issue_content: Optional[str] = None) -> Dict[str, Any]:
         """ドメインに基づいてworkflow_dispatch inputsを生成"""
-        # input-schema.yamlを読み込む
-        schema = self.load_domain_input_schema(domain)
-        
-        # 優先順位付けして入力項目を選択
-        prioritized_inputs = self.prioritize_inputs(schema)
-        
-        # GitHub Actions形式に変換
+        # コンパイル済みの結果を複製して返す（呼び出し側で変更してもキャッシュに影響しない）
+        return copy.deepcopy(self.compile_domain(domain)['workflow_inputs'])
+    
+    def _build_workflow_inputs(self, prioritized_inputs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """優先順位付けした入力項目をGitHub Actions形式に変換"""
         workflow_inputs = {}
         
         # 常に含めるべき共通入力
@@ -218,40 +247,91 @@ class WorkflowInputsGenerator:
         
         return workflow_inputs
     
-    def generate_workflow_with_inputs(self, workflow_path: str, inputs: Dict[str, Any]) -> str:
-        """既存のワークフローにinputsセクションを追加"""
-        with open(workflow_path, 'r', encoding='utf-8') as f:
+    def generate_workflow_with_inputs(self, workflow_path: str, inputs: Dict[str, Any],
+                                      inputs_yaml: Optional[str] = None) -> str:
+        """既存のワークフローにinputsセクションを追加（inputs_yaml があればそのブロックを使う）"""
+        # 改行コードも含めて元のまま保つため、改行を変換せずに読む
+        with open(workflow_path, 'r', encoding='utf-8', newline='') as f:
             workflow_content = f.read()
         
         # workflow_dispatch inputsを生成
-        inputs_yaml = self._format_inputs_yaml(inputs)
-        
-        # 既存のworkflow_dispatchセクションを探して置換
-        if 'workflow_dispatch:' in workflow_content:
-            if 'inputs:' in workflow_content:
-                # 既存のinputsを置換
-                import re
-                pattern = r'(workflow_dispatch:\s*\n)(\s*inputs:[\s\S]*?)(\n\w|\n\s*$)'
-                replacement = f'\\1{inputs_yaml}\\3'
-                new_content = re.sub(pattern, replacement, workflow_content)
-            else:
-                # inputsを追加
-                new_content = workflow_content.replace(
-                    'workflow_dispatch:',
-                    f'workflow_dispatch:\n{inputs_yaml}'
-                )
-        else:
-            # workflow_dispatchセクション自体を追加
-            trigger_section = f"""  workflow_dispatch:
-{inputs_yaml}"""
-            
-            # onセクションに追加
-            if '\non:' in new_content:
-                new_content = new_content.replace('\non:', f'\non:\n{trigger_section}')
-            else:
-                new_content = f"on:\n{trigger_section}\n\n{new_content}"
+        if inputs_yaml is None:
+            inputs_yaml = self._format_inputs_yaml(inputs)
         
-        return new_content
+        return self.patch_workflow_dispatch_inputs(workflow_content, inputs_yaml)
+    
+    def patch_workflow_dispatch_inputs(self, workflow_content: str, inputs_yaml: str) -> str:
+        """on.workflow_dispatch.inputs をYAMLの位置情報で特定し、その範囲だけを新しいinputsに置き換える
+        
+        置き換える範囲以外は1バイトも変更しない（追加する行は元のファイルの改行コードに合わせる）。
+        トリガーの書き方ごとの扱い:
+        - inputs がある: inputs のキーから最後の値までを置き換え
+        - workflow_dispatch: だけ（値なし）/ {} / inputs以外のキーのみ: inputs を追加
+        - workflow_dispatch がない: on の最後に workflow_dispatch を追加
+        - on: push / on: [push, ...] / on: {...}: 同じイベントのブロック形式に書き換えて追加
+        - on がない: jobs の前（なければ末尾）に on を追加
+        """
+        root = yaml.compose(workflow_content, Loader=COMPOSE_LOADER)
+        if root is None:
+            return f"on:\n  workflow_dispatch:\n{_indent_block(inputs_yaml, 4)}\n"
+        if not isinstance(root, yaml.MappingNode):
+            raise ValueError("Workflow root must be a mapping")
+        
+        on_key, on_node = _find_key(root, 'on')
+        if on_key is None:
+            # onセクション自体を追加（jobsの前）
+            indent = root.value[0][0].start_mark.column if root.value else 0
+            trigger = _indent_lines(f"on:\n  workflow_dispatch:\n{_indent_block(inputs_yaml, 4)}", indent)
+            jobs_key, _ = _find_key(root, 'jobs')
+            if jobs_key is not None:
+                position = jobs_key.start_mark.index - jobs_key.start_mark.column
+                return _splice(workflow_content, position, position, f"{trigger}\n\n")
+            position = _content_end(root)
+            return _splice(workflow_content, position, position, f"\n{trigger}")
+        
+        events_indent = on_key.start_mark.column + 2
+        if not isinstance(on_node, yaml.MappingNode) or on_node.flow_style:
+            # on: push / on: [push, pull_request] / on: {push: ...} をブロック形式に展開
+            lines = []
+            for name, value_text in _trigger_events(workflow_content, on_node):
+                if name == 'workflow_dispatch':
+                    continue
+                lines.append(f"{name}:" + (f" {value_text}" if value_text else ""))
+            lines.append("workflow_dispatch:")
+            block = _indent_lines('\n'.join(lines), events_indent)
+            block += '\n' + _indent_block(inputs_yaml, events_indent + 2)
+            return _splice(workflow_content, _value_start(workflow_content, on_key), _content_end(on_node), '\n' + block)
+        
+        dispatch_key, dispatch_node = _find_key(on_node, 'workflow_dispatch')
+        if dispatch_key is None:
+            # onの最後のイベントの後ろに workflow_dispatch を追加
+            indent = on_node.value[0][0].start_mark.column if on_node.value else events_indent
+            block = _indent_lines("workflow_dispatch:", indent) + '\n' + _indent_block(inputs_yaml, indent + 2)
+            position = _content_end(on_node)
+            return _splice(workflow_content, position, position, '\n' + block)
+        
+        if isinstance(dispatch_node, yaml.MappingNode) and not dispatch_node.flow_style and dispatch_node.value:
+            inputs_key, inputs_node = _find_key(dispatch_node, 'inputs')
+            if inputs_key is not None:
+                # 既存のinputsを置き換え（キーの位置から始まるため1行目のインデントは不要）
+                block = _indent_block(inputs_yaml, inputs_key.start_mark.column).lstrip(' ')
+                return _splice(workflow_content, inputs_key.start_mark.index, _content_end(inputs_node), block)
+            # inputs以外のキーだけがある場合は、その前にinputsを追加
+            first_key = dispatch_node.value[0][0]
+            position = first_key.start_mark.index - first_key.start_mark.column
+            block = _indent_block(inputs_yaml, first_key.start_mark.column)
+            return _splice(workflow_content, position, position, block + '\n')
+        
+        if isinstance(dispatch_node, yaml.ScalarNode) and dispatch_node.value == '':
+            # workflow_dispatch:（値なし）: キーの行末（コメントの後ろ）にinputsを追加
+            position = _line_end(workflow_content, dispatch_key.end_mark.index)
+            block = _indent_block(inputs_yaml, dispatch_key.start_mark.column + 2)
+            return _splice(workflow_content, position, position, '\n' + block)
+        
+        # workflow_dispatch: {} / null などは値をinputsに置き換え
+        block = _indent_block(inputs_yaml, dispatch_key.start_mark.column + 2)
+        return _splice(workflow_content, _value_start(workflow_content, dispatch_key), _content_end(dispatch_node),
+                       '\n' + block)
     
     def _format_inputs_yaml(self, inputs: Dict[str, Any]) -> str:
         """inputsをYAML形式にフォーマット"""
@@ -285,18 +365,171 @@ class WorkflowInputsGenerator:
         return '\n'.join(lines)
 
 
+# _format_inputs_yaml が出力する inputs: の行のインデント
+INPUTS_BASE_INDENT = 4
+
+# 位置情報付きのノード解析にはlibyamlがあればC実装を使う（位置は同じ文字単位のインデックス）
+COMPOSE_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+def _indent_lines(text: str, indent: int) -> str:
+    return '\n'.join((' ' * indent + line) if line else line for line in text.split('\n'))
+
+def _indent_block(inputs_yaml: str, indent: int) -> str:
+    """inputsブロックのインデントを inputs: が indent 桁目になるよう付け替える"""
+    lines = [line[INPUTS_BASE_INDENT:] if line.startswith(' ' * INPUTS_BASE_INDENT) else line.lstrip(' ')
+             for line in inputs_yaml.split('\n')]
+    return _indent_lines('\n'.join(lines), indent)
+
+def _find_key(mapping: yaml.MappingNode, name: str):
+    """マッピングノードからキーを探して (キーノード, 値ノード) を返す（なければ (None, None)）"""
+    for key_node, value_node in mapping.value:
+        if isinstance(key_node, yaml.ScalarNode) and key_node.value == name:
+            return key_node, value_node
+    return None, None
+
+def _content_end(node) -> int:
+    """ノードの内容が終わる位置（ブロック形式の後ろに続く空行やコメントを含めない）"""
+    if isinstance(node, yaml.MappingNode) and not node.flow_style and node.value:
+        key_node, value_node = node.value[-1]
+        return max(_content_end(key_node), _content_end(value_node))
+    if isinstance(node, yaml.SequenceNode) and not node.flow_style and node.value:
+        return _content_end(node.value[-1])
+    return node.end_mark.index
+
+def _value_start(content: str, key_node) -> int:
+    """キーの直後の ':' の次の位置"""
+    return content.index(':', key_node.end_mark.index) + 1
+
+def _line_end(content: str, index: int) -> int:
+    newline = content.find('\n', index)
+    if newline < 0:
+        return len(content)
+    return newline - 1 if newline > 0 and content[newline - 1] == '\r' else newline
+
+def _splice(content: str, start: int, end: int, replacement: str) -> str:
+    if '\r\n' in content:
+        replacement = replacement.replace('\r\n', '\n').replace('\n', '\r\n')
+    return content[:start] + replacement + content[end:]
+
+def _trigger_events(content: str, node) -> List[Tuple[str, str]]:
+    """on: の値（スカラー / シーケンス / フロー形式のマッピング）を (イベント名, 値の元の表記) に分解"""
+    if isinstance(node, yaml.ScalarNode):
+        return [(node.value, '')] if node.value else []
+    if isinstance(node, yaml.SequenceNode):
+        return [(item.value, '') for item in node.value if isinstance(item, yaml.ScalarNode)]
+    events = []
+    for key_node, value_node in node.value:
+        value_text = content[value_node.start_mark.index:value_node.end_mark.index]
+        events.append((key_node.value, value_text))
+    return events
+
+
+# 一括処理（ワーカープロセスごとに1つのジェネレーターを保持）
+_bulk_generator = None
+
+def _init_bulk_worker(generator: WorkflowInputsGenerator):
+    global _bulk_generator
+    _bulk_generator = generator
+
+def _process_manifest_entry(item: Tuple[int, Dict[str, Any]]) -> Dict[str, Any]:
+    """マニフェストの1エントリのワークフローにドメインのinputsを反映"""
+    line_no, entry = item
+    result = {
+        'workflow': entry.get('workflow'),
+        'domain': entry.get('domain'),
+        'output': entry.get('output') or entry.get('workflow')
+    }
+    
+    started = time.perf_counter()
+    try:
+        compiled = _bulk_generator.compile_domain(entry['domain'])
+        updated_workflow = _bulk_generator.generate_workflow_with_inputs(
+            entry['workflow'], compiled['workflow_inputs'], compiled['inputs_yaml']
+        )
+        os.makedirs(os.path.dirname(result['output']) or '.', exist_ok=True)
+        with open(result['output'], 'w', encoding='utf-8', newline='') as f:
+            f.write(updated_workflow)
+        result['inputs'] = len(compiled['workflow_inputs'])
+    except Exception as e:
+        result['error'] = f"line {line_no}: {e}"
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+def _read_manifest(manifest_path: str, output_dir: Optional[str] = None) -> List[Tuple[int, Dict[str, Any]]]:
+    """マニフェスト（1行1件のJSONL: workflow, domain, 任意でoutput）を読み込む"""
+    entries = []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if output_dir and not entry.get('output') and entry.get('workflow'):
+                entry['output'] = os.path.join(output_dir, os.path.basename(entry['workflow']))
+            entries.append((line_no, entry))
+    return entries
+
+def run_bulk(manifest_path: str, output_dir: Optional[str] = None, workers: Optional[int] = None,
+             templates_dir: str = "meta/domain-templates",
+             override_stats_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """マニフェストのワークフローをプロセスプールで一括更新"""
+    from concurrent.futures import ProcessPoolExecutor
+    
+    entries = _read_manifest(manifest_path, output_dir)
+    
+    # マニフェストに出てくるドメインは親プロセスで1回だけコンパイルし、各ワーカーへ渡す
+    generator = WorkflowInputsGenerator(templates_dir, override_stats_path)
+    for domain in sorted({entry['domain'] for _, entry in entries if entry.get('domain')}):
+        try:
+            generator.compile_domain(domain)
+        except FileNotFoundError as e:
+            print(f"Warning: {e}")
+    
+    workers = max(1, min(workers or os.cpu_count() or 1, len(entries) or 1))
+    started = time.perf_counter()
+    if workers == 1:
+        _init_bulk_worker(generator)
+        results = [_process_manifest_entry(item) for item in entries]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_bulk_worker,
+                                 initargs=(generator,)) as executor:
+            results = list(executor.map(_process_manifest_entry, entries, chunksize=8))
+    
+    elapsed = time.perf_counter() - started
+    failed = [r for r in results if 'error' in r]
+    for result in failed:
+        print(f"❌ {result['workflow']} ({result['domain']}): {result['error']}")
+    print(f"✅ Bulk inputs generation completed: {len(results) - len(failed)}/{len(results)} workflows "
+          f"in {elapsed:.2f}s ({workers} workers, {len(generator._compiled)} domains compiled)")
+    return results
+
+
 def main():
     parser = argparse.ArgumentParser(description='Generate workflow inputs')
-    parser.add_argument('--domain', required=True, help='Domain name')
+    parser.add_argument('--domain', help='Domain name')
     parser.add_argument('--workflow', help='Workflow file to update')
     parser.add_argument('--issue', help='Issue content file')
     parser.add_argument('--output', help='Output file')
     parser.add_argument('--format', choices=['json', 'yaml'], default='json',
                         help='Output format')
+    parser.add_argument('--manifest', help='JSONL manifest of workflow/domain pairs for bulk mode '
+                                           '(one {"workflow": ..., "domain": ..., "output": ...} per line)')
+    parser.add_argument('--output-dir', help='Output directory for --manifest entries without "output" '
+                                             '(default: update workflows in place)')
+    parser.add_argument('--workers', type=int, help='Worker processes for --manifest (default: CPU count)')
+    parser.add_argument('--override-stats', help='Input override stats JSON from input_override_stats.py '
+                                                 '(default: meta/domain-templates/common/input-override-stats.json)')
     
     args = parser.parse_args()
     
-    generator = WorkflowInputsGenerator()
+    if args.manifest:
+        results = run_bulk(args.manifest, args.output_dir, args.workers,
+                           override_stats_path=args.override_stats)
+        sys.exit(1 if any('error' in r for r in results) else 0)
+    
+    if not args.domain:
+        parser.error('--domain is required unless --manifest is given')
+    
+    generator = WorkflowInputsGenerator(override_stats_path=args.override_stats)
     
     # イシュー内容を読み込む（オプション）
     issue_content = None
@@ -312,7 +545,7 @@ def main():
         updated_workflow = generator.generate_workflow_with_inputs(args.workflow, inputs)
         
         if args.output:
-            with open(args.output, 'w', encoding='utf-8') as f:
+            with open(args.output, 'w', encoding='utf-8', newline='') as f:
                 f.write(updated_workflow)
         else:
             print(updated_workflow)
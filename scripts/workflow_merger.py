@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Workflow Merger
+複数のオーケストレーターのジョブを1つのDAGに統合する
+
+- 同じユニット（uses）を同じ入力（正規化した with:）で呼ぶジョブは1つにまとめる
+- needs と with: 内の needs.<job> 参照は統合後のジョブIDに付け替える
+- ブランチ作成・PR作成のようなセッション単位のユニットは入力に関係なく1つにまとめる
+- 別の処理なのにジョブIDが衝突する場合は -2, -3 ... を付けて区別する
+"""
+
+import re
+import json
+from typing import Dict, List, Tuple
+
+# 統合後のワークフローで1回だけ実行するユニット（後から統合した側の needs は合流させる）
+SESSION_UNITS = {'module-setup-branch.yml', 'module-create-pr.yml'}
+
+EXPRESSION_PATTERN = re.compile(r'\$\{\{\s*(.*?)\s*\}\}', re.DOTALL)
+NEEDS_REFERENCE_PATTERN = re.compile(r'\bneeds\.([A-Za-z0-9_-]+)\.')
+
+
+def unit_name(uses: str) -> str:
+    """uses のパスからユニットのファイル名を取り出す"""
+    return str(uses).rsplit('/', 1)[-1]
+
+
+def _as_list(needs) -> List[str]:
+    if not needs:
+        return []
+    return [needs] if isinstance(needs, str) else list(needs)
+
+
+def normalize_value(value, job_ids: Dict[str, str]) -> str:
+    """with: の値を比較用に正規化し、needs参照を統合後のジョブIDに付け替える"""
+    if not isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+    def rewrite(match: re.Match) -> str:
+        expression = ' '.join(match.group(1).split())
+        expression = expression.replace('github.event.inputs.', 'inputs.')
+        expression = NEEDS_REFERENCE_PATTERN.sub(
+            lambda m: f"needs.{job_ids.get(m.group(1), m.group(1))}.", expression)
+        return '${{ ' + expression + ' }}'
+
+    return EXPRESSION_PATTERN.sub(rewrite, value.strip())
+
+
+def topological_order(jobs: List[Dict]) -> List[Dict]:
+    """needs に従ってジョブを並べる（依存のない範囲では元の順序を保つ）"""
+    names = {job['name'] for job in jobs}
+    remaining = {job['name']: {n for n in _as_list(job.get('needs')) if n in names} for job in jobs}
+    ordered, done = [], set()
+    while len(ordered) < len(jobs):
+        ready = [job for job in jobs if job['name'] not in done and remaining[job['name']] <= done]
+        if not ready:
+            # 循環がある場合は残りを元の順序で追加
+            ready = [job for job in jobs if job['name'] not in done]
+        for job in ready:
+            ordered.append(job)
+            done.add(job['name'])
+    return ordered
+
+
+def dag_levels(jobs: List[Dict]) -> List[List[str]]:
+    """各ジョブを最長依存段数でグループ化（同じ段のジョブは並列実行できる）"""
+    level: Dict[str, int] = {}
+    for job in topological_order(jobs):
+        level[job['name']] = 1 + max((level[n] for n in _as_list(job.get('needs')) if n in level), default=-1)
+
+    groups: List[List[str]] = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for job in jobs:
+        groups[level[job['name']]].append(job['name'])
+    return groups
+
+
+class WorkflowMerger:
+    def __init__(self):
+        self.jobs: Dict[str, Dict] = {}
+        self.by_signature: Dict[Tuple, str] = {}
+
+    def signature(self, job: Dict, job_ids: Dict[str, str]) -> Tuple:
+        uses = unit_name(job['uses'])
+        if uses in SESSION_UNITS:
+            return (uses,)
+        inputs = tuple(sorted((key, normalize_value(value, job_ids))
+                              for key, value in (job.get('with') or {}).items()))
+        return (uses, inputs)
+
+    def _new_job_id(self, name: str) -> str:
+        if name not in self.jobs:
+            return name
+        suffix = 2
+        while f"{name}-{suffix}" in self.jobs:
+            suffix += 1
+        return f"{name}-{suffix}"
+
+    def add(self, source: str, relevance: float, jobs: List[Dict]):
+        """1つのオーケストレーターのジョブを統合（関連性の高い順に呼び出す）"""
+        job_ids: Dict[str, str] = {}
+        for job in topological_order(jobs):
+            needs = []
+            for name in _as_list(job.get('needs')):
+                if name in job_ids and job_ids[name] not in needs:
+                    needs.append(job_ids[name])
+
+            key = self.signature(job, job_ids)
+            if key in self.by_signature:
+                job_id = self.by_signature[key]
+                merged = self.jobs[job_id]
+                merged['job']['needs'].extend(n for n in needs if n not in merged['job']['needs'] and n != job_id)
+                if source not in merged['sources']:
+                    merged['sources'].append(source)
+                merged['merged_from'].append(f"{source}:{job['name']}")
+                job_ids[job['name']] = job_id
+                continue
+
+            job_id = self._new_job_id(job['name'])
+            job_ids[job['name']] = job_id
+            self.by_signature[key] = job_id
+            self.jobs[job_id] = {
+                'job': {
+                    'name': job_id,
+                    'uses': job['uses'],
+                    'needs': needs,
+                    'with': {k: normalize_value(v, job_ids) if isinstance(v, str) else v
+                             for k, v in (job.get('with') or {}).items()}
+                },
+                'source': source,
+                'relevance': relevance,
+                'sources': [source],
+                'merged_from': [f"{source}:{job['name']}"]
+            }
+
+    def merged_jobs(self) -> List[Dict]:
+        """統合したジョブを依存順に返す"""
+        entries = list(self.jobs.values())
+        order = topological_order([entry['job'] for entry in entries])
+        by_id = {entry['job']['name']: entry for entry in entries}
+        return [by_id[job['name']] for job in order]
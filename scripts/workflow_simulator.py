@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Workflow Simulator
+生成したワークフロー（YAML）または実行計画（orchestrator_analysis.json）の所要時間を
+離散イベントシミュレーションのモンテカルロで予測する
+
+モデル化するもの:
+- ジョブ開始のオーバーヘッド（ランナー割り当て・チェックアウト）
+- needs による依存関係と matrix による展開（max-parallel を含む）
+- uses: で呼び出すワークフロー（呼び出し先のジョブはそれぞれ別のランナーで動く）
+- リポジトリあたりの同時実行ジョブ数の上限
+- MCPサービスごとの同時実行数の上限とレイテンシ分布（mcp-services.yaml）
+
+結果として makespan のパーセンタイルと、待ち時間が最も長かったリソース（ボトルネック）を出力する。
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import heapq
+import random
+import argparse
+from pathlib import Path
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+import numpy as np
+
+from mcp_service_catalog import McpServiceCatalog, DEFAULT_CATALOG_PATH, DEFAULT_LOGS_DIR
+from minimal_unit_loader import load_unit_definition
+
+# GitHub Actions の同時実行ジョブ数の上限（Free / Pro プラン）
+DEFAULT_MAX_CONCURRENT_JOBS = 20
+
+# ステップ種別ごとの所要時間（秒, p50 / p95）
+STEP_DURATIONS = {
+    'job_start': (15, 60),   # ランナー割り当て + チェックアウト
+    'setup': (5, 20),        # uses: actions/* などの準備ステップ
+    'agent': (60, 240),      # Claude Code の実行（MCP呼び出しの前後処理を含む）
+    'run': (3, 15)           # 通常のシェルステップ
+}
+
+# uses: で呼び出すワークフローを探す場所
+CALLED_WORKFLOW_DIRS = ['.github/workflows', 'kamuicode-workflow/module-workflow', 'minimal-units']
+
+MCP_SERVER_PATTERN = re.compile(r'mcp__([A-Za-z0-9-]+?)__')
+RUNNERS = 'runners'
+
+
+def _sample_lognormal(rng: random.Random, p50: float, p95: float) -> float:
+    """p50 / p95 から対数正規分布を当てはめてサンプリング"""
+    if p50 <= 0:
+        return 0.0
+    sigma = math.log(max(p95, p50) / p50) / 1.645
+    return rng.lognormvariate(math.log(p50), sigma)
+
+
+def _as_list(value) -> List[str]:
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+class SimJob:
+    """シミュレーション上のジョブ（matrix の展開数とステップ列）"""
+
+    def __init__(self, name: str, needs: List[str], tasks: List[Tuple[str, Optional[str]]],
+                 fan_out: int = 1, max_parallel: Optional[int] = None):
+        self.name = name
+        self.needs = needs
+        self.tasks = tasks
+        self.fan_out = max(1, fan_out)
+        self.max_parallel = max_parallel
+
+
+class WorkflowModel:
+    """ワークフローYAML・実行計画からシミュレーション用のジョブ一覧を構築"""
+
+    def __init__(self, catalog: McpServiceCatalog, default_fan_out: int = 1,
+                 fan_out_overrides: Optional[Dict[str, int]] = None):
+        self.catalog = catalog
+        self.default_fan_out = default_fan_out
+        self.fan_out_overrides = fan_out_overrides or {}
+        self._called_jobs: Dict[str, List[Tuple[str, List[str], List[Tuple[str, Optional[str]]], Optional[Dict]]]] = {}
+
+    def load(self, path: str) -> List[SimJob]:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith('.json'):
+                return self.from_plan(json.load(f))
+            return self.from_workflow(yaml.safe_load(f))
+
+    def classify_step(self, step: Dict) -> List[Tuple[str, Optional[str]]]:
+        """ステップを (種別, サービス) の列に変換"""
+        text = yaml.safe_dump(step, allow_unicode=True)
+        for server in MCP_SERVER_PATTERN.findall(text):
+            service = self.catalog.resolve(server)
+            if service:
+                return [('agent', None), ('service', service)]
+        if 'claude-code' in text or 'claude_code' in text:
+            return [('agent', None)]
+        if 'uses' in step:
+            return [('setup', None)]
+        return [('run', None)]
+
+    def tasks_for_steps(self, steps: List[Dict]) -> List[Tuple[str, Optional[str]]]:
+        tasks = []
+        for step in steps or []:
+            if isinstance(step, dict):
+                tasks.extend(self.classify_step(step))
+        return tasks
+
+    def called_jobs(self, uses: str) -> List[Tuple[str, List[str], List[Tuple[str, Optional[str]]], Optional[Dict]]]:
+        """uses: で呼び出すワークフローのジョブ（名前, needs, ステップ, strategy）の一覧"""
+        if uses in self._called_jobs:
+            return self._called_jobs[uses]
+
+        jobs = []
+        path = self._find_called_workflow(uses)
+        definition = load_unit_definition(path) if path else {}
+        for name, job in (definition.get('jobs') or {}).items():
+            if isinstance(job, dict):
+                jobs.append((name, _as_list(job.get('needs')), self.tasks_for_steps(job.get('steps')),
+                             job.get('strategy')))
+        if not any(tasks for _, _, tasks, _ in jobs):
+            jobs = [('main', [], [('agent', None)], None)]  # 定義が読めない場合はエージェント1回分とみなす
+
+        self._called_jobs[uses] = jobs
+        return jobs
+
+    def expand_called_workflow(self, name: str, uses: str, needs: List[str], fan_out: int = 1,
+                               max_parallel: Optional[int] = None) -> List[SimJob]:
+        """呼び出し元のジョブを、呼び出し先のジョブごとのSimJob（名前は 呼び出し元/呼び出し先）に展開する
+
+        呼び出し先のジョブはそれぞれランナーを1つ使い、呼び出し先の needs に従って並行に動く。
+        呼び出し元の matrix は呼び出し先の各ジョブの展開数に掛け合わせる。
+        """
+        inner_jobs = self.called_jobs(uses)
+        inner_names = {inner for inner, _, _, _ in inner_jobs}
+        jobs = []
+        for inner, inner_needs, tasks, strategy in inner_jobs:
+            inner_fan_out, inner_max_parallel = self.matrix_size(f"{name}/{inner}", strategy)
+            local_needs = [f"{name}/{n}" for n in inner_needs if n in inner_names]
+            if max_parallel and inner_max_parallel:
+                inner_max_parallel *= max_parallel
+            jobs.append(SimJob(f"{name}/{inner}", local_needs or list(needs), tasks, fan_out * inner_fan_out,
+                               inner_max_parallel or max_parallel))
+        return jobs
+
+    def _find_called_workflow(self, uses: str) -> Optional[str]:
+        if os.path.isfile(uses):
+            return uses
+        name = os.path.basename(str(uses).split('@')[0])
+        for directory in CALLED_WORKFLOW_DIRS:
+            for candidate in Path(directory).rglob(name) if os.path.isdir(directory) else []:
+                return str(candidate)
+        return None
+
+    def matrix_size(self, name: str, strategy: Optional[Dict]) -> Tuple[int, Optional[int]]:
+        """matrix の展開数と max-parallel"""
+        if name in self.fan_out_overrides:
+            max_parallel = (strategy or {}).get('max-parallel') if isinstance(strategy, dict) else None
+            return self.fan_out_overrides[name], max_parallel if isinstance(max_parallel, int) else None
+        if not isinstance(strategy, dict) or 'matrix' not in strategy:
+            return 1, None
+
+        matrix = strategy['matrix']
+        max_parallel = strategy.get('max-parallel')
+        max_parallel = max_parallel if isinstance(max_parallel, int) else None
+        if not isinstance(matrix, dict):
+            return self.default_fan_out, max_parallel  # fromJson(...) などは実行時まで不明
+
+        size, dimensions = 1, 0
+        for key, values in matrix.items():
+            if key in ('include', 'exclude'):
+                continue
+            dimensions += 1
+            size *= len(values) if isinstance(values, list) else self.default_fan_out
+        if dimensions == 0:
+            size = len(matrix.get('include') or []) or 1
+        size -= len(matrix.get('exclude') or [])
+        return max(size, 1), max_parallel
+
+    def from_workflow(self, workflow: Dict) -> List[SimJob]:
+        jobs = []
+        called: Dict[str, List[str]] = {}
+        for name, job in (workflow.get('jobs') or {}).items():
+            if not isinstance(job, dict):
+                continue
+            # 失敗時のみ動くリカバリージョブは正常系の所要時間に含めない
+            if 'failure()' in str(job.get('if', '')):
+                continue
+            fan_out, max_parallel = self.matrix_size(name, job.get('strategy'))
+            if 'uses' in job:
+                expanded = self.expand_called_workflow(name, job['uses'], _as_list(job.get('needs')),
+                                                       fan_out, max_parallel)
+                called[name] = [inner.name for inner in expanded]
+                jobs.extend(expanded)
+            else:
+                jobs.append(SimJob(name, _as_list(job.get('needs')), self.tasks_for_steps(job.get('steps')),
+                                   fan_out, max_parallel))
+        return self._drop_missing_needs(self._resolve_called_needs(jobs, called))
+
+    def from_plan(self, plan: Dict) -> List[SimJob]:
+        """orchestrator_analyzer の実行計画（workflow.jobs または jobs）を読み込む"""
+        plan = plan.get('plan', plan)
+        workflow = plan.get('workflow', plan)
+        jobs = []
+        called: Dict[str, List[str]] = {}
+        for entry in workflow.get('jobs', []):
+            job = entry.get('job', entry)
+            uses = job.get('uses') or job.get('unit')
+            fan_out, _ = self.matrix_size(job['name'], None)
+            if uses:
+                expanded = self.expand_called_workflow(job['name'], uses, _as_list(job.get('needs')), fan_out)
+                called[job['name']] = [inner.name for inner in expanded]
+                jobs.extend(expanded)
+            else:
+                jobs.append(SimJob(job['name'], _as_list(job.get('needs')), [('agent', None)], fan_out))
+        return self._drop_missing_needs(self._resolve_called_needs(jobs, called))
+
+    @staticmethod
+    def _resolve_called_needs(jobs: List[SimJob], called: Dict[str, List[str]]) -> List[SimJob]:
+        """呼び出し元のジョブへの needs を、展開した呼び出し先の全ジョブへの needs に置き換える"""
+        for job in jobs:
+            job.needs = [need for name in job.needs for need in called.get(name, [name])]
+        return jobs
+
+    @staticmethod
+    def _drop_missing_needs(jobs: List[SimJob]) -> List[SimJob]:
+        names = {job.name for job in jobs}
+        for job in jobs:
+            job.needs = [n for n in job.needs if n in names]
+        return jobs
+
+
+class _Resource:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self.queue: deque = deque()
+        self.wait_seconds = 0.0
+        self.busy_seconds = 0.0
+
+
+class WorkflowSimulator:
+    def __init__(self, jobs: List[SimJob], catalog: McpServiceCatalog,
+                 max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS,
+                 service_concurrency: Optional[Dict[str, int]] = None):
+        self.jobs = {job.name: job for job in jobs}
+        self.catalog = catalog
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.service_concurrency = service_concurrency or {}
+
+    def _capacities(self) -> Dict[str, int]:
+        capacities = {RUNNERS: self.max_concurrent_jobs}
+        for job in self.jobs.values():
+            if job.max_parallel:
+                capacities[f"max-parallel:{job.name}"] = job.max_parallel
+            for kind, service in job.tasks:
+                if kind == 'service':
+                    capacities[service] = self.service_concurrency.get(service, self.catalog.concurrency(service))
+        return capacities
+
+    def _duration(self, rng: random.Random, kind: str, service: Optional[str]) -> float:
+        if kind == 'service':
+            return _sample_lognormal(rng, self.catalog.latency(service, 'p50'), self.catalog.latency(service, 'p95'))
+        return _sample_lognormal(rng, *STEP_DURATIONS[kind])
+
+    def _instance(self, rng: random.Random, job: SimJob):
+        """ジョブの1インスタンス（matrixの1要素）の処理手順"""
+        held = []
+        if job.max_parallel:
+            held.append(f"max-parallel:{job.name}")
+        held.append(RUNNERS)
+        for resource in held:
+            yield ('acquire', resource)
+        yield ('delay', self._duration(rng, 'job_start', None))
+        for kind, service in job.tasks:
+            if kind == 'service':
+                yield ('acquire', service)
+                yield ('delay', self._duration(rng, kind, service))
+                yield ('release', service)
+            else:
+                yield ('delay', self._duration(rng, kind, service))
+        for resource in reversed(held):
+            yield ('release', resource)
+
+    def run_once(self, rng: random.Random) -> Dict:
+        """1回分のシミュレーション"""
+        resources = {name: _Resource(capacity) for name, capacity in self._capacities().items()}
+        events: List[Tuple[float, int, int]] = []
+        processes: Dict[int, Tuple[str, object]] = {}
+        held_since: Dict[Tuple[int, str], float] = {}
+        remaining_instances = {name: job.fan_out for name, job in self.jobs.items()}
+        pending_needs = {name: set(job.needs) for name, job in self.jobs.items()}
+        finish_time: Dict[str, float] = {}
+        sequence = 0
+
+        def schedule(time: float, pid: int):
+            nonlocal sequence
+            sequence += 1
+            heapq.heappush(events, (time, sequence, pid))
+
+        def start_job(name: str, now: float):
+            for _ in range(self.jobs[name].fan_out):
+                pid = len(processes)
+                processes[pid] = (name, self._instance(rng, self.jobs[name]))
+                schedule(now, pid)
+
+        def advance(pid: int, now: float):
+            name, process = processes[pid]
+            while True:
+                try:
+                    action, value = next(process)
+                except StopIteration:
+                    remaining_instances[name] -= 1
+                    if remaining_instances[name] == 0:
+                        finish_time[name] = now
+                        for other, needs in pending_needs.items():
+                            if name in needs:
+                                needs.discard(name)
+                                if not needs and other not in finish_time:
+                                    start_job(other, now)
+                    return
+                if action == 'delay':
+                    schedule(now + value, pid)
+                    return
+                resource = resources[value]
+                if action == 'acquire':
+                    if resource.in_use < resource.capacity:
+                        resource.in_use += 1
+                        held_since[(pid, value)] = now
+                        continue
+                    resource.queue.append((pid, now))
+                    return
+                # release: 待っているプロセスがあれば枠をそのまま引き渡す
+                resource.busy_seconds += now - held_since.pop((pid, value))
+                if resource.queue:
+                    waiter, queued_at = resource.queue.popleft()
+                    resource.wait_seconds += now - queued_at
+                    held_since[(waiter, value)] = now
+                    schedule(now, waiter)
+                else:
+                    resource.in_use -= 1
+
+        for name, needs in pending_needs.items():
+            if not needs:
+                start_job(name, 0.0)
+
+        now = 0.0
+        while events:
+            now, _, pid = heapq.heappop(events)
+            advance(pid, now)
+
+        return {
+            'makespan': max(finish_time.values(), default=0.0),
+            'unfinished_jobs': sorted(set(self.jobs) - set(finish_time)),
+            'resources': {name: (r.wait_seconds, r.busy_seconds, r.capacity) for name, r in resources.items()}
+        }
+
+    def simulate(self, runs: int = 1000, seed: int = 0) -> Dict:
+        """モンテカルロで makespan の分布とボトルネックを求める"""
+        rng = random.Random(seed)
+        makespans = []
+        bottlenecks: Dict[str, int] = {}
+        waits: Dict[str, List[float]] = {}
+        utilization: Dict[str, List[float]] = {}
+        unfinished = set()
+
+        for _ in range(runs):
+            result = self.run_once(rng)
+            makespan = result['makespan']
+            makespans.append(makespan)
+            unfinished.update(result['unfinished_jobs'])
+
+            worst, worst_wait = 'dependencies', 1.0  # 1秒未満の待ちは依存関係（クリティカルパス）律速とみなす
+            for name, (wait, busy, capacity) in result['resources'].items():
+                waits.setdefault(name, []).append(wait)
+                utilization.setdefault(name, []).append(busy / (capacity * makespan) if makespan > 0 else 0.0)
+                if wait > worst_wait:
+                    worst, worst_wait = name, wait
+            bottlenecks[worst] = bottlenecks.get(worst, 0) + 1
+
+        values = np.asarray(makespans)
+        bottleneck = max(bottlenecks, key=bottlenecks.get)
+        return {
+            'runs': runs,
+            'jobs': len(self.jobs),
+            'job_instances': sum(job.fan_out for job in self.jobs.values()),
+            'makespan_seconds': {
+                'mean': round(float(values.mean()), 1),
+                'p50': round(float(np.percentile(values, 50)), 1),
+                'p90': round(float(np.percentile(values, 90)), 1),
+                'p95': round(float(np.percentile(values, 95)), 1),
+                'max': round(float(values.max()), 1)
+            },
+            'bottleneck': bottleneck,
+            'bottleneck_share': round(bottlenecks[bottleneck] / runs, 3),
+            'resources': {
+                name: {
+                    'capacity': self._capacities()[name],
+                    'mean_wait_seconds': round(float(np.mean(waits[name])), 1),
+                    'mean_utilization': round(float(np.mean(utilization[name])), 3)
+                }
+                for name in sorted(waits, key=lambda n: -np.mean(waits[n]))
+            },
+            'unfinished_jobs': sorted(unfinished)
+        }
+
+
+def _parse_assignments(values: Optional[List[str]], option: str) -> Dict[str, int]:
+    result = {}
+    for value in values or []:
+        name, _, number = value.rpartition('=')
+        if not name or not number.isdigit():
+            print(f"Error: {option} expects NAME=N, got '{value}'", file=sys.stderr)
+            sys.exit(1)
+        result[name] = int(number)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte-Carlo makespan simulator for workflows')
+    parser.add_argument('source', help='Workflow YAML or orchestrator_analysis.json')
+    parser.add_argument('--runs', type=int, default=1000, help='Number of Monte-Carlo runs')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--max-concurrent-jobs', type=int, default=DEFAULT_MAX_CONCURRENT_JOBS,
+                        help='Per-repository concurrent job limit')
+    parser.add_argument('--fan-out', action='append', metavar='JOB=N',
+                        help='Override matrix size of a job (repeatable)')
+    parser.add_argument('--default-fan-out', type=int, default=1,
+                        help='Matrix size used when it is only known at run time')
+    parser.add_argument('--service-concurrency', action='append', metavar='SERVICE=N',
+                        help='Override provider concurrency of an MCP service (repeatable)')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_PATH, help='MCP service catalog')
+    parser.add_argument('--output', help='Output file path')
+
+    args = parser.parse_args()
+
+    catalog = McpServiceCatalog(args.catalog, DEFAULT_LOGS_DIR if os.path.isdir(DEFAULT_LOGS_DIR) else None)
+    model = WorkflowModel(catalog, args.default_fan_out, _parse_assignments(args.fan_out, '--fan-out'))
+    jobs = model.load(args.source)
+    if not jobs:
+        print(f"Error: no jobs found in {args.source}", file=sys.stderr)
+        sys.exit(1)
+
+    simulator = WorkflowSimulator(jobs, catalog, args.max_concurrent_jobs,
+                                  _parse_assignments(args.service_concurrency, '--service-concurrency'))
+    result = {'source': args.source, **simulator.simulate(args.runs, args.seed)}
+
+    if not args.output:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    makespan = result['makespan_seconds']
+    print(f"⏱️  Makespan p50 {makespan['p50'] / 60:.1f}m / p95 {makespan['p95'] / 60:.1f}m "
+          f"({result['job_instances']} job instances, {args.runs} runs)")
+    print(f"🚧 Bottleneck: {result['bottleneck']} ({result['bottleneck_share']:.0%} of runs)")
+    print(f"📁 Results saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()